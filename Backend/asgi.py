@@ -2,6 +2,13 @@
 ASGI config for Backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests are routed through ``Backend.asgi_urls``, which serves the
+catalogue pages with the async views of ``my_app.async_views``. Run it
+with an ASGI server, e.g.::
+
+    uvicorn Backend.asgi:application --workers 4
+
+``manage.py asgibench`` compares it with the WSGI application.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -9,8 +16,23 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Backend.settings')
 
-application = get_asgi_application()
+ASGI_URLCONF = 'Backend.asgi_urls'
+
+
+class AsyncViewsHandler(ASGIHandler):
+    """Routes every request through ``ASGI_URLCONF``."""
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = ASGI_URLCONF
+        return request, error_response
+
+
+django.setup(set_prefix=False)
+application = AsyncViewsHandler()
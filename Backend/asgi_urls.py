@@ -0,0 +1,12 @@
+"""
+URL configuration used under ASGI (see Backend/asgi.py): the site's URLs,
+with the catalogue pages served by async views.
+"""
+from django.urls import include, path
+
+from Backend import urls
+
+urlpatterns = [
+    path('', include('my_app.async_urls')),
+    *urls.urlpatterns,
+]
@@ -1,5 +1,17 @@
+import hashlib
+
+from django.conf import settings
 from django.contrib import admin
-from django.urls import reverse
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, PermissionDenied
+from django.core.paginator import Paginator
+from django.forms import ModelChoiceField
+from django.http import HttpResponseRedirect
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.functional import cached_property
 from django.utils.html import format_html
 
 # Import all models from your models.py file
@@ -14,14 +26,141 @@ from .models import (
     Category,
     Tag,
     BlogPost,
+    BlogRedirect,
     Itinerary,
     FAQ,
+    Job,
+    RateRule,
 )
+from . import bulk_actions, jobs, search
+from .forms import RateRuleForm
+from .renditions import rendition_url
 
 
 # --- Configuration for Core Models ---
 
 
+class SearchIndexAdminMixin:
+    """
+    Answers the changelist search box from the full-text search index
+    instead of scanning every row of ``search_fields`` with ``icontains``.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search.match_expression(search_term):
+            return super().get_search_results(request, queryset, search_term)
+        return search.matching(queryset, search_term), False
+
+
+class AutocompleteFilter(admin.RelatedFieldListFilter):
+    """
+    Filters by a related object picked with the admin's autocomplete
+    widget, instead of listing every row of the related table in the
+    sidebar. The related model's admin needs ``search_fields``.
+    """
+
+    template = "admin/my_app/autocomplete_filter.html"
+
+    def field_choices(self, field, request, model_admin):
+        return []
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        selected = self.lookup_val[-1] if self.lookup_val else None
+        remote = self.field.remote_field.model
+        widget = AutocompleteSelect(
+            self.field,
+            changelist.model_admin.admin_site,
+            attrs={"onchange": "this.form.submit()"},
+        )
+        chooser = ModelChoiceField(remote._default_manager.all(), widget=widget)
+        # The other filters, search and ordering, kept when one is picked.
+        others = [
+            (name, value)
+            for name, values in changelist.params.items()
+            if name not in (self.lookup_kwarg, self.lookup_kwarg_isnull)
+            for value in (values if isinstance(values, list) else [values])
+        ]
+        yield {
+            "widget": chooser.widget.render(self.lookup_kwarg, selected),
+            "hidden": others,
+            "reset": changelist.get_query_string(
+                remove=[self.lookup_kwarg, self.lookup_kwarg_isnull]
+            ),
+            "selected": selected is not None,
+        }
+
+
+class AutocompleteFilterMixin:
+    """Loads the scripts of :class:`AutocompleteFilter` on the changelist."""
+
+    @property
+    def media(self):
+        field = self.model._meta.get_field(self.autocomplete_filter_media_field)
+        return super().media + AutocompleteSelect(field, self.admin_site).media
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Caches the changelist's ``COUNT(*)`` for ``ADMIN_COUNT_TIMEOUT``
+    seconds per filter combination, so paging through a large table does
+    not count it again on every page. Counts can lag that long behind.
+    """
+
+    @cached_property
+    def count(self):
+        try:
+            sql, params = self.object_list.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        raw = f"{sql}|{params}".encode()
+        key = "admin-count:" + hashlib.md5(raw, usedforsecurity=False).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = self.object_list.count()
+            cache.set(key, count, settings.ADMIN_COUNT_TIMEOUT)
+        return count
+
+
+class LargeTableAdminMixin:
+    """
+    For tables too large to count on every changelist view: a cached
+    count for the paginator, and no second count of the unfiltered table.
+    """
+
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+
+
+def bulk_admin_action(name):
+    """
+    An admin action running bulk action ``name`` in chunks, or queueing it
+    and showing its progress page when the selection is large.
+    """
+    action = bulk_actions.actions[name]
+
+    def run(modeladmin, request, queryset):
+        result = bulk_actions.perform(name, queryset)
+        if isinstance(result, Job):
+            modeladmin.message_user(
+                request,
+                f"{action.description}: queued as background job #{result.pk}.",
+            )
+            return HttpResponseRedirect(
+                reverse("admin:my_app_job_progress", args=[result.pk])
+            )
+        noun = action.model._meta.verbose_name_plural.lower()
+        modeladmin.message_user(
+            request, f"{action.description}: {result} {noun} changed."
+        )
+
+    run.__name__ = name
+    run.short_description = action.description
+    return run
+
+
 class GalleryImageInline(admin.TabularInline):
     """
     Allows editing GalleryImage models directly from the Hotel or Destination admin page.
@@ -37,7 +176,8 @@ class GalleryImageInline(admin.TabularInline):
         """Renders a thumbnail of the image."""
         if obj.image:
             return format_html(
-                '<img src="{}" width="150" height="auto" />', obj.image.url
+                '<img src="{}" width="150" height="auto" />',
+                rendition_url(obj.image, "small"),
             )
         return "No Image"
 
@@ -53,20 +193,31 @@ class ItineraryInline(admin.TabularInline):
     extra = 1  # Number of empty forms to display
 
 
+class RateRuleInline(admin.TabularInline):
+    """
+    Seasonal, weekend and per-guest price adjustments, edited on the Hotel page.
+    """
+
+    model = RateRule
+    form = RateRuleForm
+    extra = 0
+
+
 @admin.register(Destination)
-class DestinationAdmin(admin.ModelAdmin):
+class DestinationAdmin(SearchIndexAdminMixin, admin.ModelAdmin):
     """
     Admin interface for managing Destinations.
     """
 
-    list_display = ("name", "country", "is_featured", "image_preview")
+    list_display = ("name", "country", "hotel_count", "is_featured", "image_preview")
     list_filter = ("country", "is_featured")
     search_fields = ("name", "country")
     prepopulated_fields = {"slug": ("name",)}
     inlines = [GalleryImageInline, ItineraryInline]
-    readonly_fields = ("image_preview",)
+    readonly_fields = ("image_preview", "hotel_count", "min_price", "avg_rating")
     fieldsets = (
         (None, {"fields": ("name", "slug", "country", "is_featured")}),
+        ("Hotels", {"fields": ("hotel_count", "min_price", "avg_rating")}),
         ("Content", {"fields": ("description", "best_time_to_visit")}),
         ("Media", {"fields": ("image", "image_preview")}),
     )
@@ -75,7 +226,8 @@ class DestinationAdmin(admin.ModelAdmin):
         """Renders a thumbnail of the main destination image."""
         if obj.image:
             return format_html(
-                '<img src="{}" width="150" height="auto" />', obj.image.url
+                '<img src="{}" width="150" height="auto" />',
+                rendition_url(obj.image, "small"),
             )
         return "No Image"
 
@@ -83,7 +235,7 @@ class DestinationAdmin(admin.ModelAdmin):
 
 
 @admin.register(Hotel)
-class HotelAdmin(admin.ModelAdmin):
+class HotelAdmin(AutocompleteFilterMixin, SearchIndexAdminMixin, admin.ModelAdmin):
     """
     Admin interface for managing Hotels.
     """
@@ -96,11 +248,22 @@ class HotelAdmin(admin.ModelAdmin):
         "is_featured",
         "is_available",
     )
-    list_filter = ("destination", "is_featured", "is_available", "rating")
+    list_select_related = ("destination",)
+    list_filter = (
+        ("destination", AutocompleteFilter),
+        "is_featured",
+        "is_available",
+        "rating",
+    )
+    autocomplete_filter_media_field = "destination"
+    actions = [
+        bulk_admin_action("mark_hotels_available"),
+        bulk_admin_action("mark_hotels_unavailable"),
+    ]
     search_fields = ("name", "destination__name", "address")
     prepopulated_fields = {"slug": ("name",)}
     filter_horizontal = ("amenities",)  # Better UI for ManyToMany fields
-    inlines = [GalleryImageInline]
+    inlines = [RateRuleInline, GalleryImageInline]
     readonly_fields = ("image_preview",)
     fieldsets = (
         (
@@ -119,7 +282,8 @@ class HotelAdmin(admin.ModelAdmin):
         """Renders a thumbnail of the main hotel image."""
         if obj.image:
             return format_html(
-                '<img src="{}" width="150" height="auto" />', obj.image.url
+                '<img src="{}" width="150" height="auto" />',
+                rendition_url(obj.image, "small"),
             )
         return "No Image"
 
@@ -137,13 +301,15 @@ class AmenityAdmin(admin.ModelAdmin):
 
 
 @admin.register(GalleryImage)
-class GalleryImageAdmin(admin.ModelAdmin):
+class GalleryImageAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     """
     Admin interface for managing all Gallery Images.
     """
 
     list_display = ("__str__", "image_preview", "related_object_link")
-    list_filter = ("hotel", "destination")
+    list_select_related = ("hotel__destination", "destination")
+    list_filter = (("hotel", AutocompleteFilter), ("destination", AutocompleteFilter))
+    autocomplete_filter_media_field = "hotel"
     search_fields = ("caption", "hotel__name", "destination__name")
     readonly_fields = ("image_preview",)
 
@@ -151,7 +317,8 @@ class GalleryImageAdmin(admin.ModelAdmin):
         """Renders a thumbnail of the gallery image."""
         if obj.image:
             return format_html(
-                '<img src="{}" width="150" height="auto" />', obj.image.url
+                '<img src="{}" width="150" height="auto" />',
+                rendition_url(obj.image, "small"),
             )
         return "No Image"
 
@@ -159,11 +326,11 @@ class GalleryImageAdmin(admin.ModelAdmin):
 
     def related_object_link(self, obj):
         """Creates a link to the related Hotel or Destination admin page."""
-        if obj.hotel:
-            url = reverse("admin:my_app_hotel_change", args=[obj.hotel.id])
+        if obj.hotel_id:
+            url = reverse("admin:my_app_hotel_change", args=[obj.hotel_id])
             return format_html('<a href="{}">{}</a>', url, obj.hotel)
-        if obj.destination:
-            url = reverse("admin:my_app_destination_change", args=[obj.destination.id])
+        if obj.destination_id:
+            url = reverse("admin:my_app_destination_change", args=[obj.destination_id])
             return format_html('<a href="{}">{}</a>', url, obj.destination)
         return "N/A"
 
@@ -174,14 +341,20 @@ class GalleryImageAdmin(admin.ModelAdmin):
 
 
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(LargeTableAdminMixin, AutocompleteFilterMixin, admin.ModelAdmin):
     """
     Admin interface for viewing Bookings.
     It's mostly read-only as bookings should be managed by the system.
     """
 
     list_display = ("id", "user", "hotel", "check_in_date", "check_out_date", "status")
-    list_filter = ("status", "created_at", "hotel")
+    list_select_related = ("user", "hotel__destination")
+    list_filter = ("status", "created_at", ("hotel", AutocompleteFilter))
+    autocomplete_filter_media_field = "hotel"
+    actions = [
+        bulk_admin_action("confirm_bookings"),
+        bulk_admin_action("cancel_bookings"),
+    ]
     search_fields = ("user__username", "hotel__name", "user__email")
     readonly_fields = [
         f.name for f in Booking._meta.fields
@@ -195,7 +368,7 @@ class BookingAdmin(admin.ModelAdmin):
 
 
 @admin.register(Enquiry)
-class EnquiryAdmin(admin.ModelAdmin):
+class EnquiryAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """
     Admin interface for managing customer Enquiries, acting as a mini-CRM.
     """
@@ -204,6 +377,10 @@ class EnquiryAdmin(admin.ModelAdmin):
     list_filter = ("is_resolved", "created_at")
     search_fields = ("name", "email", "subject", "message")
     list_per_page = 20
+    actions = [
+        bulk_admin_action("resolve_enquiries"),
+        bulk_admin_action("reopen_enquiries"),
+    ]
     readonly_fields = (
         "name",
         "email",
@@ -278,13 +455,7 @@ class TestimonialAdmin(admin.ModelAdmin):
     list_display = ("name", "rating", "is_approved", "created_at")
     list_filter = ("is_approved", "rating")
     search_fields = ("name", "content")
-    actions = ["approve_testimonials"]
-
-    def approve_testimonials(self, _request, queryset):
-        """Custom admin action to approve selected testimonials."""
-        queryset.update(is_approved=True)
-
-    approve_testimonials.short_description = "Approve selected testimonials"
+    actions = [bulk_admin_action("approve_testimonials")]
 
 
 # --- Configuration for Blog Models ---
@@ -294,7 +465,7 @@ class TestimonialAdmin(admin.ModelAdmin):
 class CategoryAdmin(admin.ModelAdmin):
     """Admin interface for Blog Categories."""
 
-    list_display = ("name", "slug")
+    list_display = ("name", "slug", "post_count")
     prepopulated_fields = {"slug": ("name",)}
     search_fields = ("name",)
 
@@ -303,13 +474,13 @@ class CategoryAdmin(admin.ModelAdmin):
 class TagAdmin(admin.ModelAdmin):
     """Admin interface for Blog Tags."""
 
-    list_display = ("name", "slug")
+    list_display = ("name", "slug", "post_count")
     prepopulated_fields = {"slug": ("name",)}
     search_fields = ("name",)
 
 
 @admin.register(BlogPost)
-class BlogPostAdmin(admin.ModelAdmin):
+class BlogPostAdmin(AutocompleteFilterMixin, SearchIndexAdminMixin, admin.ModelAdmin):
     """
     Admin interface for managing Blog Posts.
     """
@@ -322,12 +493,14 @@ class BlogPostAdmin(admin.ModelAdmin):
         "published_at",
         "image_preview",
     )
-    list_filter = ("status", "category", "author", "created_at")
+    list_select_related = ("author", "category")
+    list_filter = ("status", "category", ("author", AutocompleteFilter), "created_at")
+    autocomplete_filter_media_field = "author"
     search_fields = ("title", "content", "excerpt")
     prepopulated_fields = {"slug": ("title",)}
     filter_horizontal = ("tags",)
     date_hierarchy = "published_at"
-    actions = ["publish_posts"]
+    actions = [bulk_admin_action("publish_posts")]
     readonly_fields = ("image_preview",)
     fieldsets = (
         (None, {"fields": ("title", "slug", "author", "status")}),
@@ -341,17 +514,22 @@ class BlogPostAdmin(admin.ModelAdmin):
         """Renders a thumbnail of the featured image."""
         if obj.featured_image:
             return format_html(
-                '<img src="{}" width="150" height="auto" />', obj.featured_image.url
+                '<img src="{}" width="150" height="auto" />',
+                rendition_url(obj.featured_image, "small"),
             )
         return "No Image"
 
     image_preview.short_description = "Featured Image"
 
-    def publish_posts(self, _request, queryset):
-        """Custom admin action to publish selected draft posts."""
-        queryset.update(status="published")
 
-    publish_posts.short_description = "Publish selected posts"
+@admin.register(BlogRedirect)
+class BlogRedirectAdmin(admin.ModelAdmin):
+    """Admin interface for the redirects of old slug-only blog URLs."""
+
+    list_display = ("slug", "post")
+    list_select_related = ("post",)
+    search_fields = ("slug", "post__title")
+    autocomplete_fields = ("post",)
 
 
 @admin.register(FAQ)
@@ -361,4 +539,84 @@ class FAQAdmin(admin.ModelAdmin):
     """
 
     list_display = ("question",)
-    search_fields = ("question", "answer")
\ No newline at end of file
+    search_fields = ("question", "answer")
+
+
+# --- Configuration for Background Jobs ---
+
+
+class TaskFilter(admin.SimpleListFilter):
+    """The registered task names, without a ``SELECT DISTINCT`` over the queue."""
+
+    title = "task"
+    parameter_name = "task"
+
+    def lookups(self, request, model_admin):
+        return [(name, name) for name in sorted(jobs.tasks)]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(task=self.value())
+        return queryset
+
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    """
+    Read-only view of the background job queue, for checking on failures.
+    """
+
+    list_display = (
+        "task",
+        "key",
+        "status",
+        "attempts",
+        "run_at",
+        "started_at",
+        "finished_at",
+        "worker",
+        "progress_display",
+    )
+    list_filter = ("status", TaskFilter)
+    search_fields = ("key",)
+    date_hierarchy = "run_at"
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        progress = path(
+            "<path:object_id>/progress/",
+            self.admin_site.admin_view(self.progress_view),
+            name="my_app_job_progress",
+        )
+        return [progress, *super().get_urls()]
+
+    def progress_display(self, obj):
+        """Progress reported by the task, with a link to its progress page."""
+        if not obj.total:
+            return "-"
+        url = reverse("admin:my_app_job_progress", args=[obj.pk])
+        return format_html('<a href="{}">{} / {}</a>', url, obj.progress, obj.total)
+
+    progress_display.short_description = "Progress"
+
+    def progress_view(self, request, object_id):
+        """A page following one job until it finishes, reloading itself."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        job = get_object_or_404(Job, pk=object_id)
+        finished = job.status in (Job.DONE, Job.FAILED)
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": f"Progress of {job}",
+            "job": job,
+            "finished": finished,
+            "percent": round(100 * job.progress / job.total) if job.total else None,
+        }
+        return TemplateResponse(request, "admin/my_app/job_progress.html", context)
@@ -0,0 +1,310 @@
+"""
+Read-only JSON API over the catalogue and the blog.
+
+``/api/<resource>/`` lists a resource and ``/api/<resource>/<key>/`` shows
+one object, for the resources in ``RESOURCES``::
+
+    GET /api/hotels/?fields=name,price_per_night,rating&limit=500
+
+List responses are streamed: the rows are read with ``iterator()`` in
+chunks of ``CHUNK_SIZE`` and written out as they arrive, so a page of a
+thousand hotels never sits in memory as one list or one string. Pages
+are cut with the keyset cursors of :mod:`my_app.pagination`; ``next``
+holds the URL of the following page, or ``null`` on the last one.
+
+``?fields=`` picks the fields to return. Only the columns (and joins and
+prefetches) those fields need are queried, so leaving out
+``description`` or ``content`` also keeps the HTML out of the query.
+
+Every response carries an ETag made from the version tokens of the
+:mod:`my_app.page_cache` collection tags the resource depends on
+(``"hotel:all"`` …), which the model signals replace on every change. A
+matching ``If-None-Match`` is answered ``304`` without touching the
+database.
+"""
+
+import json
+from dataclasses import dataclass
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_safe
+
+from . import page_cache
+from .models import Amenity, BlogPost, Category, Destination, Hotel, Tag
+from .pagination import FORWARD, InvalidCursor, KeysetPaginator
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+# Rows fetched (and prefetched for) per database round trip while streaming.
+CHUNK_SIZE = 200
+
+
+class BadRequest(Exception):
+    """An unusable query parameter, answered with a 400 and its message."""
+
+
+@dataclass(frozen=True)
+class Field:
+    """
+    One field of a resource: how to compute it from an object, and which
+    columns, joins and prefetches that needs.
+    """
+
+    value: object
+    columns: tuple = ()
+    select_related: str = None
+    prefetch: object = None
+
+
+def column(name):
+    return Field(lambda obj: getattr(obj, name), (name,))
+
+
+def image(name):
+    def value(obj):
+        fieldfile = getattr(obj, name)
+        return fieldfile.url if fieldfile else None
+
+    return Field(value, (name,))
+
+
+def url(*columns):
+    return Field(lambda obj: obj.get_absolute_url(), columns or ("slug",))
+
+
+@dataclass(frozen=True)
+class Resource:
+    model: type
+    fields: dict
+    # Looks an object up by this field in the detail URL.
+    lookup: str = "slug"
+    # Restricts what the API exposes, e.g. to published posts.
+    filters: dict = None
+    # Models whose changes can change this resource's output.
+    depends_on: tuple = ()
+
+    def queryset(self, fields):
+        """The rows to serialize ``fields`` of, with nothing else loaded."""
+        queryset = self.model._default_manager.filter(**(self.filters or {}))
+        ordering = [
+            name.lstrip("-") for name in self.model._meta.ordering if name != "pk"
+        ]
+        columns = {"id", self.lookup, *ordering}
+        related = []
+        prefetches = []
+        for name in fields:
+            spec = self.fields[name]
+            columns.update(spec.columns)
+            if spec.select_related:
+                related.append(spec.select_related)
+            if spec.prefetch:
+                prefetches.append(spec.prefetch)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.prefetch_related(*prefetches).only(*columns)
+
+    def tags(self):
+        models = (self.model, *self.depends_on)
+        return [page_cache.collection_tag(model) for model in models]
+
+    def serialize(self, obj, fields):
+        return {name: self.fields[name].value(obj) for name in fields}
+
+
+RESOURCES = {
+    "destinations": Resource(
+        Destination,
+        {
+            "id": column("id"),
+            "name": column("name"),
+            "slug": column("slug"),
+            "url": url(),
+            "country": column("country"),
+            "description": column("description"),
+            "best_time_to_visit": column("best_time_to_visit"),
+            "image": image("image"),
+            "is_featured": column("is_featured"),
+            "hotel_count": column("hotel_count"),
+            "min_price": column("min_price"),
+            "avg_rating": column("avg_rating"),
+            "updated_at": column("updated_at"),
+        },
+        depends_on=(Hotel,),
+    ),
+    "hotels": Resource(
+        Hotel,
+        {
+            "id": column("id"),
+            "name": column("name"),
+            "slug": column("slug"),
+            "url": url(),
+            "destination": Field(
+                lambda hotel: {
+                    "id": hotel.destination.id,
+                    "name": hotel.destination.name,
+                    "slug": hotel.destination.slug,
+                },
+                ("destination__id", "destination__name", "destination__slug"),
+                select_related="destination",
+            ),
+            "description": column("description"),
+            "address": column("address"),
+            "phone_number": Field(
+                lambda hotel: str(hotel.phone_number or ""), ("phone_number",)
+            ),
+            "email": column("email"),
+            "price_per_night": column("price_per_night"),
+            "rating": column("rating"),
+            "amenities": Field(
+                lambda hotel: [amenity.name for amenity in hotel.amenities.all()],
+                prefetch=Prefetch("amenities", Amenity.objects.only("id", "name")),
+            ),
+            "image": image("image"),
+            "is_featured": column("is_featured"),
+            "is_available": column("is_available"),
+            "updated_at": column("updated_at"),
+        },
+        depends_on=(Destination, Amenity),
+    ),
+    "amenities": Resource(
+        Amenity,
+        {"id": column("id"), "name": column("name")},
+        lookup="pk",
+    ),
+    "posts": Resource(
+        BlogPost,
+        {
+            "id": column("id"),
+            "title": column("title"),
+            "slug": column("slug"),
+            "url": url("slug", "published_at"),
+            "category": Field(
+                lambda post: post.category.name if post.category else None,
+                ("category__id", "category__name"),
+                select_related="category",
+            ),
+            "tags": Field(
+                lambda post: [tag.name for tag in post.tags.all()],
+                prefetch=Prefetch("tags", Tag.objects.only("id", "name")),
+            ),
+            "excerpt": column("excerpt"),
+            "content": column("content"),
+            "featured_image": image("featured_image"),
+            "published_at": column("published_at"),
+            "updated_at": column("updated_at"),
+        },
+        lookup="pk",
+        filters={"status": "published"},
+        depends_on=(Category, Tag),
+    ),
+}
+
+
+def _dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def api_view(view):
+    """
+    Resolve the ``resource`` URL argument, check the ETag, and turn
+    ``BadRequest`` into a 400 and ``Http404`` into a JSON 404.
+    """
+
+    @require_safe
+    @wraps(view)
+    def wrapper(request, resource, *args, **kwargs):
+        if resource not in RESOURCES:
+            return JsonResponse({"error": "Unknown resource."}, status=404)
+        resource = RESOURCES[resource]
+        etag = page_cache.versions_etag(request, resource.tags())
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return response
+        try:
+            response = view(request, resource, *args, **kwargs)
+        except BadRequest as exc:
+            return JsonResponse({"error": str(exc)}, status=400)
+        except Http404 as exc:
+            return JsonResponse({"error": str(exc)}, status=404)
+        response["ETag"] = etag
+        return response
+
+    return wrapper
+
+
+def requested_fields(request, resource):
+    if not request.GET.get("fields"):
+        return list(resource.fields)
+    fields = [name.strip() for name in request.GET["fields"].split(",")]
+    unknown = [name for name in fields if name not in resource.fields]
+    if unknown:
+        raise BadRequest(f"Unknown fields: {', '.join(unknown)}.")
+    return list(dict.fromkeys(fields))
+
+
+def requested_limit(request):
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise BadRequest("limit must be a number.")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise BadRequest(f"limit must be between 1 and {MAX_LIMIT}.")
+    return limit
+
+
+@api_view
+def object_list(request, resource):
+    fields = requested_fields(request, resource)
+    limit = requested_limit(request)
+    paginator = KeysetPaginator(resource.queryset(fields), limit)
+    values = None
+    if request.GET.get("cursor"):
+        try:
+            direction, values = paginator.decode_cursor(request.GET["cursor"])
+        except InvalidCursor:
+            direction = None
+        if direction != FORWARD:
+            raise BadRequest("Invalid cursor.")
+    rows = paginator.rows_after(FORWARD, values)[: limit + 1]
+
+    def next_url(obj):
+        query = request.GET.copy()
+        query["cursor"] = paginator.encode_cursor(obj, FORWARD)
+        return request.build_absolute_uri(f"?{query.urlencode()}")
+
+    def stream():
+        yield '{"results": ['
+        chunk, count, last = [], 0, None
+        for obj in rows.iterator(chunk_size=CHUNK_SIZE):
+            if count == limit:
+                break
+            chunk.append(_dumps(resource.serialize(obj, fields)))
+            count, last = count + 1, obj
+            if len(chunk) == CHUNK_SIZE:
+                yield ("," if count > CHUNK_SIZE else "") + ",".join(chunk)
+                chunk = []
+        else:
+            last = None  # The page ended before the limit: no next page.
+        if chunk:
+            yield ("," if count > len(chunk) else "") + ",".join(chunk)
+        yield f'], "next": {_dumps(next_url(last) if last else None)}}}'
+
+    return StreamingHttpResponse(stream(), content_type="application/json")
+
+
+@api_view
+def object_detail(request, resource, key):
+    fields = requested_fields(request, resource)
+    lookup = {resource.lookup: key}
+    if resource.lookup == "pk" and not key.isdigit():
+        raise Http404("Not found.")
+    obj = resource.queryset(fields).filter(**lookup).first()
+    if obj is None:
+        raise Http404("Not found.")
+    return JsonResponse(
+        resource.serialize(obj, fields), json_dumps_params={"ensure_ascii": False}
+    )
@@ -5,3 +5,7 @@ class MyAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'my_app'
     verbose_name = "Adrija Tours and Travels"
+
+    def ready(self):
+        from . import signals  # noqa: F401  (connects the receivers)
+        from . import tasks  # noqa: F401  (registers the background tasks)
@@ -0,0 +1,25 @@
+"""
+The URLs of :mod:`my_app.urls`, with the catalogue pages served by the
+async views of :mod:`my_app.async_views`. Used under ASGI.
+"""
+
+from django.urls import URLPattern
+
+from . import async_views, urls
+
+ASYNC_VIEWS = {
+    'home': async_views.home,
+    'destination_detail': async_views.destination_detail,
+    'hotel_detail': async_views.hotel_detail,
+    'blog_detail': async_views.blog_detail,
+}
+
+urlpatterns = [
+    URLPattern(
+        pattern.pattern,
+        ASYNC_VIEWS.get(pattern.name, pattern.callback),
+        pattern.default_args,
+        pattern.name,
+    )
+    for pattern in urls.urlpatterns
+]
@@ -0,0 +1,94 @@
+"""
+Async versions of the catalogue pages, served under ASGI (see
+:mod:`my_app.async_urls`).
+
+They fetch their rows with the async ORM and leave rendering to a worker
+thread: the templates read lazy querysets inside cached fragments, and
+the page cache is synchronous. The responses are the same as those of
+the views in :mod:`my_app.views`, and both share one page cache.
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.shortcuts import render
+
+from . import page_cache, queries, view_counts
+from .conditional import last_modified_condition
+from .signals import ALL_FAQS, FEATURED_DESTINATIONS, FEATURED_HOTELS
+
+arender = sync_to_async(render)
+
+
+async def aget_object_or_404(queryset, **lookup):
+    try:
+        return await queryset.aget(**lookup)
+    except queryset.model.DoesNotExist:
+        name = queryset.model._meta.object_name
+        raise Http404(f'No {name} matches the given query.')
+
+
+async def _fetch(queryset, fragments, stale):
+    """``queryset`` as a list if one of ``fragments`` is stale, else left lazy."""
+    if stale.isdisjoint(fragments):
+        return queryset
+    return [obj async for obj in queryset]
+
+
+@page_cache.cached_page
+async def home(request):
+    # A section is fetched only if a fragment showing it is stale. The
+    # sections are independent, so their queries are gathered, although
+    # Django's SQLite backend still runs them one after another.
+    sections = {
+        'featured_destinations': (
+            queries.featured_destinations()[:4],
+            ('trip_planner', 'featured_destinations'),
+        ),
+        'featured_hotels': (queries.featured_hotels()[:4], ('featured_hotels',)),
+        'faqs': (queries.faqs(), ('faqs',)),
+    }
+    fragments = {name for _, names in sections.values() for name in names}
+    stale = await sync_to_async(page_cache.stale_fragments)(fragments)
+    rows = await asyncio.gather(
+        *(_fetch(queryset, names, stale) for queryset, names in sections.values())
+    )
+    response = await arender(request, 'index.html', dict(zip(sections, rows)))
+    return page_cache.tag(response, FEATURED_DESTINATIONS, FEATURED_HOTELS, ALL_FAQS)
+
+
+@last_modified_condition(queries.destination_last_modified)
+@page_cache.cached_page
+async def destination_detail(request, slug):
+    destination = await aget_object_or_404(queries.destination_detail(), slug=slug)
+    response = await arender(
+        request, 'destination_details.html', {'destination': destination}
+    )
+    return page_cache.tag(response, page_cache.object_tag(destination))
+
+
+@last_modified_condition(queries.hotel_last_modified)
+@page_cache.cached_page
+async def hotel_detail(request, slug):
+    hotel = await aget_object_or_404(queries.hotel_detail(), slug=slug)
+    response = await arender(request, 'hotel_details.html', {'hotel': hotel})
+    return page_cache.tag(
+        response, page_cache.object_tag(hotel), page_cache.object_tag(hotel.destination)
+    )
+
+
+@view_counts.counted
+@last_modified_condition(queries.blog_last_modified)
+@page_cache.cached_page
+async def blog_detail(request, year, month, day, slug):
+    post = await aget_object_or_404(queries.blog_detail(year, month, day, slug))
+    related = []
+    if post.related_post_ids:
+        candidates = [related async for related in queries.related_candidates(post)]
+        related = queries.in_related_order(post, candidates)
+    context = {'post': post, 'related_posts': related}
+    response = await arender(request, 'blog_details.html', context)
+    return page_cache.tag(
+        response, page_cache.object_tag(post), *map(page_cache.object_tag, related)
+    )
@@ -0,0 +1,102 @@
+"""
+Hotel availability.
+
+A hotel is booked for a night if a pending or confirmed booking covers
+it. Stays are half-open date ranges ``[check_in, check_out)``, so a guest
+may check in on the day another checks out, and two stays overlap when::
+
+    booking.check_in < check_out and booking.check_out > check_in
+
+Stays are at most ``MAX_STAY_NIGHTS`` long, which a check constraint on
+``Booking`` enforces for every row. That bounds the search to bookings
+checking in within ``MAX_STAY_NIGHTS`` before the requested range, i.e.
+one short range scan of ``booking_availability_idx`` (hotel, status,
+check_in_date, check_out_date) per hotel, however long the booking
+history is.
+
+``create_booking()`` checks for a conflict and inserts inside one
+transaction that holds the write lock (``BEGIN IMMEDIATE`` on SQLite,
+a row lock on the hotel elsewhere), so two concurrent requests cannot
+both book the same nights.
+"""
+
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from . import pricing
+from .models import MAX_STAY_NIGHTS, Booking, Hotel
+
+# Bookings that hold their nights.
+ACTIVE_STATUSES = ("pending", "confirmed")
+
+
+class BookingConflict(ValidationError):
+    """The requested nights are already booked."""
+
+
+def validate_stay(check_in, check_out):
+    if check_out <= check_in:
+        raise ValidationError("Check-out must be after check-in.")
+    if (check_out - check_in).days > MAX_STAY_NIGHTS:
+        raise ValidationError(f"Stays are limited to {MAX_STAY_NIGHTS} nights.")
+
+
+def overlapping(check_in, check_out):
+    """Active bookings sharing at least one night with ``[check_in, check_out)``."""
+    return Booking.objects.filter(
+        status__in=ACTIVE_STATUSES,
+        check_in_date__gt=check_in - timedelta(days=MAX_STAY_NIGHTS),
+        check_in_date__lt=check_out,
+        check_out_date__gt=check_in,
+    )
+
+
+def available_hotels(check_in, check_out, hotels=None):
+    """
+    Hotels (from ``hotels``, default all) free for every night of the stay.
+
+    A single query: ``NOT EXISTS`` an overlapping booking, per hotel::
+
+        available_hotels(date(2026, 11, 10), date(2026, 11, 14),
+                         Hotel.objects.filter(destination=goa))
+    """
+    validate_stay(check_in, check_out)
+    if hotels is None:
+        hotels = Hotel.objects.all()
+    booked = overlapping(check_in, check_out).filter(hotel=OuterRef("pk"))
+    return hotels.filter(~Exists(booked))
+
+
+def is_available(hotel, check_in, check_out):
+    validate_stay(check_in, check_out)
+    return not overlapping(check_in, check_out).filter(hotel=hotel).exists()
+
+
+def create_booking(user, hotel, check_in, check_out, **fields):
+    """
+    Book ``hotel`` for ``user``, or raise ``BookingConflict`` if any of the
+    nights is taken. ``total_price`` defaults to the quoted price.
+    """
+    validate_stay(check_in, check_out)
+    if "total_price" not in fields:
+        guests = fields.get("num_guests", 1)
+        quote = pricing.quote(hotel, check_in, check_out, guests)
+        fields["total_price"] = quote.total
+    with transaction.atomic():
+        # Serializes bookings of this hotel on databases with row locks;
+        # on SQLite the IMMEDIATE transaction already holds the write lock.
+        Hotel.objects.select_for_update().filter(pk=hotel.pk).exists()
+        if overlapping(check_in, check_out).filter(hotel=hotel).exists():
+            raise BookingConflict(
+                f"{hotel.name} is already booked between {check_in} and {check_out}."
+            )
+        return Booking.objects.create(
+            user=user,
+            hotel=hotel,
+            check_in_date=check_in,
+            check_out_date=check_out,
+            **fields,
+        )
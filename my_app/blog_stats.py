@@ -0,0 +1,158 @@
+"""
+Blog sidebar counts and related posts, computed ahead of the page views.
+
+The blog listings show how many published posts each category, tag and
+month has. The counts are stored (``Category.post_count``,
+``Tag.post_count`` and ``BlogMonth`` rows) and recomputed only for the
+categories, tags and months a change touches, so no page view runs a
+``GROUP BY`` over the posts.
+
+Every post also stores the pks of its related posts, the published posts
+sharing most of its tags (``BlogPost.related_post_ids``). A post's list
+is recomputed when the post is saved or its tags change; other posts
+pick up a new post the next time they are saved, and the detail page
+skips related posts that have since been unpublished or deleted.
+
+The receivers in :mod:`my_app.signals` call the ``refresh_*`` functions.
+Bulk ``QuerySet.update()`` calls send no signals; the
+``rebuild_blog_stats`` command recomputes everything.
+"""
+
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .models import BlogMonth, BlogPost, Category, Tag
+
+# Related posts stored per post.
+RELATED_POSTS = 3
+
+
+def month_of(published_at):
+    """The first day of the local month ``published_at`` falls in."""
+    return timezone.localdate(published_at).replace(day=1)
+
+
+def _month_range(month):
+    following = (month + datetime.timedelta(days=32)).replace(day=1)
+    return tuple(
+        timezone.make_aware(datetime.datetime(day.year, day.month, 1))
+        for day in (month, following)
+    )
+
+
+def _counted(queryset, group):
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(group).annotate(n=Count("pk")).values("n")
+        ),
+        0,
+    )
+
+
+def category_count(post_model=BlogPost):
+    """Expression counting the published posts of the outer query's category."""
+    posts = post_model._default_manager.filter(
+        status="published", category=OuterRef("pk")
+    )
+    return _counted(posts, "category")
+
+
+def tag_count(post_model=BlogPost):
+    """Expression counting the published posts of the outer query's tag."""
+    links = post_model.tags.through._default_manager.filter(
+        tag=OuterRef("pk"), blogpost__status="published"
+    )
+    return _counted(links, "tag")
+
+
+def refresh_categories(pks):
+    return Category.objects.filter(pk__in=pks).update(post_count=category_count())
+
+
+def refresh_tags(pks):
+    return Tag.objects.filter(pk__in=pks).update(post_count=tag_count())
+
+
+def refresh_months(months):
+    """Recount the published posts of ``months`` in one query, then upsert them."""
+    months = sorted(set(months))
+    if not months:
+        return
+    counts = {}
+    for i, month in enumerate(months):
+        start, end = _month_range(month)
+        in_month = Q(status="published", published_at__gte=start, published_at__lt=end)
+        counts[f"m{i}"] = Count("pk", filter=in_month)
+    totals = BlogPost.objects.aggregate(**counts)
+    BlogMonth.objects.bulk_create(
+        [
+            BlogMonth(month=month, post_count=totals[f"m{i}"])
+            for i, month in enumerate(months)
+        ],
+        update_conflicts=True,
+        unique_fields=["month"],
+        update_fields=["post_count"],
+    )
+
+
+def related_ids(pk, post_model=BlogPost):
+    """The published posts sharing most tags with post ``pk``, newest first on ties."""
+    tags = post_model.tags.through._default_manager.filter(blogpost_id=pk)
+    rows = (
+        post_model._default_manager.filter(
+            status="published", tags__in=tags.values("tag_id")
+        )
+        .exclude(pk=pk)
+        .values("pk", "published_at")
+        .annotate(shared=Count("pk"))
+        .order_by("-shared", "-published_at", "-pk")[:RELATED_POSTS]
+    )
+    return [row["pk"] for row in rows]
+
+
+def refresh_related(pks, post_model=BlogPost):
+    for pk in pks:
+        post_model._default_manager.filter(pk=pk).update(
+            related_post_ids=related_ids(pk, post_model)
+        )
+
+
+def refresh_posts(pks):
+    """
+    Recompute everything posts ``pks`` count towards, e.g. after their
+    status was changed with ``QuerySet.update()``.
+    """
+    posts = BlogPost.objects.filter(pk__in=pks)
+    rows = list(posts.values_list("category_id", "published_at"))
+    refresh_categories({category for category, _ in rows} - {None})
+    refresh_months({month_of(published_at) for _, published_at in rows})
+    links = BlogPost.tags.through.objects.filter(blogpost__in=posts)
+    refresh_tags(set(links.values_list("tag_id", flat=True)))
+
+
+def rebuild(
+    post_model=BlogPost, category_model=Category, tag_model=Tag, month_model=BlogMonth
+):
+    """Recompute every count and related-post list."""
+    category_model._default_manager.update(post_count=category_count(post_model))
+    tag_model._default_manager.update(post_count=tag_count(post_model))
+    rows = (
+        post_model._default_manager.filter(status="published")
+        .annotate(month=TruncMonth("published_at"))
+        .order_by()
+        .values("month")
+        .annotate(n=Count("pk"))
+    )
+    months = [
+        month_model(month=timezone.localdate(row["month"]), post_count=row["n"])
+        for row in rows
+    ]
+    with transaction.atomic():
+        month_model._default_manager.all().delete()
+        month_model._default_manager.bulk_create(months)
+    pks = post_model._default_manager.values_list("pk", flat=True)
+    refresh_related(list(pks), post_model)
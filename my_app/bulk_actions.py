@@ -0,0 +1,180 @@
+"""
+Chunked bulk updates behind the admin actions.
+
+A "select all" admin action can cover tens of thousands of rows. As one
+``queryset.update()`` it holds SQLite's write lock for the whole
+statement and sends no signals, so the page cache, the search index and
+the stored counts go stale. A bulk action instead
+
+* updates ``settings.BULK_ACTION_CHUNK_SIZE`` rows per short
+  transaction, so page views and other writers get the lock between
+  chunks;
+* runs its ``after`` hook once per chunk, after the chunk committed,
+  to invalidate caches and refresh derived data for exactly those rows;
+* runs as a background job when more than
+  ``settings.BULK_ACTION_BACKGROUND_THRESHOLD`` rows are selected,
+  reporting its progress on the job (see
+  :func:`my_app.jobs.report_progress`) for the admin's progress page.
+
+Actions are registered with :func:`register` and offered in the admin
+with :func:`my_app.admin.bulk_admin_action`.
+"""
+
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import blog_stats, destination_stats, jobs, page_cache, search
+from .availability import ACTIVE_STATUSES
+from .models import BlogPost, Booking, Destination, Enquiry, Hotel, Testimonial
+from .signals import BLOG_ARCHIVE, FEATURED_HOTELS, POPULAR_POSTS
+from .utils import batches
+
+
+@dataclass(frozen=True)
+class BulkAction:
+    name: str
+    model: type
+    description: str
+    # apply(pks) updates the rows of one chunk and returns how many changed.
+    apply: object
+    # after(pks) runs once the chunk is committed.
+    after: object = None
+
+
+# Action name -> BulkAction.
+actions = {}
+
+
+def register(name, model, description, apply, after=None):
+    actions[name] = BulkAction(name, model, description, apply, after)
+
+
+def update(model, where=None, **values):
+    """An ``apply`` setting ``values`` on the rows of a chunk matching ``where``."""
+
+    def apply(pks):
+        rows = model._default_manager.filter(pk__in=pks, **(where or {}))
+        changes = dict(values)
+        if any(field.name == "updated_at" for field in model._meta.fields):
+            changes["updated_at"] = timezone.now()
+        return rows.update(**changes)
+
+    return apply
+
+
+def run(name, pks):
+    """Apply action ``name`` to rows ``pks`` chunk by chunk; returns rows changed."""
+    action = actions[name]
+    pks = sorted(pks)
+    done = changed = 0
+    for chunk in batches(pks, settings.BULK_ACTION_CHUNK_SIZE):
+        with transaction.atomic():
+            changed += action.apply(chunk)
+        if action.after is not None:
+            action.after(chunk)
+        done += len(chunk)
+        jobs.report_progress(done, len(pks))
+    return changed
+
+
+def perform(name, queryset):
+    """
+    Apply action ``name`` to ``queryset`` now, or queue it if it is large.
+
+    Returns the number of rows changed, or the queued job.
+    """
+    pks = list(queryset.values_list("pk", flat=True))
+    if len(pks) > settings.BULK_ACTION_BACKGROUND_THRESHOLD:
+        return jobs.enqueue("bulk_action", {"action": name, "pks": pks})
+    return run(name, pks)
+
+
+# --- Actions ---
+
+
+def posts_published(pks):
+    """Everything that shows or counts the posts of a chunk."""
+    blog_stats.refresh_posts(pks)
+    # Posts sharing a tag with the chunk may now list its posts as related.
+    links = BlogPost.tags.through.objects
+    tags = links.filter(blogpost_id__in=pks).values("tag_id")
+    related = set(links.filter(tag_id__in=tags).values_list("blogpost_id", flat=True))
+    blog_stats.refresh_related(sorted(related | set(pks)))
+    search.index(*BlogPost.objects.filter(pk__in=pks))
+    page_cache.invalidate(
+        page_cache.collection_tag(BlogPost),
+        POPULAR_POSTS,
+        BLOG_ARCHIVE,
+        *(f"blogpost:{pk}" for pk in related | set(pks)),
+    )
+
+
+def hotels_changed(pks):
+    """Everything that shows the hotels of a chunk or their availability."""
+    destinations = set(
+        Hotel.objects.filter(pk__in=pks).values_list("destination_id", flat=True)
+    )
+    destination_stats.refresh(destinations)
+    page_cache.invalidate(
+        page_cache.collection_tag(Hotel),
+        page_cache.collection_tag(Destination),
+        FEATURED_HOTELS,
+        *(f"hotel:{pk}" for pk in pks),
+        *(f"destination:{pk}" for pk in destinations),
+    )
+
+
+register(
+    "approve_testimonials",
+    Testimonial,
+    "Approve selected testimonials",
+    update(Testimonial, where={"is_approved": False}, is_approved=True),
+)
+register(
+    "publish_posts",
+    BlogPost,
+    "Publish selected posts",
+    update(BlogPost, where={"status": "draft"}, status="published"),
+    after=posts_published,
+)
+register(
+    "confirm_bookings",
+    Booking,
+    "Confirm selected pending bookings",
+    update(Booking, where={"status": "pending"}, status="confirmed"),
+)
+register(
+    "cancel_bookings",
+    Booking,
+    "Cancel selected bookings",
+    update(Booking, where={"status__in": ACTIVE_STATUSES}, status="cancelled"),
+)
+register(
+    "resolve_enquiries",
+    Enquiry,
+    "Mark selected enquiries as resolved",
+    update(Enquiry, where={"is_resolved": False}, is_resolved=True),
+)
+register(
+    "reopen_enquiries",
+    Enquiry,
+    "Mark selected enquiries as unresolved",
+    update(Enquiry, where={"is_resolved": True}, is_resolved=False),
+)
+register(
+    "mark_hotels_available",
+    Hotel,
+    "Mark selected hotels as available",
+    update(Hotel, where={"is_available": False}, is_available=True),
+    after=hotels_changed,
+)
+register(
+    "mark_hotels_unavailable",
+    Hotel,
+    "Mark selected hotels as unavailable",
+    update(Hotel, where={"is_available": True}, is_available=False),
+    after=hotels_changed,
+)
@@ -0,0 +1,439 @@
+"""
+Bulk import and export of the catalogue.
+
+Destinations, hotels (with their amenities and gallery images) and
+itineraries are read and written as CSV or JSON Lines, one object per
+row, with the columns in ``COLUMNS``. Relations are written by natural
+key: a hotel names its ``destination`` by slug, and lists ``amenities``
+by name and ``gallery`` images by storage path (``|``-separated in CSV).
+Images are referenced, not copied: upload the files to the media storage
+first.
+
+Import streams its input in batches of ``batch_size`` rows. Each batch is
+one transaction of a few bulk statements: the existing rows it updates
+are read with one query, new rows are inserted with ``bulk_create`` (with
+slugs allocated in bulk by :mod:`my_app.slugs`), the fields that actually differ
+on existing rows are written with ``bulk_update`` and the amenity links
+of the whole batch with a single ``bulk_create`` into the through table.
+
+Model signals do not fire for bulk statements, so the importer refreshes
+what they would have: amenity masks and the search index per batch, and
+destination figures, page cache tags and image renditions at the end.
+
+A row with a ``slug`` that already exists updates that object (hotels
+keep any gallery images not listed; listed ones are added); destinations
+are also matched by name and itinerary days by destination and day.
+"""
+
+import csv
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from . import destination_stats, hotel_search, jobs, page_cache, search
+from .models import Amenity, Destination, GalleryImage, Hotel, Itinerary
+from .signals import FEATURED_DESTINATIONS, FEATURED_HOTELS, renditions_job
+from .utils import batches
+
+COLUMNS = {
+    "destinations": (
+        "name",
+        "slug",
+        "country",
+        "description",
+        "best_time_to_visit",
+        "image",
+        "is_featured",
+    ),
+    "hotels": (
+        "name",
+        "slug",
+        "destination",
+        "description",
+        "address",
+        "phone_number",
+        "email",
+        "price_per_night",
+        "rating",
+        "image",
+        "is_featured",
+        "is_available",
+        "amenities",
+        "gallery",
+    ),
+    "itineraries": ("destination", "day", "title", "detail"),
+}
+LIST_COLUMNS = ("amenities", "gallery")
+BOOLEAN_COLUMNS = ("is_featured", "is_available")
+LIST_SEPARATOR = "|"
+FORMATS = ("csv", "jsonl")
+
+BATCH_SIZE = 1000
+# bulk_update() writes one CASE WHEN per field listing every row of its
+# batch, so its cost grows with the square of the batch; keep it small.
+UPDATE_BATCH_SIZE = 100
+
+
+class ImportFailed(ValueError):
+    """A row that cannot be imported; the batches before it are kept."""
+
+    def __init__(self, row, message):
+        super().__init__(f"Row {row}: {message}")
+        self.row = row
+
+
+# --- Reading and writing rows ---
+
+
+def _boolean(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y")
+
+
+def read_rows(stream, fmt):
+    """Yield the rows of ``stream`` as dicts, with list and boolean columns parsed."""
+    if fmt == "csv":
+        rows = csv.DictReader(stream)
+    else:
+        rows = (json.loads(line) for line in stream if line.strip())
+    for row in rows:
+        for name in LIST_COLUMNS:
+            if isinstance(row.get(name), str):
+                row[name] = [v.strip() for v in row[name].split(LIST_SEPARATOR)]
+                row[name] = [value for value in row[name] if value]
+        for name in BOOLEAN_COLUMNS:
+            if row.get(name) is not None:
+                row[name] = _boolean(row[name])
+        yield row
+
+
+def write_rows(stream, fmt, kind, rows):
+    """Write the dicts ``rows`` to ``stream``. Returns the number written."""
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(stream, COLUMNS[kind])
+        writer.writeheader()
+    for row in rows:
+        if fmt == "csv":
+            for name in LIST_COLUMNS:
+                if name in row:
+                    row[name] = LIST_SEPARATOR.join(row[name])
+            writer.writerow(row)
+        else:
+            stream.write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+        count += 1
+    return count
+
+
+# --- Export ---
+
+
+def _by_pk(queryset, size):
+    """Batches of ``queryset`` (values dicts with "id"), read by primary key range."""
+    last = 0
+    while batch := list(queryset.filter(pk__gt=last).order_by("pk")[:size]):
+        last = batch[-1]["id"]
+        yield batch
+
+
+def export_rows(kind, batch_size=BATCH_SIZE):
+    """Yield every object of ``kind`` as a row dict."""
+    if kind == "destinations":
+        destinations = Destination.objects.values("id", *COLUMNS[kind])
+        for batch in _by_pk(destinations, batch_size):
+            for row in batch:
+                del row["id"]
+                yield row
+    elif kind == "hotels":
+        fields = [name for name in COLUMNS[kind] if name not in LIST_COLUMNS]
+        fields[fields.index("destination")] = "destination__slug"
+        hotels = Hotel.objects.values("id", *fields)
+        for batch in _by_pk(hotels, batch_size):
+            pks = [row["id"] for row in batch]
+            amenities, gallery = {}, {}
+            links = Hotel.amenities.through.objects.filter(hotel_id__in=pks)
+            for hotel_id, name in links.values_list("hotel_id", "amenity__name"):
+                amenities.setdefault(hotel_id, []).append(name)
+            images = GalleryImage.objects.filter(hotel_id__in=pks).order_by("pk")
+            for hotel_id, image in images.values_list("hotel_id", "image"):
+                gallery.setdefault(hotel_id, []).append(image)
+            for row in batch:
+                pk = row.pop("id")
+                row["destination"] = row.pop("destination__slug")
+                row["phone_number"] = str(row["phone_number"] or "")
+                row["amenities"] = sorted(amenities.get(pk, []))
+                row["gallery"] = gallery.get(pk, [])
+                yield row
+    elif kind == "itineraries":
+        days = Itinerary.objects.values(
+            "id", "destination__slug", "day", "title", "detail"
+        )
+        for batch in _by_pk(days, batch_size):
+            for row in batch:
+                del row["id"]
+                row["destination"] = row.pop("destination__slug")
+                yield row
+    else:
+        raise ValueError(f"Unknown kind: {kind!r}")
+
+
+# --- Import ---
+
+
+class Importer:
+    """
+    Imports rows of one kind in batches; call :meth:`finish` once after the
+    last batch. Counts the objects ``created`` and ``updated``.
+    """
+
+    def __init__(self, kind, batch_size=BATCH_SIZE):
+        if kind not in COLUMNS:
+            raise ValueError(f"Unknown kind: {kind!r}")
+        self.kind = kind
+        self.batch_size = batch_size
+        self.created = 0
+        self.updated = 0
+        self.rows = 0
+        # Looked up once per import, not per batch.
+        self._destinations = {}
+        self._amenities = None
+        # Work deferred to finish().
+        self.touched_destinations = set()
+        self.tags = set()
+        self.images = {}
+
+    def run(self, rows):
+        for batch in batches(rows, self.batch_size):
+            with transaction.atomic():
+                getattr(self, f"_import_{self.kind}")(batch)
+            self.rows += len(batch)
+        return self
+
+    def finish(self):
+        """Refresh what the model signals would have after single saves."""
+        pks = sorted(self.touched_destinations)
+        for start in range(0, len(pks), self.batch_size):
+            destination_stats.refresh(pks[start : start + self.batch_size])
+        self.tags.update(
+            page_cache.collection_tag(model) for model in (Destination, Hotel, Amenity)
+        )
+        self.tags.update((FEATURED_DESTINATIONS, FEATURED_HOTELS))
+        self.tags.update(f"destination:{pk}" for pk in pks)
+        page_cache.invalidate(*self.tags)
+        jobs.enqueue_many(
+            "build_renditions", [renditions_job(obj) for obj in self.images.values()]
+        )
+
+    # Helpers
+
+    def _row_number(self, n):
+        # Rows are numbered from 1, after the CSV header if there is one.
+        return self.rows + n + 1
+
+    def _check(self, n, obj, exclude):
+        try:
+            obj.clean_fields(exclude=exclude)
+        except ValidationError as exc:
+            raise ImportFailed(self._row_number(n), exc.message_dict) from exc
+
+    def _destination_ids(self, batch):
+        wanted = {row.get("destination") for row in batch} - set(self._destinations)
+        if wanted:
+            found = Destination.objects.filter(slug__in=wanted).only(
+                "id", "name", "slug"
+            )
+            self._destinations.update(
+                (destination.slug, destination) for destination in found
+            )
+        for n, row in enumerate(batch):
+            if row.get("destination") not in self._destinations:
+                raise ImportFailed(
+                    self._row_number(n),
+                    f"Unknown destination {row.get('destination')!r}.",
+                )
+        return self._destinations
+
+    def _amenity(self, name):
+        if self._amenities is None:
+            self._amenities = {a.name: a for a in Amenity.objects.all()}
+        if name not in self._amenities:
+            # Rare, and Amenity.save() allocates the amenity's mask bit.
+            self._amenities[name] = Amenity.objects.create(name=name)
+        return self._amenities[name]
+
+    def _assign(self, n, obj, given):
+        """Set the values of ``given`` that differ on ``obj``; return their names."""
+        differs = set()
+        for name, value in given.items():
+            field = obj._meta.get_field(name)
+            try:
+                if field.is_relation:
+                    same = getattr(obj, field.attname) == value.pk
+                else:
+                    same = field.value_from_object(obj) == field.to_python(value)
+            except ValidationError as exc:
+                raise ImportFailed(self._row_number(n), {name: exc.messages})
+            if not same:
+                setattr(obj, name, value)
+                differs.add(name)
+        return differs
+
+    def _given(self, row, columns):
+        """The columns of ``row`` to set; an empty slug means "allocate one"."""
+        return {
+            name: value
+            for name, value in row.items()
+            if name in columns and value is not None and (name != "slug" or value)
+        }
+
+    def _split(self, model, batch, key):
+        """``[(n, row, existing object or None)]`` for the rows of ``batch``."""
+        values = {row[key] for row in batch if row.get(key)}
+        existing = {}
+        if values:
+            found = model.objects.filter(**{f"{key}__in": values})
+            existing = {getattr(obj, key): obj for obj in found}
+        return [
+            (n, row, existing.get(row.get(key)) if row.get(key) else None)
+            for n, row in enumerate(batch)
+        ]
+
+    def _save(self, model, new, changed, fields):
+        """Insert ``new`` (allocating slugs) and write ``fields`` of ``changed``."""
+        model.objects.bulk_create(new, batch_size=self.batch_size)
+        if changed and fields:
+            model.objects.bulk_update(changed, fields, batch_size=UPDATE_BATCH_SIZE)
+        self.created += len(new)
+        self.updated += len(changed)
+        self.tags.update(page_cache.object_tag(obj) for obj in changed)
+
+    # Kinds
+
+    def _import_destinations(self, batch):
+        by_slug = self._split(Destination, batch, "slug")
+        names = {row.get("name") for _, row, obj in by_slug if obj is None}
+        by_name = {d.name: d for d in Destination.objects.filter(name__in=names)}
+        new, changed, fields = [], [], set()
+        for n, row, obj in by_slug:
+            obj = obj or by_name.get(row.get("name"))
+            given = self._given(row, COLUMNS["destinations"])
+            if obj is None:
+                obj = Destination(**given)
+                new.append(obj)
+                differs = given
+            else:
+                differs = self._assign(n, obj, given)
+                if not differs:
+                    continue
+                changed.append(obj)
+                fields.update(differs)
+            self._check(n, obj, exclude=["slug"])
+            if "image" in differs and obj.image:
+                self.images.setdefault(obj.image.name, obj)
+        self._save(Destination, new, changed, fields)
+        search.index(*new, *changed)
+        self.touched_destinations.update(obj.pk for obj in changed)
+        for obj in new + changed:
+            self._destinations[obj.slug] = obj
+
+    def _import_hotels(self, batch):
+        destinations = self._destination_ids(batch)
+        columns = [c for c in COLUMNS["hotels"] if c not in LIST_COLUMNS]
+        new, changed, fields = [], [], set()
+        hotels = []
+        for n, row, obj in self._split(Hotel, batch, "slug"):
+            given = self._given(row, columns)
+            given["destination"] = destinations[row["destination"]]
+            if obj is None:
+                obj = Hotel(**given)
+                new.append(obj)
+                differs = given
+            else:
+                # Amenities and gallery images may change all the same.
+                self.tags.add(page_cache.object_tag(obj))
+                self.touched_destinations.add(obj.destination_id)
+                differs = self._assign(n, obj, given)
+                # The cached destination serves the search index below.
+                obj.destination = given["destination"]
+                if differs:
+                    changed.append(obj)
+                    fields.update(differs)
+            obj._import_row = row
+            hotels.append(obj)
+            if not differs:
+                continue
+            self._check(n, obj, exclude=["slug", "destination"])
+            if "image" in differs and obj.image:
+                self.images.setdefault(obj.image.name, obj)
+        self._save(Hotel, new, changed, fields)
+
+        through = Hotel.amenities.through
+        relinked = [
+            hotel.pk
+            for hotel in hotels
+            if hotel._import_row.get("amenities") is not None
+        ]
+        through.objects.filter(hotel_id__in=relinked).delete()
+        through.objects.bulk_create(
+            [
+                through(hotel_id=hotel.pk, amenity_id=self._amenity(name).pk)
+                for hotel in hotels
+                for name in dict.fromkeys(hotel._import_row.get("amenities") or ())
+            ],
+            batch_size=self.batch_size,
+        )
+        hotel_search.refresh_masks(relinked)
+
+        have = set(
+            GalleryImage.objects.filter(hotel__in=hotels).values_list(
+                "hotel_id", "image"
+            )
+        )
+        gallery = [
+            GalleryImage(hotel_id=hotel.pk, image=image)
+            for hotel in hotels
+            for image in dict.fromkeys(hotel._import_row.get("gallery") or ())
+            if (hotel.pk, image) not in have
+        ]
+        GalleryImage.objects.bulk_create(gallery, batch_size=self.batch_size)
+        for image in gallery:
+            self.images.setdefault(image.image.name, image)
+
+        search.index(*new, *changed)
+        self.touched_destinations.update(hotel.destination_id for hotel in hotels)
+
+    def _import_itineraries(self, batch):
+        destinations = self._destination_ids(batch)
+        ids = {destinations[row["destination"]].pk for row in batch}
+        existing = {
+            (day.destination_id, day.day): day
+            for day in Itinerary.objects.filter(destination_id__in=ids)
+        }
+        new, changed = [], {}
+        for n, row in enumerate(batch):
+            destination = destinations[row["destination"]]
+            try:
+                day = int(row["day"])
+            except (KeyError, TypeError, ValueError):
+                raise ImportFailed(self._row_number(n), "day must be a number.")
+            obj = existing.get((destination.pk, day))
+            if obj is None:
+                obj = Itinerary(destination=destination, day=day)
+                existing[(destination.pk, day)] = obj
+                new.append(obj)
+            elif obj.pk is not None:
+                changed[obj.pk] = obj
+            obj.title = row.get("title", obj.title)
+            obj.detail = row.get("detail", obj.detail)
+            self._check(n, obj, exclude=["destination"])
+        changed = list(changed.values())
+        Itinerary.objects.bulk_create(new, batch_size=self.batch_size)
+        Itinerary.objects.bulk_update(
+            changed, ["title", "detail"], batch_size=UPDATE_BATCH_SIZE
+        )
+        self.created += len(new)
+        self.updated += len(changed)
+        self.touched_destinations.update(ids)
@@ -0,0 +1,53 @@
+"""
+Conditional GET (ETag / Last-Modified) for the detail pages.
+
+The validators are derived from the ``updated_at`` markers of the objects
+a page shows, which the model signals keep current. A revalidating client
+therefore costs one indexed lookup and a ``304 Not Modified`` instead of
+a render.
+"""
+
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.views.decorators.http import condition
+
+
+def last_modified_condition(lookup):
+    """
+    Decorate a view with ``condition()`` driven by ``lookup``.
+
+    ``lookup`` receives the view's URL arguments and returns the datetime
+    the page last changed, or ``None`` if its object does not exist (the
+    view then runs and answers 404 as usual). The result is memoized on
+    the request, so the ETag and Last-Modified checks share one query.
+    """
+
+    def last_modified(request, *args, **kwargs):
+        if not hasattr(request, "_last_modified"):
+            request._last_modified = lookup(*args, **kwargs)
+        return request._last_modified
+
+    def etag(request, *args, **kwargs):
+        modified = last_modified(request, *args, **kwargs)
+        if modified is None:
+            return None
+        raw = f"{request.path}|{modified.isoformat()}".encode()
+        return hashlib.md5(raw, usedforsecurity=False).hexdigest()
+
+    def decorator(view):
+        conditional = condition(etag_func=etag, last_modified_func=last_modified)(
+            view
+        )
+        if not iscoroutinefunction(view):
+            return conditional
+
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            request._last_modified = await sync_to_async(lookup)(*args, **kwargs)
+            return await conditional(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,71 @@
+"""
+Hotel figures shown with each destination: "N hotels from ₹X, avg ★Y".
+
+They are stored on the destination row (``hotel_count``, ``min_price``,
+``avg_rating``) so listing pages read them like any other column. Only
+hotels that accept bookings (``is_available``) count.
+
+:func:`refresh` recomputes the figures of a few destinations in one
+UPDATE. The receivers in :mod:`my_app.signals` call it when a hotel is
+created or deleted, or changes destination, availability, price or
+rating. Bulk ``QuerySet.update()`` calls send no signals; the
+``rebuild_destination_stats`` command repairs what they leave behind and
+``--check`` reports it (see :func:`drift`).
+"""
+
+from django.db.models import Avg, Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+
+from .models import Destination, Hotel
+
+FIELDS = ("hotel_count", "min_price", "avg_rating")
+
+
+def figures(hotel_model=Hotel):
+    """Expressions computing ``FIELDS`` for the destination of the outer query."""
+    hotels = (
+        hotel_model._default_manager.filter(
+            destination_id=OuterRef("pk"), is_available=True
+        )
+        .order_by()
+        .values("destination_id")
+    )
+
+    def over_hotels(aggregate):
+        return Subquery(hotels.annotate(value=aggregate).values("value"))
+
+    return {
+        "hotel_count": Coalesce(over_hotels(Count("pk")), 0),
+        "min_price": over_hotels(Min("price_per_night")),
+        "avg_rating": over_hotels(Round(Avg("rating"), 2)),
+    }
+
+
+def refresh(destination_pks):
+    """Recompute the figures of ``destination_pks`` and mark the rows changed."""
+    return Destination.objects.filter(pk__in=destination_pks).update(
+        updated_at=timezone.now(), **figures()
+    )
+
+
+def rebuild(destination_model=Destination, hotel_model=Hotel):
+    """Recompute the figures of every destination. Returns the rows updated."""
+    return destination_model._default_manager.update(**figures(hotel_model))
+
+
+def drift():
+    """
+    The destinations whose stored figures differ from their hotels, as
+    ``[(destination, field, stored, actual)]``, from a single query.
+    """
+    actual = {f"actual_{name}": value for name, value in figures().items()}
+    rows = Destination.objects.only("id", "name", *FIELDS).annotate(**actual)
+    drifted = []
+    for destination in rows:
+        for name in FIELDS:
+            stored = getattr(destination, name)
+            value = getattr(destination, f"actual_{name}")
+            if stored != value:
+                drifted.append((destination, name, stored, value))
+    return drifted
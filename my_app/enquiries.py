@@ -0,0 +1,163 @@
+"""
+Contact form intake, without a write transaction per submission.
+
+A valid enquiry goes through three steps before the visitor is thanked:
+
+* **Rate limit.** Every client address and every e-mail address has a
+  token bucket in the cache holding ``ENQUIRY_RATE_BURST`` tokens, one
+  earned back every ``ENQUIRY_RATE_INTERVAL`` seconds. An enquiry takes
+  one token from both; when either is empty it is refused.
+* **De-duplication.** An enquiry with the same e-mail address, subject and
+  message (ignoring case and spacing) as one accepted in the last
+  ``ENQUIRY_DEDUP_WINDOW`` seconds is dropped, without using a token.
+  The visitor is thanked all the same.
+* **Buffered write.** Accepted enquiries are kept in process memory and
+  saved by ``flush()`` with one ``bulk_create()``, which queues their
+  ``notify_enquiry`` jobs in the same transaction. It runs once
+  ``ENQUIRY_FLUSH_SIZE`` enquiries are buffered,
+  ``ENQUIRY_FLUSH_INTERVAL`` seconds after the first one, and when the
+  process exits. A failed flush keeps its enquiries for the next one.
+
+A spam burst therefore costs cache reads rather than database writes,
+and real enquiries reach the database a few at a time. Like
+:mod:`my_app.view_counts`, the buffer is per process and a hard kill
+loses what it holds.
+
+The buckets are read and written without a lock, so processes racing on
+one bucket may together take a token or two more than it held.
+"""
+
+import atexit
+import hashlib
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+
+from . import jobs
+from .models import Enquiry
+
+logger = logging.getLogger(__name__)
+
+ACCEPTED = "accepted"
+DUPLICATE = "duplicate"
+LIMITED = "limited"
+
+_pending = []
+_lock = threading.Lock()
+_timer = None
+
+
+def _digest(*parts):
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+def client_address(request):
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def take_token(bucket):
+    """Take a token from ``bucket``; False if it is empty."""
+    burst = settings.ENQUIRY_RATE_BURST
+    interval = settings.ENQUIRY_RATE_INTERVAL
+    key = f"enquiry:rate:{_digest(bucket)}"
+    now = time.time()
+    tokens, updated = cache.get(key, (burst, now))
+    tokens = min(burst, tokens + (now - updated) / interval)
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    # Once full again, a bucket is the same as a missing one.
+    cache.set(key, (tokens, now), int((burst - tokens) * interval) + 1)
+    return allowed
+
+
+def content_key(enquiry):
+    """The cache key of ``enquiry``'s content, for de-duplication."""
+    normalized = (
+        re.sub(r"\s+", " ", value).strip().casefold()
+        for value in (enquiry.email, enquiry.subject, enquiry.message)
+    )
+    return f"enquiry:seen:{_digest(*normalized)}"
+
+
+def submit(enquiry, address):
+    """
+    Take an unsaved, validated ``enquiry`` sent from ``address``.
+
+    Returns ``ACCEPTED`` if it was buffered for writing, ``DUPLICATE`` if
+    it repeats a recent enquiry, or ``LIMITED`` if the sender has to wait.
+    """
+    seen = content_key(enquiry)
+    if cache.get(seen) is not None:
+        return DUPLICATE
+    buckets = [f"address:{address}", f"email:{enquiry.email.casefold()}"]
+    # Take from every bucket, so that no single one can be used to pace.
+    if not all([take_token(bucket) for bucket in buckets]):
+        return LIMITED
+    if not cache.add(seen, True, settings.ENQUIRY_DEDUP_WINDOW):
+        return DUPLICATE
+    _buffer(enquiry)
+    return ACCEPTED
+
+
+def _buffer(enquiry):
+    global _timer
+    with _lock:
+        _pending.append(enquiry)
+        buffered = len(_pending)
+        if _timer is None:
+            _timer = threading.Timer(settings.ENQUIRY_FLUSH_INTERVAL, _flush_later)
+            _timer.daemon = True
+            _timer.start()
+    if buffered >= settings.ENQUIRY_FLUSH_SIZE:
+        flush()
+
+
+def pending():
+    """The buffered, not yet written, enquiries."""
+    with _lock:
+        return list(_pending)
+
+
+def flush():
+    """Write the buffered enquiries and queue their e-mails. Returns how many."""
+    global _timer
+    with _lock:
+        enquiries = list(_pending)
+        _pending.clear()
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+    if not enquiries:
+        return 0
+    try:
+        with transaction.atomic():
+            Enquiry.objects.bulk_create(enquiries)
+            jobs.enqueue_many(
+                "notify_enquiry",
+                [({"enquiry_id": enquiry.pk}, "") for enquiry in enquiries],
+            )
+    except DatabaseError:
+        logger.warning("Could not write %d enquiries; retrying later.", len(enquiries))
+        for enquiry in enquiries:
+            enquiry.pk = None
+        with _lock:
+            _pending[:0] = enquiries
+        return 0
+    return len(enquiries)
+
+
+def _flush_later():
+    try:
+        flush()
+    finally:
+        # The timer thread has its own database connection.
+        connection.close()
+
+
+atexit.register(flush)
@@ -0,0 +1,53 @@
+"""
+Atom feed of the latest published blog posts, at ``/blog/feed/``.
+
+Like the sitemaps it is served through :func:`my_app.page_cache.versioned`:
+generated once, kept in the cache until a post or category changes, and
+answered ``304`` to feed readers that send back its ETag.
+"""
+
+from django.contrib.syndication.views import Feed
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+
+from . import page_cache, queries
+from .models import BlogPost, Category
+
+FEED_POSTS = 20
+
+
+class LatestPostsFeed(Feed):
+    feed_type = Atom1Feed
+    title = "Adrija Tours & Travels Blog"
+    subtitle = "Travel guides and stories from Adrija Tours & Travels."
+    author_name = "Adrija Tours & Travels"
+
+    def link(self):
+        return reverse("blog")
+
+    def items(self):
+        return queries.feed_posts()[:FEED_POSTS]
+
+    def item_title(self, post):
+        return post.title
+
+    def item_description(self, post):
+        return post.excerpt
+
+    def item_pubdate(self, post):
+        return post.published_at
+
+    def item_updateddate(self, post):
+        return post.updated_at
+
+    def item_categories(self, post):
+        return [post.category.name] if post.category else []
+
+
+def feed_tags():
+    return [page_cache.collection_tag(BlogPost), page_cache.collection_tag(Category)]
+
+
+@page_cache.versioned(feed_tags)
+def blog_feed(request):
+    return LatestPostsFeed()(request)
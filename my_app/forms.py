@@ -0,0 +1,96 @@
+import calendar
+
+from django import forms
+
+from . import availability, hotel_search
+from .models import Enquiry, RateRule
+
+
+class HotelFilterForm(forms.Form):
+    """
+    Filters of the hotel listing. The destination and amenity choices are
+    passed in, so that the view reads each list once.
+    """
+
+    destination = forms.TypedChoiceField(coerce=int, required=False, empty_value=None)
+    amenities = forms.TypedMultipleChoiceField(
+        coerce=int, required=False, widget=forms.CheckboxSelectMultiple
+    )
+    rating = forms.ChoiceField(
+        required=False,
+        choices=[("", "Any")]
+        + [(key, label) for key, (label, _, _) in hotel_search.RATING_BANDS.items()],
+    )
+    price = forms.ChoiceField(
+        required=False,
+        choices=[("", "Any")]
+        + [(key, label) for key, (label, _, _) in hotel_search.PRICE_BUCKETS.items()],
+    )
+    available = forms.BooleanField(required=False, label="Accepting bookings")
+
+    def __init__(self, *args, destinations=(), amenities=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["destination"].choices = [("", "Anywhere")] + [
+            (destination.pk, destination.name) for destination in destinations
+        ]
+        self.fields["amenities"].choices = [
+            (amenity.pk, amenity.name) for amenity in amenities
+        ]
+
+
+class StayForm(forms.Form):
+    """Dates and party size of a stay, as entered on the hotel listing."""
+
+    check_in = forms.DateField(widget=forms.DateInput(attrs={"type": "date"}))
+    check_out = forms.DateField(widget=forms.DateInput(attrs={"type": "date"}))
+    guests = forms.IntegerField(min_value=1, max_value=20, initial=1, required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        check_in = cleaned_data.get("check_in")
+        check_out = cleaned_data.get("check_out")
+        if check_in and check_out:
+            availability.validate_stay(check_in, check_out)
+        cleaned_data["guests"] = cleaned_data.get("guests") or 1
+        return cleaned_data
+
+
+class EnquiryForm(forms.ModelForm):
+    """The contact form. Phone numbers without a country code are read as Indian."""
+
+    class Meta:
+        model = Enquiry
+        fields = ["name", "email", "phone_number", "subject", "message"]
+
+
+class RateRuleForm(forms.ModelForm):
+    """
+    Edits ``RateRule.weekdays`` (a bit mask) as one checkbox per night of
+    the week.
+    """
+
+    weekdays = forms.TypedMultipleChoiceField(
+        choices=list(enumerate(calendar.day_abbr)),
+        coerce=int,
+        widget=forms.CheckboxSelectMultiple,
+        help_text="The nights of the week the rule applies to.",
+    )
+
+    class Meta:
+        model = RateRule
+        fields = ("name", "start_date", "end_date", "weekdays", "min_guests", "percent")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        mask = self.instance.weekdays if self.instance.pk else RateRule.EVERY_DAY
+        self.initial["weekdays"] = [day for day in range(7) if mask & (1 << day)]
+
+    def clean_weekdays(self):
+        return sum(1 << day for day in self.cleaned_data["weekdays"])
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get("start_date"), cleaned_data.get("end_date")
+        if start and end and end < start:
+            self.add_error("end_date", "The end date must be on or after the start.")
+        return cleaned_data
@@ -0,0 +1,139 @@
+"""
+Faceted hotel search.
+
+Every amenity owns one bit (``Amenity.bit``) and every hotel stores the
+bits of its amenities in ``Hotel.amenity_mask``, so "has Pool and Wi-Fi
+and Gym" is one comparison on the hotel row instead of a join per
+amenity::
+
+    amenity_mask & (pool | wifi | gym) = (pool | wifi | gym)
+
+The masks are kept current by the ``m2m_changed`` and amenity delete
+receivers in :mod:`my_app.signals`, through :func:`refresh_masks`.
+
+:func:`facet_counts` counts the filtered hotels per amenity, rating band
+and price bucket with one aggregate query, i.e. one pass over the rows.
+"""
+
+from decimal import Decimal
+
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import Exact
+
+from .models import Hotel
+
+# Key -> (label, lowest rating, highest rating exclusive).
+RATING_BANDS = {
+    "4.5": ("4.5 and up", Decimal("4.5"), None),
+    "4": ("4.0 – 4.4", Decimal("4.0"), Decimal("4.5")),
+    "3": ("3.0 – 3.9", Decimal("3.0"), Decimal("4.0")),
+    "0": ("Below 3.0", None, Decimal("3.0")),
+}
+
+# Key -> (label, lowest nightly price, highest price exclusive).
+PRICE_BUCKETS = {
+    "0-2000": ("Under ₹2,000", None, Decimal(2000)),
+    "2000-5000": ("₹2,000 – ₹5,000", Decimal(2000), Decimal(5000)),
+    "5000-10000": ("₹5,000 – ₹10,000", Decimal(5000), Decimal(10000)),
+    "10000-": ("₹10,000 and up", Decimal(10000), None),
+}
+
+
+def mask_of(amenities):
+    mask = 0
+    for amenity in amenities:
+        mask |= amenity.flag
+    return mask
+
+
+def refresh_masks(hotel_pks):
+    """Recompute ``amenity_mask`` of the hotels ``hotel_pks`` in one UPDATE."""
+    through = Hotel.amenities.through
+    # A hotel has each amenity at most once, so the sum of the flags is
+    # their bitwise OR.
+    flags = (
+        through.objects.filter(hotel_id=OuterRef("pk"))
+        .values("hotel_id")
+        .annotate(mask=Sum(Value(1).bitleftshift(F("amenity__bit"))))
+        .values("mask")
+    )
+    Hotel.objects.filter(pk__in=hotel_pks).update(
+        amenity_mask=Coalesce(Subquery(flags), 0)
+    )
+
+
+def _range(field, low, high):
+    condition = Q()
+    if low is not None:
+        condition &= Q(**{f"{field}__gte": low})
+    if high is not None:
+        condition &= Q(**{f"{field}__lt": high})
+    return condition
+
+
+def _has_all(mask):
+    return Exact(F("amenity_mask").bitand(mask), mask)
+
+
+def filter_hotels(
+    queryset,
+    destination=None,
+    amenities=(),
+    rating=None,
+    price=None,
+    available_only=False,
+):
+    """
+    Narrow ``queryset`` to hotels at ``destination`` (a pk) that have every
+    one of ``amenities``, fall in the ``rating`` band and ``price`` bucket
+    (keys of ``RATING_BANDS`` / ``PRICE_BUCKETS``) and, with
+    ``available_only``, accept bookings.
+    """
+    if destination:
+        queryset = queryset.filter(destination_id=destination)
+    if amenities:
+        queryset = queryset.filter(_has_all(mask_of(amenities)))
+    if rating:
+        _, low, high = RATING_BANDS[rating]
+        queryset = queryset.filter(_range("rating", low, high))
+    if price:
+        _, low, high = PRICE_BUCKETS[price]
+        queryset = queryset.filter(_range("price_per_night", low, high))
+    if available_only:
+        queryset = queryset.filter(is_available=True)
+    return queryset
+
+
+def facet_counts(queryset, amenities):
+    """
+    Count the hotels of ``queryset`` with each of ``amenities``, in each
+    rating band and in each price bucket, with a single query.
+
+    Returns ``{"total": n, "amenities": [(amenity, n)], "ratings":
+    [(key, label, n)], "prices": [(key, label, n)]}``.
+    """
+    aggregates = {"total": Count("pk")}
+    for amenity in amenities:
+        aggregates[f"amenity_{amenity.pk}"] = Count(
+            "pk", filter=_has_all(amenity.flag)
+        )
+    for n, (_, low, high) in enumerate(RATING_BANDS.values()):
+        aggregates[f"rating_{n}"] = Count("pk", filter=_range("rating", low, high))
+    for n, (_, low, high) in enumerate(PRICE_BUCKETS.values()):
+        aggregates[f"price_{n}"] = Count(
+            "pk", filter=_range("price_per_night", low, high)
+        )
+    counts = queryset.order_by().aggregate(**aggregates)
+    return {
+        "total": counts["total"],
+        "amenities": [(a, counts[f"amenity_{a.pk}"]) for a in amenities],
+        "ratings": [
+            (key, label, counts[f"rating_{n}"])
+            for n, (key, (label, _, _)) in enumerate(RATING_BANDS.items())
+        ],
+        "prices": [
+            (key, label, counts[f"price_{n}"])
+            for n, (key, (label, _, _)) in enumerate(PRICE_BUCKETS.items())
+        ],
+    }
@@ -0,0 +1,280 @@
+"""
+A small persistent job queue stored in the project database.
+
+Work that does not have to happen inside a request (building image
+renditions, re-warming evicted pages, notification e-mails) is registered
+as a *task* and enqueued as a :class:`~my_app.models.Job` row::
+
+    @jobs.task("send_report")
+    def send_report(day):
+        ...
+
+    jobs.enqueue("send_report", key=f"report:{day}", payload={"day": day})
+
+The project's own tasks live in :mod:`my_app.tasks`.
+
+``manage.py runjobs`` claims and runs queued jobs. It needs no broker,
+only the database.
+
+* Jobs are claimed with a conditional ``UPDATE`` (``status='queued'`` →
+  ``'running'``), so two workers can never run the same job.
+* A job whose task raises is retried with exponential backoff
+  (``JOBS_RETRY_DELAY`` seconds, doubled on every attempt) until
+  ``max_attempts`` is reached, and then marked failed.
+* A non-empty ``key`` makes enqueueing idempotent: while a job with that
+  key is still queued, enqueueing it again returns the existing job.
+* Jobs left running by a crashed worker are re-queued after
+  ``JOBS_STALE_AFTER`` seconds.
+* A long task can call :func:`report_progress`; the admin shows the
+  figures on the job's progress page.
+"""
+
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, F, Min
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Task name -> callable taking the job payload as keyword arguments.
+tasks = {}
+
+# The job being run by this thread, for report_progress().
+_running = threading.local()
+
+
+def task(name):
+    """Register the decorated function as the task ``name``."""
+
+    def register(func):
+        tasks[name] = func
+        return func
+
+    return register
+
+
+def enqueue(task_name, payload=None, key="", delay=0, max_attempts=None):
+    """
+    Queue ``task_name`` to run with ``payload`` in ``delay`` seconds.
+
+    Returns the new job, or the already queued job with the same ``key``.
+    """
+    if task_name not in tasks:
+        raise KeyError(f"Unknown task {task_name!r}.")
+    while True:
+        job = Job(
+            task=task_name,
+            key=key,
+            payload=payload or {},
+            run_at=timezone.now() + timedelta(seconds=delay),
+            max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        )
+        try:
+            with transaction.atomic():
+                job.save()
+            return job
+        except IntegrityError:
+            if not key:
+                raise
+        queued = Job.objects.filter(key=key, status=Job.QUEUED).first()
+        if queued is not None:
+            return queued
+        # A worker claimed the queued job meanwhile; queue a new one.
+
+
+def enqueue_many(task_name, jobs, delay=0, max_attempts=None):
+    """
+    Queue ``task_name`` once per ``(payload, key)`` of ``jobs`` with bulk
+    inserts, skipping keys that already have a queued job.
+    """
+    if task_name not in tasks:
+        raise KeyError(f"Unknown task {task_name!r}.")
+    run_at = timezone.now() + timedelta(seconds=delay)
+    max_attempts = max_attempts or settings.JOBS_MAX_ATTEMPTS
+    Job.objects.bulk_create(
+        [
+            Job(
+                task=task_name,
+                key=key,
+                payload=payload or {},
+                run_at=run_at,
+                max_attempts=max_attempts,
+            )
+            for payload, key in jobs
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim(worker, batch=10):
+    """Mark the next due job as running for ``worker`` and return it, if any."""
+    now = timezone.now()
+    candidates = (
+        Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+        .order_by("run_at", "id")
+        .values_list("pk", flat=True)[:batch]
+    )
+    for pk in list(candidates):
+        claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING,
+            started_at=now,
+            worker=worker,
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def retry_delay(attempts):
+    """Seconds to wait before attempt ``attempts + 1``."""
+    return min(settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1), 60 * 60)
+
+
+def run(job):
+    """Run a claimed job and record its outcome."""
+    func = tasks.get(job.task)
+    _running.job = job
+    try:
+        if func is None:
+            raise KeyError(f"Unknown task {job.task!r}.")
+        func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s failed (attempt %d)", job, job.attempts)
+        _record_failure(job, error)
+    else:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.DONE, finished_at=timezone.now(), last_error=""
+        )
+    finally:
+        _running.job = None
+
+
+def report_progress(done, total):
+    """Record how far the job run by this thread has got; a no-op outside jobs."""
+    job = getattr(_running, "job", None)
+    if job is not None:
+        Job.objects.filter(pk=job.pk).update(progress=done, total=total)
+
+
+def _record_failure(job, error):
+    now = timezone.now()
+    if job.attempts >= job.max_attempts:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED, finished_at=now, last_error=error
+        )
+        return
+    try:
+        with transaction.atomic():
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.QUEUED,
+                run_at=now + timedelta(seconds=retry_delay(job.attempts)),
+                last_error=error,
+            )
+    except IntegrityError:
+        # A newer job with the same key was queued meanwhile; it supersedes
+        # this one.
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED, finished_at=now, last_error=error
+        )
+
+
+def run_next(worker):
+    """Claim and run one due job. Returns ``False`` if none was due."""
+    job = claim(worker)
+    if job is None:
+        return False
+    run(job)
+    return True
+
+
+def requeue_stale():
+    """
+    Give jobs abandoned by a crashed worker back to the queue, or fail
+    those that have used up their attempts (they may be what crashed it).
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.JOBS_STALE_AFTER)
+    stale = Job.objects.filter(status=Job.RUNNING, started_at__lt=cutoff)
+    stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Job.FAILED,
+        finished_at=timezone.now(),
+        last_error="The worker running this job stopped.",
+    )
+    requeued = 0
+    for pk in stale.values_list("pk", flat=True):
+        try:
+            with transaction.atomic():
+                requeued += Job.objects.filter(pk=pk, status=Job.RUNNING).update(
+                    status=Job.QUEUED, run_at=timezone.now()
+                )
+        except IntegrityError:
+            Job.objects.filter(pk=pk).update(
+                status=Job.FAILED, finished_at=timezone.now()
+            )
+    return requeued
+
+
+def purge(older_than):
+    """Delete finished jobs older than ``older_than`` (a timedelta)."""
+    cutoff = timezone.now() - older_than
+    deleted, _ = Job.objects.filter(
+        status__in=[Job.DONE, Job.FAILED], finished_at__lt=cutoff
+    ).delete()
+    return deleted
+
+
+def report(window=timedelta(hours=1)):
+    """
+    Queue depth and latency figures for ``manage.py jobstats``.
+
+    ``latency`` is the mean time from a job becoming due to a worker
+    starting it, ``runtime`` the mean time from start to finish, both over
+    jobs finished within ``window``.
+    """
+    now = timezone.now()
+    depth = dict(
+        Job.objects.order_by()
+        .values("status")
+        .annotate(count=Count("id"))
+        .values_list("status", "count")
+    )
+    oldest = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).aggregate(
+        oldest=Min("run_at")
+    )["oldest"]
+    recent = Job.objects.filter(status=Job.DONE, finished_at__gte=now - window)
+    timings = recent.aggregate(
+        jobs=Count("id"),
+        latency=Avg(F("started_at") - F("run_at")),
+        runtime=Avg(F("finished_at") - F("started_at")),
+    )
+    by_task = dict(
+        Job.objects.filter(status=Job.QUEUED)
+        .order_by()
+        .values("task")
+        .annotate(count=Count("id"))
+        .values_list("task", "count")
+    )
+    return {
+        "depth": {status: depth.get(status, 0) for status, _ in Job.STATUS_CHOICES},
+        "queued_by_task": by_task,
+        "oldest_due_age": (now - oldest) if oldest else None,
+        "finished_in_window": timings["jobs"],
+        "latency": timings["latency"],
+        "runtime": timings["runtime"],
+    }
+
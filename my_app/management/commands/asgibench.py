@@ -0,0 +1,151 @@
+import asyncio
+import contextlib
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+from Backend.asgi import AsyncViewsHandler
+from my_app.models import BlogPost, Destination, Hotel
+
+NO_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+def bench_host():
+    hosts = [host.lstrip(".") for host in settings.ALLOWED_HOSTS if host != "*"]
+    return hosts[0] if hosts else "localhost"
+
+
+def catalogue_paths():
+    """The homepage and the first destination, hotel and post pages."""
+    objects = [
+        Destination.objects.order_by("pk").first(),
+        Hotel.objects.order_by("pk").first(),
+        BlogPost.objects.filter(status="published").order_by("pk").first(),
+    ]
+    return ["/"] + [obj.get_absolute_url() for obj in objects if obj is not None]
+
+
+def wsgi_get(handler, path, host):
+    status = []
+    environ = RequestFactory(HTTP_HOST=host).get(path).environ
+    body = handler(environ, lambda code, headers, exc_info=None: status.append(code))
+    try:
+        b"".join(body)
+    finally:
+        body.close()
+    return status[0].startswith("200")
+
+
+async def asgi_get(handler, path, host):
+    status = []
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", host.encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": (host, 80),
+    }
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # The client stays connected; the handler cancels this once it is done.
+        await asyncio.Future()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await handler(scope, receive, send)
+    return status[0] == 200
+
+
+def timed(get, *args):
+    start = time.perf_counter()
+    ok = get(*args)
+    return (time.perf_counter() - start) * 1000, ok
+
+
+async def atimed(get, *args):
+    start = time.perf_counter()
+    ok = await get(*args)
+    return (time.perf_counter() - start) * 1000, ok
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the catalogue pages through the WSGI application and the "
+        "ASGI application (with its async views), in process and with "
+        "concurrent clients, and report requests/s and latency percentiles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--uncached",
+            action="store_true",
+            help="Disable the page and fragment caches, so every request renders.",
+        )
+
+    def handle(self, *args, **options):
+        host = bench_host()
+        paths = catalogue_paths()
+        self.stdout.write(f"Pages: {' '.join(paths)}")
+        urls = [paths[n % len(paths)] for n in range(options["requests"])]
+        caches = contextlib.nullcontext()
+        if options["uncached"]:
+            caches = override_settings(CACHES=NO_CACHE)
+        with caches:
+            for label, run in (("wsgi", self.run_wsgi), ("asgi", self.run_asgi)):
+                # One request per page first, to fill the caches and connections.
+                run(paths, host, options["concurrency"])
+                started = time.perf_counter()
+                results = run(urls, host, options["concurrency"])
+                self.report(label, results, time.perf_counter() - started)
+
+    def run_wsgi(self, urls, host, concurrency):
+        handler = WSGIHandler()
+
+        def one(path):
+            return timed(wsgi_get, handler, path, host)
+
+        with ThreadPoolExecutor(concurrency) as pool:
+            return list(pool.map(one, urls))
+
+    def run_asgi(self, urls, host, concurrency):
+        handler = AsyncViewsHandler()
+
+        async def main():
+            slots = asyncio.Semaphore(concurrency)
+
+            async def one(path):
+                async with slots:
+                    return await atimed(asgi_get, handler, path, host)
+
+            return await asyncio.gather(*(one(path) for path in urls))
+
+        return asyncio.run(main())
+
+    def report(self, label, results, seconds):
+        timings = sorted(ms for ms, _ in results)
+        errors = sum(1 for _, ok in results if not ok)
+        self.stdout.write(
+            f"{label:<5} req/s={len(results) / seconds:<8.0f} "
+            f"p50={statistics.median(timings):.2f}ms "
+            f"p99={timings[max(0, int(len(timings) * 0.99) - 1)]:.2f}ms "
+            f"errors={errors}"
+        )
@@ -0,0 +1,145 @@
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from my_app import availability
+from my_app.models import Booking, Destination, Hotel
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark availability lookups against synthetic bookings, in a "
+        "scratch copy of the schema in a temporary file. The site's database "
+        "is not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bookings", type=int, default=1_000_000)
+        parser.add_argument("--destinations", type=int, default=50)
+        parser.add_argument("--hotels-per-destination", type=int, default=20)
+        parser.add_argument("--years", type=int, default=20)
+        parser.add_argument("--lookups", type=int, default=200)
+
+    def handle(self, *args, **options):
+        # A long write transaction on the site's database would hold its
+        # only write lock for the whole run. Like the test runner, point
+        # the connection at a freshly migrated scratch database instead.
+        test_settings = connection.settings_dict["TEST"]
+        original_test_name = test_settings["NAME"]
+        with tempfile.TemporaryDirectory() as tmp:
+            test_settings["NAME"] = os.path.join(tmp, "availabilitybench.sqlite3")
+            try:
+                old_name = connection.creation.create_test_db(
+                    verbosity=0, autoclobber=True, serialize=False
+                )
+                try:
+                    self.run(options)
+                finally:
+                    connection.creation.destroy_test_db(old_name, verbosity=0)
+            finally:
+                test_settings["NAME"] = original_test_name
+
+    def run(self, options):
+        started = time.perf_counter()
+        destinations, hotel_ids = self.make_catalogue(options)
+        self.make_bookings(hotel_ids, options)
+        self.stdout.write(
+            f"Inserted {options['bookings']} bookings for {len(hotel_ids)} hotels "
+            f"in {time.perf_counter() - started:.1f}s."
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        span = 365 * options["years"]
+        first_day = date.today() - timedelta(days=span // 2)
+        timings = []
+        for _ in range(options["lookups"]):
+            destination = random.choice(destinations)
+            check_in = first_day + timedelta(days=random.randrange(span))
+            check_out = check_in + timedelta(days=random.randint(1, 7))
+            hotels = Hotel.objects.filter(destination=destination)
+            start = time.perf_counter()
+            list(availability.available_hotels(check_in, check_out, hotels))
+            timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+        self.stdout.write(
+            f"available_hotels() over {options['lookups']} random lookups: "
+            f"median={statistics.median(timings):.2f}ms "
+            f"p95={timings[int(len(timings) * 0.95) - 1]:.2f}ms "
+            f"max={timings[-1]:.2f}ms"
+        )
+        queryset = availability.available_hotels(
+            check_in, check_out, Hotel.objects.filter(destination=destination)
+        )
+        self.stdout.write(queryset.explain())
+
+    def make_catalogue(self, options):
+        destinations = Destination.objects.bulk_create(
+            Destination(
+                name=f"Bench destination {n}",
+                slug=f"bench-destination-{n}",
+                description="",
+                country="India",
+                best_time_to_visit="",
+            )
+            for n in range(options["destinations"])
+        )
+        hotels = Hotel.objects.bulk_create(
+            Hotel(
+                name=f"Bench hotel {d.pk}-{n}",
+                slug=f"bench-hotel-{d.pk}-{n}",
+                destination=d,
+                description="",
+                address="",
+                price_per_night=5000,
+                rating=4,
+            )
+            for d in destinations
+            for n in range(options["hotels_per_destination"])
+        )
+        return destinations, [hotel.pk for hotel in hotels]
+
+    def make_bookings(self, hotel_ids, options):
+        """Stays of 1-7 nights with random gaps, spread over ``years`` per hotel."""
+        user, _ = get_user_model().objects.get_or_create(username="availability-bench")
+        now = timezone.now()
+        per_hotel = options["bookings"] // len(hotel_ids)
+        span = 365 * options["years"]
+        first_day = date.today() - timedelta(days=span // 2)
+        # Mean stay is 4 nights; the gaps fill the rest of the span.
+        max_gap = max(0, int(2 * (span / per_hotel - 4)))
+        statuses = ["confirmed"] * 7 + ["pending", "cancelled"]
+        sql = (
+            f"INSERT INTO {Booking._meta.db_table} (user_id, hotel_id, "
+            "check_in_date, check_out_date, num_guests, total_price, status, "
+            "created_at, updated_at) VALUES (%s, %s, %s, %s, 2, 0, %s, %s, %s)"
+        )
+        with connection.cursor() as cursor:
+            for hotel_id in hotel_ids:
+                rows = []
+                day = first_day
+                for _ in range(per_hotel):
+                    day += timedelta(days=random.randint(0, max_gap))
+                    nights = random.randint(1, 7)
+                    rows.append(
+                        (
+                            user.pk,
+                            hotel_id,
+                            day,
+                            day + timedelta(days=nights),
+                            random.choice(statuses),
+                            now,
+                            now,
+                        )
+                    )
+                    day += timedelta(days=nights)
+                cursor.executemany(sql, rows)
@@ -0,0 +1,156 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Django's defaults: rollback journal, deferred transactions, a 5 second
+# busy timeout and a new connection for every request.
+DEFAULT_PROFILE = {"pragmas": {}, "begin": "BEGIN", "timeout": 5, "persistent": False}
+
+
+def tuned_profile():
+    """The profile configured for the default database in settings."""
+    options = settings.DATABASES["default"].get("OPTIONS", {})
+    return {
+        "pragmas": settings.SQLITE_PRAGMAS,
+        "begin": f"BEGIN {options.get('transaction_mode') or ''}".strip(),
+        "timeout": options.get("timeout", 5),
+        "persistent": bool(settings.DATABASES["default"].get("CONN_MAX_AGE")),
+    }
+
+
+def connect(path, profile):
+    conn = sqlite3.connect(path, timeout=profile["timeout"], isolation_level=None)
+    for name, value in profile["pragmas"].items():
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+def prepare(path, rows):
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE hotel (id INTEGER PRIMARY KEY, name TEXT, rating REAL);
+        CREATE INDEX hotel_rating ON hotel (rating DESC, id);
+        CREATE TABLE booking (
+            id INTEGER PRIMARY KEY, hotel_id INTEGER, check_in TEXT, guests INTEGER
+        );
+        CREATE INDEX booking_hotel ON booking (hotel_id, check_in);
+        """
+    )
+    conn.executemany(
+        "INSERT INTO hotel (name, rating) VALUES (?, ?)",
+        ((f"Hotel {i}", (i % 50) / 10) for i in range(rows)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def read(conn, n):
+    """A listing page: one indexed page of hotels."""
+    conn.execute(
+        "SELECT id, name, rating FROM hotel ORDER BY rating DESC, id LIMIT 24 "
+        "OFFSET ?",
+        (n % 100 * 24,),
+    ).fetchall()
+
+
+def write(conn, n, profile):
+    """A booking: read the hotel's bookings, then insert one, atomically."""
+    hotel = n % 500 + 1
+    conn.execute(profile["begin"])
+    try:
+        conn.execute(
+            "SELECT count(*) FROM booking WHERE hotel_id = ?", (hotel,)
+        ).fetchone()
+        conn.execute(
+            "INSERT INTO booking (hotel_id, check_in, guests) VALUES (?, ?, 2)",
+            (hotel, f"2026-{n % 12 + 1:02d}-01"),
+        )
+        conn.execute("COMMIT")
+    except sqlite3.OperationalError:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def client(path, profile, kind, duration, start, results):
+    """Run requests of ``kind`` back to back until ``duration`` is over."""
+    conn = connect(path, profile) if profile["persistent"] else None
+    done = locked = 0
+    n = os.getpid()
+    start.wait()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        n += 1
+        request_conn = conn or connect(path, profile)
+        try:
+            if kind == "read":
+                read(request_conn, n)
+            else:
+                write(request_conn, n, profile)
+            done += 1
+        except sqlite3.OperationalError as error:
+            if "locked" not in str(error):
+                raise
+            locked += 1
+        finally:
+            if conn is None:
+                request_conn.close()
+    results.put((kind, done, locked))
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark concurrent reads and writes against a scratch SQLite "
+        "database, with Django's default SQLite settings and with the "
+        "profile configured in settings.DATABASES."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument(
+            "--duration", type=float, default=5.0, help="Seconds per profile."
+        )
+        parser.add_argument("--rows", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        profiles = [("default", DEFAULT_PROFILE), ("tuned", tuned_profile())]
+        for label, profile in profiles:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "bench.sqlite3")
+                prepare(path, options["rows"])
+                totals = self.run(path, profile, options)
+            seconds = options["duration"]
+            self.stdout.write(
+                f"{label:<8} reads/s={totals['read'][0] / seconds:<10.0f} "
+                f"writes/s={totals['write'][0] / seconds:<10.0f} "
+                f"locked errors={totals['read'][1] + totals['write'][1]}"
+            )
+
+    def run(self, path, profile, options):
+        context = multiprocessing.get_context("spawn")
+        start, results = context.Event(), context.Queue()
+        kinds = ["read"] * options["readers"] + ["write"] * options["writers"]
+        processes = [
+            context.Process(
+                target=client,
+                args=(path, profile, kind, options["duration"], start, results),
+            )
+            for kind in kinds
+        ]
+        for process in processes:
+            process.start()
+        start.set()
+        totals = {"read": [0, 0], "write": [0, 0]}
+        for _ in processes:
+            kind, done, locked = results.get()
+            totals[kind][0] += done
+            totals[kind][1] += locked
+        for process in processes:
+            process.join()
+        return totals
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from my_app import catalogue_io
+from my_app.management.commands.import_catalogue import guess_format
+
+
+class Command(BaseCommand):
+    help = (
+        "Export destinations, hotels (with amenities and gallery images) or "
+        "itineraries as CSV or JSON Lines, in the format import_catalogue reads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=list(catalogue_io.COLUMNS))
+        parser.add_argument(
+            "path", nargs="?", default="-", help="File to write (default: stdout)."
+        )
+        parser.add_argument("--format", choices=catalogue_io.FORMATS)
+        parser.add_argument("--batch-size", type=int, default=catalogue_io.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        rows = catalogue_io.export_rows(options["kind"], options["batch_size"])
+        if path == "-":
+            fmt = options["format"] or "jsonl"
+            catalogue_io.write_rows(self.stdout, fmt, options["kind"], rows)
+            return
+        fmt = guess_format(path, options["format"])
+        with open(path, "w", newline="", encoding="utf-8") as stream:
+            count = catalogue_io.write_rows(stream, fmt, options["kind"], rows)
+        self.stderr.write(f"Exported {count} {options['kind']} to {path}.")
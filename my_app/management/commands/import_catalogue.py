@@ -0,0 +1,66 @@
+import contextlib
+import sys
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from my_app import catalogue_io
+
+
+def guess_format(path, fmt):
+    if fmt:
+        return fmt
+    suffix = Path(path).suffix.lower().lstrip(".")
+    if suffix == "ndjson":
+        suffix = "jsonl"
+    if suffix not in catalogue_io.FORMATS:
+        raise CommandError(f"Cannot tell the format of {path!r}; pass --format.")
+    return suffix
+
+
+class Command(BaseCommand):
+    help = (
+        "Import destinations, hotels (with amenities and gallery images) or "
+        "itineraries from a CSV or JSON Lines file, in batches of bulk "
+        "inserts and updates. Rows whose slug exists update that object."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=list(catalogue_io.COLUMNS))
+        parser.add_argument("path", help="File to read, or - for standard input.")
+        parser.add_argument("--format", choices=catalogue_io.FORMATS)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=catalogue_io.BATCH_SIZE,
+            help="Rows per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if path == "-":
+            fmt = options["format"] or "jsonl"
+            # Read, but left open: the command does not own standard input.
+            stream = contextlib.nullcontext(sys.stdin)
+        else:
+            fmt = guess_format(path, options["format"])
+            stream = open(path, newline="", encoding="utf-8")
+        started = time.perf_counter()
+        importer = catalogue_io.Importer(options["kind"], options["batch_size"])
+        try:
+            with stream as rows:
+                importer.run(catalogue_io.read_rows(rows, fmt))
+        except (catalogue_io.ImportFailed, IntegrityError) as exc:
+            raise CommandError(
+                f"{exc} ({importer.rows} rows before its batch were imported)"
+            )
+        finally:
+            importer.finish()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {importer.rows} rows: {importer.created} created, "
+                f"{importer.updated} updated in {time.perf_counter() - started:.1f}s."
+            )
+        )
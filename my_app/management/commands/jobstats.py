@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from my_app import jobs
+
+
+def seconds(duration):
+    return "n/a" if duration is None else f"{duration.total_seconds():.2f}s"
+
+
+class Command(BaseCommand):
+    help = "Report job queue depth and latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--window",
+            type=int,
+            default=60,
+            help="Minutes of finished jobs to average latency over (default 60).",
+        )
+
+    def handle(self, *args, **options):
+        report = jobs.report(timedelta(minutes=options["window"]))
+        for status, count in report["depth"].items():
+            self.stdout.write(f"{status:<10} {count}")
+        for task, count in sorted(report["queued_by_task"].items()):
+            self.stdout.write(f"  queued {task:<24} {count}")
+        self.stdout.write(
+            f"oldest due job waiting: {seconds(report['oldest_due_age'])}"
+        )
+        self.stdout.write(
+            f"last {options['window']} min: {report['finished_in_window']} done, "
+            f"mean latency {seconds(report['latency'])}, "
+            f"mean runtime {seconds(report['runtime'])}"
+        )
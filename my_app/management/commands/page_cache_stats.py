@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+# Importing the view modules registers their cached views.
+from my_app import feeds, page_cache, sitemaps, views  # noqa: F401
+
+
+class Command(BaseCommand):
+    help = (
+        "Report page cache hits and misses per view, and hits, misses and "
+        "mean render time per template fragment."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset", action="store_true", help="Reset the counters after reporting."
+        )
+
+    def handle(self, *args, **options):
+        total_hits = total_misses = 0
+        for view_name, counts in sorted(page_cache.stats().items()):
+            hits, misses = counts["hits"], counts["misses"]
+            total_hits += hits
+            total_misses += misses
+            self.stdout.write(
+                f"{view_name:<24} hits={hits:<8} misses={misses:<8} "
+                f"hit rate={self.rate(hits, misses)}"
+            )
+        self.stdout.write(
+            f"{'total':<24} hits={total_hits:<8} misses={total_misses:<8} "
+            f"hit rate={self.rate(total_hits, total_misses)}"
+        )
+        self.stdout.write("")
+        fragments = sorted(
+            page_cache.fragment_stats().items(),
+            key=lambda item: item[1]["miss_ms"] * item[1]["misses"],
+            reverse=True,
+        )
+        for name, counts in fragments:
+            self.stdout.write(
+                f"{name:<24} hits={counts['hits']:<8} misses={counts['misses']:<8} "
+                f"hit={counts['hit_ms']:.2f}ms render={counts['miss_ms']:.2f}ms"
+            )
+        if options["reset"]:
+            page_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
+
+    @staticmethod
+    def rate(hits, misses):
+        lookups = hits + misses
+        return f"{hits / lookups:.1%}" if lookups else "n/a"
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from my_app import renditions
+from my_app.signals import IMAGE_FIELDS, queue_renditions
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue background jobs building the renditions of uploaded images "
+        "that have none yet (e.g. uploaded before renditions existed)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Rebuild the renditions of every image, not only missing ones.",
+        )
+
+    def handle(self, *args, **options):
+        queued = 0
+        for model, field in IMAGE_FIELDS.items():
+            objects = model._default_manager.exclude(**{field: ""}).only("pk", field)
+            for instance in objects.iterator():
+                fieldfile = getattr(instance, field)
+                if options["all"] or not renditions.has_renditions(fieldfile):
+                    queue_renditions(instance)
+                    queued += 1
+        self.stdout.write(f"Queued renditions for {queued} image(s).")
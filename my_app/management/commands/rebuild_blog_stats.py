@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from my_app import blog_stats, page_cache
+from my_app.models import BlogMonth
+from my_app.signals import BLOG_ARCHIVE
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the published post counts of every category, tag and month, "
+        "and the related posts of every blog post."
+    )
+
+    def handle(self, *args, **options):
+        blog_stats.rebuild()
+        page_cache.invalidate(BLOG_ARCHIVE)
+        months = BlogMonth.objects.count()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt the blog counts ({months} months).")
+        )
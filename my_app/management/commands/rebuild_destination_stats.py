@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from my_app import destination_stats, page_cache
+from my_app.models import Destination
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the hotel count, lowest price and average rating stored on "
+        "every destination. With --check, only report the destinations whose "
+        "stored figures have drifted from their hotels."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Report drift and exit with an error if there is any.",
+        )
+
+    def handle(self, *args, **options):
+        drifted = destination_stats.drift()
+        for destination, field, stored, actual in drifted:
+            self.stdout.write(
+                f"{destination.name} (#{destination.pk}): {field} is {stored}, "
+                f"should be {actual}"
+            )
+        stale = {destination.pk for destination, *_ in drifted}
+        if options["check"]:
+            if stale:
+                raise CommandError(f"{len(stale)} destinations have drifted.")
+            self.stdout.write(self.style.SUCCESS("No drift."))
+            return
+
+        total = destination_stats.rebuild()
+        if stale:
+            # Their pages show the old figures.
+            Destination.objects.filter(pk__in=stale).update(updated_at=timezone.now())
+            page_cache.invalidate(
+                page_cache.collection_tag(Destination),
+                *(f"destination:{pk}" for pk in stale),
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt the figures of {total} destinations ({len(stale)} fixed)."
+            )
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from my_app import search
+from my_app.models import BlogPost, Destination, Hotel
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index from the catalogue and blog."
+
+    def handle(self, *args, **options):
+        total = search.rebuild(
+            {"destination": Destination, "hotel": Hotel, "blogpost": BlogPost}
+        )
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} objects."))
@@ -0,0 +1,94 @@
+import multiprocessing
+import signal
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from my_app import jobs
+
+
+def work(index, stop, burst, poll_interval):
+    """Loop of one worker process: run due jobs until told to stop."""
+    name = f"{jobs.worker_name()}/{index}"
+    try:
+        while not stop.is_set():
+            if jobs.run_next(name):
+                continue
+            if burst:
+                return
+            stop.wait(poll_interval)
+    finally:
+        connections.close_all()
+
+
+def work_in_child(index, stop, burst, poll_interval):
+    """``work()`` in a pooled process, which leaves Ctrl-C to the parent."""
+    # The parent turns Ctrl-C into ``stop``.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    work(index, stop, burst, poll_interval)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background jobs from the database queue with a pool of worker "
+        "processes. Stops gracefully on SIGINT/SIGTERM after the running jobs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=settings.JOBS_WORKER_PROCESSES,
+            help="Number of worker processes (default: JOBS_WORKER_PROCESSES).",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once no job is due instead of waiting for new ones.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.JOBS_POLL_INTERVAL,
+            help="Seconds to wait between polls of an empty queue.",
+        )
+
+    def handle(self, *args, **options):
+        requeued = jobs.requeue_stale()
+        purged = jobs.purge(timedelta(days=settings.JOBS_KEEP_FINISHED))
+        self.stdout.write(f"Re-queued {requeued} stale job(s), purged {purged}.")
+
+        processes = max(1, options["processes"])
+        burst, poll_interval = options["burst"], options["poll_interval"]
+        if processes == 1:
+            stop = multiprocessing.Event()
+            self._on_shutdown(stop)
+            work(0, stop, burst, poll_interval)
+            return
+
+        # Children must not inherit the parent's database connections.
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        stop = context.Event()
+        pool = [
+            context.Process(target=work_in_child, args=(i, stop, burst, poll_interval))
+            for i in range(processes)
+        ]
+        for process in pool:
+            process.start()
+        self._on_shutdown(stop)
+        self.stdout.write(f"Started {processes} worker process(es).")
+        while any(process.is_alive() for process in pool):
+            time.sleep(0.2)
+        self.stdout.write("All workers stopped.")
+
+    def _on_shutdown(self, stop):
+        def request_stop(signum, frame):
+            self.stdout.write("Stopping after the running jobs...")
+            stop.set()
+
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
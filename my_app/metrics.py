@@ -0,0 +1,283 @@
+"""
+Per-request cost: queries, SQL time, template time and cache outcomes.
+
+``RequestMetricsMiddleware`` is listed in ``MIDDLEWARE`` but only runs
+when ``settings.REQUEST_METRICS`` is true; otherwise it removes itself
+(``MiddlewareNotUsed``) and neither the query wrapper nor the template
+timer is installed, so a disabled site runs stock Django. When enabled,
+every response gets a ``Server-Timing`` header that browser dev tools
+show next to the request::
+
+    Server-Timing: app;dur=41.2, db;dur=3.8;desc="6 queries",
+        tpl;dur=30.1, cache;desc="2 hits / 1 misses"
+
+* Queries are timed by a database execute wrapper, installed on every
+  connection as it is opened.
+* Template time is the time spent in top-level template renders, timed
+  by wrapping ``django.template.base.Template.render`` when the
+  middleware is created. A middleware created with metrics disabled
+  restores it, and removes the query wrapper.
+* Cache outcomes are those of the page cache and its fragments
+  (:mod:`my_app.page_cache`).
+
+A statement run ``REQUEST_METRICS_REPEATS`` times or more in one request
+is flagged: with the same parameters it is a *duplicate*, with varying
+parameters an *N+1* pattern (a query per row of an earlier one). Flagged
+statements are logged and counted in the header.
+
+The last ``REQUEST_METRICS_SAMPLES`` requests of every URL name are kept
+in memory, and :func:`request_metrics` reports their p50/p95/p99 to staff
+as JSON. Every process keeps its own samples.
+"""
+
+import functools
+import logging
+import math
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import JsonResponse
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 95, 99)
+UNRESOLVED = "<unresolved>"
+
+# The metrics of the request being handled, if metrics are enabled.
+_current = ContextVar("request_metrics", default=None)
+
+# Template.render as Django defines it, while the timer replaces it.
+_stock_render = None
+
+# URL name -> recent (total_ms, db_ms, template_ms, queries) samples.
+_samples = {}
+_lock = threading.Lock()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+        self.cache = Counter()
+        self.statements = Counter()
+        self.executions = Counter()
+
+    def add_query(self, sql, params, many, seconds):
+        self.queries += 1
+        self.db_seconds += seconds
+        self.statements[sql] += 1
+        if not many:
+            self.executions[(sql, repr(params))] += 1
+
+    def repeated(self):
+        """``(duplicates, n_plus_one)``: the statements run too often."""
+        threshold = settings.REQUEST_METRICS_REPEATS
+        duplicates = {
+            sql for (sql, _), n in self.executions.items() if n >= threshold
+        }
+        n_plus_one = {
+            sql
+            for sql, n in self.statements.items()
+            if n >= threshold and sql not in duplicates
+        }
+        return duplicates, n_plus_one
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, params, many, time.perf_counter() - started)
+
+
+def _install_query_recorder(connection, **kwargs):
+    # Runs again when a persistent connection is reopened.
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _uninstall_query_recorder():
+    connection_created.disconnect(_install_query_recorder)
+    for connection in connections.all(initialized_only=True):
+        if _record_query in connection.execute_wrappers:
+            connection.execute_wrappers.remove(_record_query)
+
+
+def count_cache(outcome):
+    """Count a page cache ``"hits"`` or ``"misses"`` for the current request."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cache[outcome] += 1
+
+
+def _install_template_timer():
+    # Every template render, the {% include %}d ones too, goes through
+    # Template.render; wrapped once, however many middleware are created.
+    global _stock_render
+    if _stock_render is not None:
+        return
+    render = _stock_render = Template.render
+
+    @functools.wraps(render)
+    def timed_render(self, context):
+        metrics = _current.get()
+        if metrics is None:
+            return render(self, context)
+        started = time.perf_counter()
+        metrics.template_depth += 1
+        try:
+            return render(self, context)
+        finally:
+            metrics.template_depth -= 1
+            # Templates rendered from within a template are counted once.
+            if not metrics.template_depth:
+                metrics.template_seconds += time.perf_counter() - started
+
+    Template.render = timed_render
+
+
+def _uninstall_template_timer():
+    global _stock_render
+    if _stock_render is not None:
+        Template.render = _stock_render
+        _stock_render = None
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def server_timing(metrics, total_seconds):
+    duplicates, n_plus_one = metrics.repeated()
+    entries = [
+        f"app;dur={_ms(total_seconds)}",
+        f'db;dur={_ms(metrics.db_seconds)};desc="{metrics.queries} queries"',
+        f"tpl;dur={_ms(metrics.template_seconds)}",
+        f'cache;desc="{metrics.cache["hits"]} hits / {metrics.cache["misses"]} misses"',
+    ]
+    if duplicates:
+        entries.append(f'dup;desc="{len(duplicates)} duplicated queries"')
+    if n_plus_one:
+        entries.append(f'nplus1;desc="{len(n_plus_one)} repeated queries"')
+    return ", ".join(entries)
+
+
+def _url_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match is not None else UNRESOLVED
+
+
+def _finish(request, response, metrics):
+    total = time.perf_counter() - metrics.started
+    response["Server-Timing"] = server_timing(metrics, total)
+    url_name = _url_name(request)
+    duplicates, n_plus_one = metrics.repeated()
+    for label, statements in (("Duplicate", duplicates), ("N+1", n_plus_one)):
+        for sql in statements:
+            logger.warning(
+                "%s query on %s (%s, %d runs): %s",
+                label,
+                request.path,
+                url_name,
+                metrics.statements[sql],
+                sql,
+            )
+    sample = (
+        _ms(total),
+        _ms(metrics.db_seconds),
+        _ms(metrics.template_seconds),
+        metrics.queries,
+    )
+    with _lock:
+        if url_name not in _samples:
+            _samples[url_name] = deque(maxlen=settings.REQUEST_METRICS_SAMPLES)
+        _samples[url_name].append(sample)
+    return response
+
+
+class RequestMetricsMiddleware:
+    """Measures every request; see the module docstring."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            # Undo an earlier enabled instance (e.g. in tests or a reload).
+            _uninstall_query_recorder()
+            _uninstall_template_timer()
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        connection_created.connect(_install_query_recorder)
+        for connection in connections.all(initialized_only=True):
+            _install_query_recorder(connection)
+        _install_template_timer()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return _finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return _finish(request, response, metrics)
+
+
+def percentile(values, p):
+    """The nearest-rank ``p``-th percentile of sorted ``values``."""
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def report():
+    """``{url_name: {"requests": n, "<measure>": {"p50": …}, …}}``."""
+    with _lock:
+        samples = {name: list(rows) for name, rows in _samples.items()}
+    measures = ("total_ms", "db_ms", "template_ms", "queries")
+    summary = {}
+    for name, rows in sorted(samples.items()):
+        summary[name] = {"requests": len(rows)}
+        for measure, values in zip(measures, map(sorted, zip(*rows))):
+            summary[name][measure] = {
+                f"p{p}": percentile(values, p) for p in PERCENTILES
+            }
+    return summary
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+
+
+@staff_member_required
+def request_metrics(request):
+    """The recent request percentiles of this process, per URL name."""
+    return JsonResponse({"enabled": settings.REQUEST_METRICS, "urls": report()})
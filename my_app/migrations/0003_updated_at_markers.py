@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-16 23:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0002_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='destination',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='Last change to the destination, its itinerary or its gallery.'),
+        ),
+        migrations.AddField(
+            model_name='galleryimage',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='hotel',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='Last change to the hotel, its amenities or its gallery.'),
+        ),
+        migrations.AddField(
+            model_name='itinerary',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
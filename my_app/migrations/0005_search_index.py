@@ -0,0 +1,71 @@
+import html
+
+from django.db import migrations
+from django.utils.html import strip_tags
+
+# A frozen copy of my_app.search at the time of this migration: the row id
+# is ``pk * 3 + kind code``, with the codes below.
+KINDS = ("destination", "hotel", "blogpost")
+
+
+def text(value):
+    return " ".join(html.unescape(strip_tags(value or "")).split())
+
+
+def rows(kind, model):
+    objects = model._default_manager.order_by("pk")
+    if kind == "hotel":
+        objects = objects.select_related("destination")
+    for obj in objects.iterator(chunk_size=500):
+        if kind == "destination":
+            document = (True, obj.name, obj.country, text(obj.description))
+        elif kind == "hotel":
+            extra = f"{obj.address} {obj.destination.name}"
+            document = (True, obj.name, extra, text(obj.description))
+        else:
+            public = obj.status == "published"
+            document = (public, obj.title, text(obj.excerpt), text(obj.content))
+        yield (obj.pk * len(KINDS) + KINDS.index(kind), kind, *document)
+
+
+def build_index(apps, schema_editor):
+    models = {
+        "destination": apps.get_model("my_app", "Destination"),
+        "hotel": apps.get_model("my_app", "Hotel"),
+        "blogpost": apps.get_model("my_app", "BlogPost"),
+    }
+    insert = (
+        "INSERT INTO my_app_search (rowid, kind, public, title, extra, body) "
+        "VALUES (%s, %s, %s, %s, %s, %s)"
+    )
+    with schema_editor.connection.cursor() as cursor:
+        for kind, model in models.items():
+            batch = []
+            for row in rows(kind, model):
+                batch.append(row)
+                if len(batch) == 500:
+                    cursor.executemany(insert, batch)
+                    batch = []
+            cursor.executemany(insert, batch)
+        cursor.execute(
+            "INSERT INTO my_app_search (my_app_search) VALUES ('optimize')"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0004_job_queue'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=(
+                "CREATE VIRTUAL TABLE my_app_search USING fts5("
+                "kind UNINDEXED, public UNINDEXED, title, extra, body, "
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            ),
+            reverse_sql="DROP TABLE my_app_search",
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
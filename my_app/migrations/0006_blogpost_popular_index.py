@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-16 23:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0005_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['status', '-views', 'id'], name='blogpost_popular_idx'),
+        ),
+    ]
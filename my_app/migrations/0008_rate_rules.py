@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-16 23:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0007_booking_availability'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text="e.g. 'Peak season'.", max_length=100)),
+                ('start_date', models.DateField(blank=True, null=True)),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('weekdays', models.PositiveSmallIntegerField(default=127, help_text='The nights of the week the rule applies to.')),
+                ('min_guests', models.PositiveIntegerField(default=1, help_text='Applies to stays of at least this many guests.')),
+                ('percent', models.DecimalField(decimal_places=2, help_text='Change to the nightly price, e.g. 25 or -10.', max_digits=6)),
+                ('hotel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rate_rules', to='my_app.hotel')),
+            ],
+            options={
+                'verbose_name': 'Rate Rule',
+                'verbose_name_plural': 'Rate Rules',
+                'ordering': ['hotel', 'start_date'],
+                'indexes': [models.Index(fields=['hotel', 'end_date'], name='raterule_hotel_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-16 23:54
+
+from django.db import migrations, models
+
+
+def fill_masks(apps, schema_editor):
+    Amenity = apps.get_model("my_app", "Amenity")
+    Hotel = apps.get_model("my_app", "Hotel")
+    for bit, amenity in enumerate(Amenity.objects.order_by("pk")):
+        amenity.bit = bit
+        amenity.save(update_fields=["bit"])
+    masks = {}
+    rows = Hotel.amenities.through.objects.values_list("hotel_id", "amenity__bit")
+    for hotel_id, bit in rows:
+        masks[hotel_id] = masks.get(hotel_id, 0) | (1 << bit)
+    for hotel_id, mask in masks.items():
+        Hotel.objects.filter(pk=hotel_id).update(amenity_mask=mask)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0008_rate_rules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='amenity',
+            name='bit',
+            field=models.PositiveSmallIntegerField(editable=False, help_text='Position of the amenity in Hotel.amenity_mask.', null=True),
+        ),
+        migrations.AddField(
+            model_name='hotel',
+            name='amenity_mask',
+            field=models.BigIntegerField(default=0, editable=False, help_text='Bit i is set when the hotel has the amenity with bit i.'),
+        ),
+        migrations.RunPython(fill_masks, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='amenity',
+            name='bit',
+            field=models.PositiveSmallIntegerField(editable=False, help_text='Position of the amenity in Hotel.amenity_mask.', unique=True),
+        ),
+    ]
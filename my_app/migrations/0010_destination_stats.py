@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-16 23:58
+
+from django.db import migrations, models
+
+
+def fill_stats(apps, schema_editor):
+    from my_app import destination_stats
+
+    destination_stats.rebuild(
+        apps.get_model("my_app", "Destination"), apps.get_model("my_app", "Hotel")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0009_amenity_mask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='destination',
+            name='avg_rating',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=3, null=True),
+        ),
+        migrations.AddField(
+            model_name='destination',
+            name='hotel_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='destination',
+            name='min_price',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='destination',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='Last change to the destination, its itinerary, its gallery or its hotel figures.'),
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_redirects(apps, schema_editor):
+    """
+    Point every slug the old ``/blog/<slug>/`` URLs could carry at a post.
+    Where several posts share a slug, the latest published one wins.
+    """
+    BlogPost = apps.get_model("my_app", "BlogPost")
+    BlogRedirect = apps.get_model("my_app", "BlogRedirect")
+    posts = (
+        BlogPost.objects.exclude(slug="")
+        .order_by("-status", "-published_at", "-pk")
+        .values_list("slug", "pk")
+    )
+    redirects = [BlogRedirect(slug=slug, post_id=pk) for slug, pk in posts.iterator()]
+    BlogRedirect.objects.bulk_create(redirects, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0010_destination_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlogRedirect',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(max_length=255, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Blog Redirect',
+                'verbose_name_plural': 'Blog Redirects',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['status', 'published_at', 'slug'], name='blogpost_lookup_idx'),
+        ),
+        migrations.AddField(
+            model_name='blogredirect',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='redirects', to='my_app.blogpost'),
+        ),
+        migrations.RunPython(fill_redirects, migrations.RunPython.noop),
+    ]
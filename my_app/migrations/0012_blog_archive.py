@@ -0,0 +1,59 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_stats(apps, schema_editor):
+    from my_app import blog_stats
+
+    blog_stats.rebuild(
+        apps.get_model("my_app", "BlogPost"),
+        apps.get_model("my_app", "Category"),
+        apps.get_model("my_app", "Tag"),
+        apps.get_model("my_app", "BlogMonth"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0011_blog_date_urls'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlogMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='The first day of the month.', unique=True)),
+                ('post_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Blog Month',
+                'verbose_name_plural': 'Blog Months',
+                'ordering': ['-month'],
+            },
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='related_post_ids',
+            field=models.JSONField(default=list, editable=False, help_text='Posts sharing the most tags with this one, kept current by blog_stats.'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Published posts in this category, kept current by blog_stats.'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Published posts with this tag, kept current by blog_stats.'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['category', 'status', '-published_at', 'id'], name='blogpost_category_idx'),
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
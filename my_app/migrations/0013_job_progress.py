@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0012_blog_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='progress',
+            field=models.PositiveIntegerField(default=0, help_text='Items done so far, as reported by the task.'),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='total',
+            field=models.PositiveIntegerField(default=0, help_text='Items to do, as reported by the task (0 if unknown).'),
+        ),
+    ]
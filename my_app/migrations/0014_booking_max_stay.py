@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:51
+
+import datetime
+import django.db.models.expressions
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0013_job_progress'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.CheckConstraint(condition=models.Q(('check_out_date__lte', django.db.models.expressions.CombinedExpression(models.F('check_in_date'), '+', models.Value(datetime.timedelta(days=30))))), name='booking_stay_within_max_nights', violation_error_message='Stays are limited to 30 nights.'),
+        ),
+    ]
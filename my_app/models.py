@@ -1,15 +1,19 @@
+from datetime import timedelta
+
 from django.conf import settings
 from django.db import models
+from django.urls import reverse
 from django.utils import timezone
-from django.utils.text import slugify
 from phonenumber_field.modelfields import PhoneNumberField
 from tinymce.models import HTMLField
 
+from .slugs import SlugQuerySet, UniqueSlugMixin
+
 
 # --- Core Models for Destinations and Hotels ---
 
 
-class Destination(models.Model):
+class Destination(UniqueSlugMixin, models.Model):
     """
     Represents a travel destination, like a city or a region.
     """
@@ -37,16 +41,30 @@ class Destination(models.Model):
     is_featured = models.BooleanField(
         default=False, help_text="Feature this destination on the homepage."
     )
+    # Figures over the destination's available hotels, maintained by
+    # my_app.destination_stats.
+    hotel_count = models.PositiveIntegerField(default=0, editable=False)
+    min_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, editable=False
+    )
+    avg_rating = models.DecimalField(
+        max_digits=3, decimal_places=2, null=True, editable=False
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Last change to the destination, its itinerary, its gallery "
+        "or its hotel figures.",
+    )
+
+    objects = SlugQuerySet.as_manager()
 
     class Meta:
         ordering = ["name"]
         verbose_name = "Destination"
         verbose_name_plural = "Destinations"
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+    def get_absolute_url(self):
+        return reverse("destination_detail", args=[self.slug])
 
     def __str__(self):
         return f"{self.name}, {self.country}"
@@ -63,6 +81,7 @@ class Itinerary(models.Model):
     day = models.PositiveIntegerField()
     title = models.CharField(max_length=200)
     detail = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Day {self.day}: {self.title}"
@@ -71,7 +90,7 @@ class Itinerary(models.Model):
         ordering = ["day"]
 
 
-class Hotel(models.Model):
+class Hotel(UniqueSlugMixin, models.Model):
     """
     Represents a single hotel listing.
     """
@@ -120,17 +139,41 @@ class Hotel(models.Model):
         default=True,
         help_text="Designates whether the hotel is currently accepting bookings.",
     )
+    amenity_mask = models.BigIntegerField(
+        default=0,
+        editable=False,
+        help_text="Bit i is set when the hotel has the amenity with bit i.",
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Last change to the hotel, its amenities or its gallery.",
+    )
+
+    objects = SlugQuerySet.as_manager()
 
     class Meta:
         ordering = ["-rating", "name"]
+        indexes = [
+            # Serves keyset pagination over the default ordering.
+            models.Index(fields=["-rating", "name", "id"], name="hotel_listing_idx"),
+        ]
         verbose_name = "Hotel"
         verbose_name_plural = "Hotels"
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            # amenity_mask is maintained by the amenities m2m signal; never
+            # write back a value loaded before the amenities changed.
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "amenity_mask"
+            ]
         super().save(*args, **kwargs)
 
+    def get_absolute_url(self):
+        return reverse("hotel_detail", args=[self.slug])
+
     def __str__(self):
         return f"{self.name}, {self.destination.name}"
 
@@ -140,13 +183,36 @@ class Amenity(models.Model):
     Represents a hotel amenity (e.g., Wi-Fi, Pool, Gym).
     """
 
+    # Bits of a signed 64-bit integer that hold amenities.
+    MAX_AMENITIES = 63
+
     name = models.CharField(max_length=100, unique=True)
+    bit = models.PositiveSmallIntegerField(
+        unique=True,
+        editable=False,
+        help_text="Position of the amenity in Hotel.amenity_mask.",
+    )
 
     class Meta:
         ordering = ["name"]
         verbose_name = "Amenity"
         verbose_name_plural = "Amenities"
 
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            used = set(Amenity.objects.values_list("bit", flat=True))
+            free = [bit for bit in range(self.MAX_AMENITIES) if bit not in used]
+            if not free:
+                raise ValueError(
+                    f"At most {self.MAX_AMENITIES} amenities are supported."
+                )
+            self.bit = free[0]
+        super().save(*args, **kwargs)
+
+    @property
+    def flag(self):
+        return 1 << self.bit
+
     def __str__(self):
         return self.name
 
@@ -175,6 +241,7 @@ class GalleryImage(models.Model):
         blank=True,
     )
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-uploaded_at"]
@@ -189,8 +256,58 @@ class GalleryImage(models.Model):
         return self.caption or f"Gallery Image {self.id}"
 
 
+# --- Pricing ---
+
+
+class RateRule(models.Model):
+    """
+    Adjusts a hotel's nightly price by a percentage on some nights.
+
+    A rule applies to a night within ``start_date``..``end_date`` (both
+    inclusive, open-ended when empty), falling on one of ``weekdays``, for
+    stays of at least ``min_guests`` guests. The adjustments of every rule
+    that applies to a night add up; see :mod:`my_app.pricing`.
+    """
+
+    # Weekday bits, Monday = 1 << 0 as in date.weekday().
+    EVERY_DAY = 0b1111111
+    WEEKEND_NIGHTS = (1 << 4) | (1 << 5)  # Friday and Saturday nights
+
+    hotel = models.ForeignKey(
+        Hotel, on_delete=models.CASCADE, related_name="rate_rules"
+    )
+    name = models.CharField(max_length=100, help_text="e.g. 'Peak season'.")
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
+    weekdays = models.PositiveSmallIntegerField(
+        default=EVERY_DAY, help_text="The nights of the week the rule applies to."
+    )
+    min_guests = models.PositiveIntegerField(
+        default=1, help_text="Applies to stays of at least this many guests."
+    )
+    percent = models.DecimalField(
+        max_digits=6,
+        decimal_places=2,
+        help_text="Change to the nightly price, e.g. 25 or -10.",
+    )
+
+    class Meta:
+        ordering = ["hotel", "start_date"]
+        indexes = [
+            models.Index(fields=["hotel", "end_date"], name="raterule_hotel_idx"),
+        ]
+        verbose_name = "Rate Rule"
+        verbose_name_plural = "Rate Rules"
+
+    def __str__(self):
+        return f"{self.name} ({self.percent:+}%)"
+
+
 # --- User Interaction Models ---
 
+# The longest stay a booking may cover; availability checks rely on it.
+MAX_STAY_NIGHTS = 30
+
 
 class Booking(models.Model):
     """
@@ -217,6 +334,29 @@ class Booking(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Overlap checks, see my_app.availability.
+            models.Index(
+                fields=["hotel", "status", "check_in_date", "check_out_date"],
+                name="booking_availability_idx",
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(check_out_date__gt=models.F("check_in_date")),
+                name="booking_check_out_after_check_in",
+            ),
+            models.CheckConstraint(
+                condition=models.Q(
+                    check_out_date__lte=models.F("check_in_date")
+                    + timedelta(days=MAX_STAY_NIGHTS)
+                ),
+                name="booking_stay_within_max_nights",
+                violation_error_message=(
+                    f"Stays are limited to {MAX_STAY_NIGHTS} nights."
+                ),
+            ),
+        ]
         verbose_name = "Booking"
         verbose_name_plural = "Bookings"
 
@@ -292,51 +432,61 @@ class FAQ(models.Model):
 # --- Blog Models ---
 
 
-class Category(models.Model):
+class Category(UniqueSlugMixin, models.Model):
     """
     Represents a blog category.
     """
 
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=120, unique=True, blank=True)
+    post_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Published posts in this category, kept current by blog_stats.",
+    )
+
+    objects = SlugQuerySet.as_manager()
 
     class Meta:
         ordering = ["name"]
         verbose_name = "Category"
         verbose_name_plural = "Categories"
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+    def get_absolute_url(self):
+        return reverse("blog_category", args=[self.slug])
 
     def __str__(self):
         return self.name
 
 
-class Tag(models.Model):
+class Tag(UniqueSlugMixin, models.Model):
     """
     Represents a blog tag.
     """
 
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=120, unique=True, blank=True)
+    post_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Published posts with this tag, kept current by blog_stats.",
+    )
+
+    objects = SlugQuerySet.as_manager()
 
     class Meta:
         ordering = ["name"]
         verbose_name = "Tag"
         verbose_name_plural = "Tags"
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+    def get_absolute_url(self):
+        return reverse("blog_tag", args=[self.slug])
 
     def __str__(self):
         return self.name
 
 
-class BlogPost(models.Model):
+class BlogPost(UniqueSlugMixin, models.Model):
     """
     Represents a single blog post.
     """
@@ -392,16 +542,152 @@ class BlogPost(models.Model):
     views = models.PositiveIntegerField(
         default=0, help_text="The number of times the post has been viewed."
     )
+    related_post_ids = models.JSONField(
+        default=list,
+        editable=False,
+        help_text="Posts sharing the most tags with this one, kept current by "
+        "blog_stats.",
+    )
+
+    slug_source = "title"
+
+    objects = SlugQuerySet.as_manager()
 
     class Meta:
         ordering = ["-published_at"]
+        indexes = [
+            models.Index(fields=["-published_at", "id"], name="blogpost_listing_idx"),
+            models.Index(
+                fields=["status", "-views", "id"], name="blogpost_popular_idx"
+            ),
+            # Serves the date-scoped detail lookup with a single seek.
+            models.Index(
+                fields=["status", "published_at", "slug"], name="blogpost_lookup_idx"
+            ),
+            models.Index(
+                fields=["category", "status", "-published_at", "id"],
+                name="blogpost_category_idx",
+            ),
+        ]
         verbose_name = "Blog Post"
         verbose_name_plural = "Blog Posts"
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.title)
-        super().save(*args, **kwargs)
+    def get_absolute_url(self):
+        day = timezone.localdate(self.published_at)
+        return reverse(
+            "blog_detail",
+            kwargs={
+                "year": day.year,
+                "month": day.month,
+                "day": day.day,
+                "slug": self.slug,
+            },
+        )
 
     def __str__(self):
         return self.title
+
+
+class BlogMonth(models.Model):
+    """
+    The number of published blog posts of one month, for the archive links
+    of the blog sidebar.
+    """
+
+    month = models.DateField(unique=True, help_text="The first day of the month.")
+    post_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-month"]
+        verbose_name = "Blog Month"
+        verbose_name_plural = "Blog Months"
+
+    def get_absolute_url(self):
+        return reverse(
+            "blog_archive", kwargs={"year": self.month.year, "month": self.month.month}
+        )
+
+    def __str__(self):
+        return self.month.strftime("%B %Y")
+
+
+class BlogRedirect(models.Model):
+    """
+    Maps the slug of an old ``/blog/<slug>/`` URL to the post it now
+    permanently redirects to.
+    """
+
+    slug = models.SlugField(max_length=255, unique=True)
+    post = models.ForeignKey(
+        BlogPost, on_delete=models.CASCADE, related_name="redirects"
+    )
+
+    class Meta:
+        verbose_name = "Blog Redirect"
+        verbose_name_plural = "Blog Redirects"
+
+    def __str__(self):
+        return self.slug
+
+
+# --- Background Jobs ---
+
+
+class Job(models.Model):
+    """
+    A unit of background work, run by ``manage.py runjobs``.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    task = models.CharField(max_length=100, help_text="Registered task name.")
+    key = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Idempotency key: at most one queued job exists per key.",
+    )
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(
+        default=timezone.now, help_text="Not started before this time."
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    progress = models.PositiveIntegerField(
+        default=0, help_text="Items done so far, as reported by the task."
+    )
+    total = models.PositiveIntegerField(
+        default=0, help_text="Items to do, as reported by the task (0 if unknown)."
+    )
+
+    class Meta:
+        ordering = ["run_at", "id"]
+        indexes = [
+            models.Index(fields=["status", "run_at", "id"], name="job_claim_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["key"],
+                condition=models.Q(status="queued") & ~models.Q(key=""),
+                name="job_queued_key_unique",
+            ),
+        ]
+        verbose_name = "Job"
+        verbose_name_plural = "Jobs"
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
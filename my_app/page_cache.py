@@ -0,0 +1,373 @@
+"""
+Full-response cache for the public pages, invalidated by content tags.
+
+A cached page is stored under its URL together with the *tags* of the
+content it shows (``"hotel:12"``, ``"destination:3"``, ``"faq:all"`` …)
+and the version token each tag had when the page was rendered. A page is
+served from the cache only while all of those tokens are still current.
+
+Invalidation never searches for pages: ``invalidate("hotel:12")`` simply
+replaces the token of that tag, which makes every page that showed hotel
+12 stale and leaves all other pages untouched. Tags are bumped from the
+model signals in :mod:`my_app.signals`.
+
+Template fragments use the same tags: ``{% cachedfragment "faqs" %}``
+caches one section of a page under a key derived from the current tokens
+of the tags registered for it with :func:`register_fragment`, so a page
+miss re-renders only the sections whose content actually changed.
+
+Responses that show whole collections (sitemaps, feeds) know their tags
+before they are rendered. :func:`versioned` serves them with an ETag
+made from the tags' tokens, so revalidations and cache hits never run
+the view.
+
+Hit and miss counters (and fragment render times) are kept in the cache
+so that they are shared by every worker process. They are updated without
+locking and are therefore approximate under heavy concurrency.
+"""
+
+import hashlib
+import time
+import uuid
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from . import metrics
+
+PAGE_PREFIX = "page:"
+VERSIONED_PREFIX = "versioned:"
+VERSION_PREFIX = "page-version:"
+STATS_PREFIX = "page-stats:"
+FRAGMENT_PREFIX = "fragment:"
+FRAGMENT_STATS_PREFIX = "fragment-stats:"
+
+# Names of the views wrapped by ``cached_page``, for reporting.
+registry = []
+
+# Fragment name -> the tags whose content the fragment shows.
+fragments = {}
+
+
+def object_tag(instance):
+    """The tag of a single model instance, e.g. ``"hotel:12"``."""
+    return f"{instance._meta.model_name}:{instance.pk}"
+
+
+def collection_tag(model):
+    """The tag of every instance of ``model`` at once, e.g. ``"hotel:all"``."""
+    return f"{model._meta.model_name}:all"
+
+
+def _version_key(tag):
+    return f"{VERSION_PREFIX}{tag}"
+
+
+def _page_key(request):
+    path = request.get_full_path().encode()
+    return PAGE_PREFIX + hashlib.md5(path, usedforsecurity=False).hexdigest()
+
+
+def _new_token():
+    return uuid.uuid4().hex
+
+
+def current_versions(tags):
+    """
+    Return ``{tag: token}`` for ``tags``, creating tokens for unknown tags.
+
+    ``cache.add`` is used for new tokens so that concurrent renders of the
+    same tag agree on a single token.
+    """
+    keys = {_version_key(tag): tag for tag in tags}
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, _new_token(), None)
+        found.update(cache.get_many(missing))
+    return {keys[key]: token for key, token in found.items()}
+
+
+def versions_etag(request, tags):
+    """
+    A quoted ETag for the URL of ``request`` that changes whenever any of
+    ``tags`` is invalidated.
+    """
+    versions = current_versions(tags)
+    tokens = [versions[tag] for tag in sorted(versions)]
+    raw = "|".join([request.get_full_path(), *tokens])
+    return quote_etag(hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest())
+
+
+def invalidate(*tags):
+    """
+    Make every cached page showing any of ``tags`` stale.
+
+    Dropping a token is as good as replacing it (the next read creates a
+    new one) and is cheaper: a file-based cache culls on every write.
+    """
+    if tags:
+        cache.delete_many([_version_key(tag) for tag in tags])
+
+
+def tag(response, *tags):
+    """Attach the content tags of a rendered page to its response."""
+    response.cache_tags = getattr(response, "cache_tags", set()) | set(tags)
+    return response
+
+
+def _incr(key, delta=1):
+    if not cache.add(key, delta, None):
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            cache.set(key, delta, None)
+
+
+def _count(view_name, outcome):
+    _incr(f"{STATS_PREFIX}{view_name}:{outcome}")
+    metrics.count_cache(outcome)
+
+
+def stats():
+    """Return ``{view_name: {"hits": n, "misses": n}}`` for every cached view."""
+    keys = [
+        f"{STATS_PREFIX}{name}:{outcome}"
+        for name in registry
+        for outcome in ("hits", "misses")
+    ]
+    counts = cache.get_many(keys)
+    return {
+        name: {
+            outcome: counts.get(f"{STATS_PREFIX}{name}:{outcome}", 0)
+            for outcome in ("hits", "misses")
+        }
+        for name in registry
+    }
+
+
+def reset_stats():
+    cache.delete_many(
+        [
+            f"{STATS_PREFIX}{name}:{outcome}"
+            for name in registry
+            for outcome in ("hits", "misses")
+        ]
+        + [
+            f"{FRAGMENT_STATS_PREFIX}{name}:{counter}"
+            for name in fragments
+            for counter in FRAGMENT_COUNTERS
+        ]
+    )
+
+
+def _cacheable(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and getattr(response, "cache_tags", None)
+    )
+
+
+def _cached_response(request, view_name):
+    """The cached page for ``request`` if its content is unchanged, else None."""
+    entry = cache.get(_page_key(request))
+    if entry is not None and current_versions(entry["tags"]) == entry["tags"]:
+        _count(view_name, "hits")
+        response = HttpResponse(entry["content"], content_type=entry["content_type"])
+        response.cache_tags = set(entry["tags"])
+        return response
+    _count(view_name, "misses")
+    return None
+
+
+def _store(request, response):
+    if _cacheable(response):
+        entry = {
+            "tags": current_versions(response.cache_tags),
+            "content": response.content,
+            "content_type": response["Content-Type"],
+        }
+        cache.set(_page_key(request), entry, settings.PAGE_CACHE_TIMEOUT)
+
+
+def cached_page(view):
+    """
+    Serve ``view`` from the page cache while its tagged content is unchanged.
+
+    Only GET and HEAD requests are cached. The view marks a response as
+    cacheable by tagging it with :func:`tag`; untagged responses, error
+    pages and responses that set cookies are never stored.
+
+    Tag tokens are read when the view returns, so an edit saved while the
+    page was rendering may be served until ``PAGE_CACHE_TIMEOUT`` expires.
+
+    Async views are supported too; the cache is read and written from a
+    worker thread, as the cache backend is synchronous.
+    """
+    view_name = view.__name__
+    if view_name not in registry:
+        registry.append(view_name)
+
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return await view(request, *args, **kwargs)
+            response = await sync_to_async(_cached_response)(request, view_name)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+                await sync_to_async(_store)(request, response)
+            return response
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return view(request, *args, **kwargs)
+        response = _cached_response(request, view_name)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            _store(request, response)
+        return response
+
+    return wrapper
+
+
+def versioned(tags):
+    """
+    Serve a view with a :func:`versions_etag` ETag, and from the cache
+    while the tokens of its tags are unchanged.
+
+    ``tags`` receives the view's URL arguments and returns the tags of
+    the content the response shows. A matching ``If-None-Match`` is
+    answered ``304``; neither that nor a cache hit runs the view.
+    """
+
+    def decorator(view):
+        view_name = view.__name__
+        registry.append(view_name)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+            etag = versions_etag(request, tags(*args, **kwargs))
+            response = get_conditional_response(request, etag=etag)
+            if response is not None:
+                return response
+
+            key = VERSIONED_PREFIX + etag.strip('"')
+            entry = cache.get(key)
+            if entry is None:
+                _count(view_name, "misses")
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                if hasattr(response, "render"):
+                    response.render()
+                entry = {
+                    "content": response.content,
+                    "content_type": response["Content-Type"],
+                }
+                cache.set(key, entry, settings.PAGE_CACHE_TIMEOUT)
+            else:
+                _count(view_name, "hits")
+            response = HttpResponse(
+                entry["content"], content_type=entry["content_type"]
+            )
+            response["ETag"] = etag
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+# --- Template fragments ---
+
+FRAGMENT_COUNTERS = ("hits", "misses", "hit_us", "miss_us")
+
+
+def register_fragment(name, *tags):
+    """Declare a cacheable template fragment and the content tags it shows."""
+    fragments[name] = tags
+
+
+def fragment_key(name):
+    """The cache key of fragment ``name`` for the current tag tokens."""
+    versions = current_versions(fragments[name])
+    digest = hashlib.md5(
+        repr(sorted(versions.items())).encode(), usedforsecurity=False
+    ).hexdigest()
+    return f"{FRAGMENT_PREFIX}{name}:{digest}"
+
+
+def stale_fragments(names):
+    """The fragments among ``names`` that are not cached for the current tokens."""
+    keys = {fragment_key(name): name for name in names}
+    cached = cache.get_many(keys)
+    return {name for key, name in keys.items() if key not in cached}
+
+
+def render_fragment(name, render):
+    """
+    Return the cached HTML of fragment ``name``, calling ``render()`` on a miss.
+
+    Returns ``(html, outcome, seconds)`` where ``outcome`` is ``"hits"`` or
+    ``"misses"`` and ``seconds`` is the wall time spent producing the HTML.
+    """
+    started = time.perf_counter()
+    key = fragment_key(name)
+    html = cache.get(key)
+    outcome, timer = "hits", "hit_us"
+    if html is None:
+        outcome, timer = "misses", "miss_us"
+        html = render()
+        cache.set(key, html, settings.PAGE_CACHE_TIMEOUT)
+    elapsed = time.perf_counter() - started
+    metrics.count_cache(outcome)
+    _incr(f"{FRAGMENT_STATS_PREFIX}{name}:{outcome}")
+    _incr(f"{FRAGMENT_STATS_PREFIX}{name}:{timer}", int(elapsed * 1e6))
+    return html, outcome, elapsed
+
+
+def fragment_stats():
+    """
+    Return ``{name: {"hits", "misses", "hit_ms", "miss_ms"}}`` per fragment.
+
+    ``hit_ms`` and ``miss_ms`` are the mean milliseconds spent serving a
+    fragment from the cache and rendering it afresh, respectively.
+    """
+    keys = [
+        f"{FRAGMENT_STATS_PREFIX}{name}:{counter}"
+        for name in fragments
+        for counter in FRAGMENT_COUNTERS
+    ]
+    values = cache.get_many(keys)
+
+    def mean_ms(total_us, count):
+        return total_us / count / 1000 if count else 0.0
+
+    report = {}
+    for name in fragments:
+        counts = {
+            counter: values.get(f"{FRAGMENT_STATS_PREFIX}{name}:{counter}", 0)
+            for counter in FRAGMENT_COUNTERS
+        }
+        report[name] = {
+            "hits": counts["hits"],
+            "misses": counts["misses"],
+            "hit_ms": mean_ms(counts["hit_us"], counts["hits"]),
+            "miss_ms": mean_ms(counts["miss_us"], counts["misses"]),
+        }
+    return report
@@ -0,0 +1,182 @@
+"""
+Keyset (cursor) pagination for the listing pages.
+
+Instead of ``OFFSET n`` the next page is selected with a ``WHERE`` clause
+on the ordering columns of the last row shown, so page 500 costs the same
+index range scan as page 1. Cursors are opaque url-safe strings holding
+the ordering values of the row they point at.
+
+The ordering is taken from the queryset (or the model's ``Meta.ordering``)
+and always ends with the primary key, which makes it total even when
+names or ratings repeat. Ordering columns are assumed to be non-null.
+"""
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+FORWARD = "n"
+BACKWARD = "p"
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor cannot be decoded for the paginated queryset."""
+
+
+@dataclass
+class KeysetPage:
+    """A single page of results plus the cursors of its neighbours."""
+
+    object_list: list
+    has_next: bool
+    has_previous: bool
+    next_cursor: str = None
+    previous_cursor: str = None
+    next_link: str = field(default=None, repr=False)
+    previous_link: str = field(default=None, repr=False)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginates a queryset by its ordering columns.
+
+    ``ordering`` defaults to the queryset's explicit ``order_by()`` and then
+    to the model's ``Meta.ordering``; the primary key is appended as the
+    final tie-breaker.
+    """
+
+    def __init__(self, queryset, per_page, ordering=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.model = queryset.model
+        ordering = list(
+            ordering or queryset.query.order_by or self.model._meta.ordering
+        )
+        if not {"pk", "-pk", "id", "-id"} & set(ordering):
+            ordering.append("pk")
+        self.ordering = [
+            (name.lstrip("-"), name.startswith("-")) for name in ordering
+        ]
+
+    def _field(self, name):
+        if name == "pk":
+            return self.model._meta.pk
+        return self.model._meta.get_field(name)
+
+    def encode_cursor(self, obj, direction):
+        values = [
+            self._field(name).value_to_string(obj) for name, _ in self.ordering
+        ]
+        raw = json.dumps([direction, values], separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded))
+            if direction not in (FORWARD, BACKWARD):
+                raise InvalidCursor(cursor)
+            # encode_cursor() writes one string per ordering column.
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise InvalidCursor(cursor)
+            if not all(isinstance(value, str) for value in values):
+                raise InvalidCursor(cursor)
+            values = [
+                self._field(name).to_python(value)
+                for (name, _), value in zip(self.ordering, values)
+            ]
+            if None in values:
+                raise InvalidCursor(cursor)
+        except (TypeError, ValueError, binascii.Error, ValidationError) as exc:
+            raise InvalidCursor(cursor) from exc
+        return direction, values
+
+    def _seek(self, values, direction):
+        """The WHERE clause selecting rows strictly after ``values``."""
+        clauses = []
+        for i, (name, descending) in enumerate(self.ordering):
+            before = descending == (direction == FORWARD)
+            lookup = f"{name}__{'lt' if before else 'gt'}"
+            equal = {n: v for (n, _), v in zip(self.ordering[:i], values)}
+            clauses.append(Q(**equal) & Q(**{lookup: values[i]}))
+        return reduce(or_, clauses)
+
+    def _order_by(self, direction):
+        order_by = []
+        for name, descending in self.ordering:
+            if direction == BACKWARD:
+                descending = not descending
+            order_by.append(f"-{name}" if descending else name)
+        return order_by
+
+    def rows_after(self, direction, values=None):
+        """
+        The queryset of every row following (or, going ``BACKWARD``,
+        preceding) the row with ordering ``values``, nearest first.
+        """
+        queryset = self.queryset.order_by(*self._order_by(direction))
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, direction))
+        return queryset
+
+    def page(self, cursor=None):
+        """Return the page starting after (or ending before) ``cursor``."""
+        direction, values = FORWARD, None
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+
+        rows = list(self.rows_after(direction, values)[: self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+
+        if direction == BACKWARD:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        page = KeysetPage(rows, has_next=has_next, has_previous=has_previous)
+        if rows and has_next:
+            page.next_cursor = self.encode_cursor(rows[-1], FORWARD)
+        if rows and has_previous:
+            page.previous_cursor = self.encode_cursor(rows[0], BACKWARD)
+        return page
+
+
+def paginate(request, queryset, per_page, param="cursor"):
+    """
+    Paginate ``queryset`` with the cursor from ``request.GET[param]``.
+
+    The returned page carries ready-made ``next_link``/``previous_link``
+    query strings that keep any other GET parameters (such as filters).
+    Unreadable cursors raise ``Http404`` like an out-of-range page would.
+    """
+    paginator = KeysetPaginator(queryset, per_page)
+    try:
+        page = paginator.page(request.GET.get(param))
+    except InvalidCursor:
+        raise Http404("Invalid page cursor.")
+
+    def link(cursor):
+        query = request.GET.copy()
+        query[param] = cursor
+        return f"?{query.urlencode()}"
+
+    if page.next_cursor:
+        page.next_link = link(page.next_cursor)
+    if page.previous_cursor:
+        page.previous_link = link(page.previous_cursor)
+    return page
@@ -0,0 +1,115 @@
+"""
+Prices of hotel stays.
+
+A night costs the hotel's ``price_per_night`` adjusted by the sum of the
+percentages of the :class:`~my_app.models.RateRule` rows that apply to it
+(season, weekend nights, number of guests)::
+
+    base 5000, "Peak season" +30 %, "Weekend" +10 %  ->  7000 on a
+    Saturday in season, 6500 on a Tuesday
+
+Rules are stored as date ranges, so quoting a stay reads the few rules of
+a hotel that touch the stay in one range query, whatever its length.
+``quote_many()`` prices one stay at many hotels with at most two
+queries in total, for search results and listings.
+"""
+
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import Q
+
+from .models import Hotel, RateRule
+
+CENT = Decimal("0.01")
+
+
+@dataclass
+class Quote:
+    hotel_id: int
+    check_in: object
+    check_out: object
+    guests: int
+    # (night, price) for every night of the stay.
+    nights: list = field(default_factory=list)
+
+    @property
+    def total(self):
+        return sum((price for _, price in self.nights), Decimal("0.00"))
+
+    @property
+    def average(self):
+        return (self.total / len(self.nights)).quantize(CENT) if self.nights else None
+
+
+def nights(check_in, check_out):
+    return [check_in + timedelta(days=n) for n in range((check_out - check_in).days)]
+
+
+def rules_for(hotel_ids, check_in, check_out, guests):
+    """The rules of ``hotel_ids`` that can apply to some night of the stay."""
+    last_night = check_out - timedelta(days=1)
+    return (
+        RateRule.objects.filter(hotel_id__in=hotel_ids, min_guests__lte=guests)
+        .filter(Q(end_date__isnull=True) | Q(end_date__gte=check_in))
+        .filter(Q(start_date__isnull=True) | Q(start_date__lte=last_night))
+        .values_list("hotel_id", "start_date", "end_date", "weekdays", "percent")
+    )
+
+
+def price_nights(base, stay, rules):
+    """``[(night, price)]`` for ``stay`` at ``base`` under ``rules``."""
+    base = Decimal(base)
+    # Percent adjustment per night, summed over the rules covering it.
+    percents = [Decimal(0)] * len(stay)
+    for start, end, weekdays, percent in rules:
+        for n, night in enumerate(stay):
+            if (
+                (start is None or start <= night)
+                and (end is None or night <= end)
+                and weekdays & (1 << night.weekday())
+            ):
+                percents[n] += percent
+    return [
+        (night, (base * (100 + percent) / 100).quantize(CENT, ROUND_HALF_UP))
+        for night, percent in zip(stay, percents)
+    ]
+
+
+def quote_many(hotels, check_in, check_out, guests=1):
+    """
+    Quote the stay at every hotel of ``hotels`` (a queryset or an iterable
+    of hotels or primary keys). Returns ``{hotel pk: Quote}``.
+    """
+    if hasattr(hotels, "values_list"):
+        prices = dict(hotels.values_list("pk", "price_per_night"))
+    else:
+        prices, pks = {}, []
+        for hotel in hotels:
+            if isinstance(hotel, Hotel):
+                prices[hotel.pk] = hotel.price_per_night
+            else:
+                pks.append(hotel)
+        if pks:
+            found = Hotel.objects.filter(pk__in=pks)
+            prices.update(found.values_list("pk", "price_per_night"))
+    rules = {}
+    for hotel_id, *rule in rules_for(prices, check_in, check_out, guests):
+        rules.setdefault(hotel_id, []).append(rule)
+    stay = nights(check_in, check_out)
+    return {
+        pk: Quote(
+            pk,
+            check_in,
+            check_out,
+            guests,
+            price_nights(base, stay, rules.get(pk, [])),
+        )
+        for pk, base in prices.items()
+    }
+
+
+def quote(hotel, check_in, check_out, guests=1):
+    """Quote one stay at ``hotel``."""
+    return quote_many([hotel], check_in, check_out, guests)[hotel.pk]
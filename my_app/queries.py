@@ -0,0 +1,280 @@
+"""
+Query shaping for the public views.
+
+Each function returns the queryset a single view renders from, with the
+joins (``select_related``), batched child lookups (``prefetch_related``)
+and column lists (``only``) its template needs. Templates must not touch
+a relation or field that is not declared here, otherwise they fall back
+to one query per row.
+"""
+
+from datetime import datetime, timedelta
+
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+from .models import (
+    Amenity,
+    BlogMonth,
+    BlogPost,
+    BlogRedirect,
+    Category,
+    Destination,
+    FAQ,
+    Hotel,
+    Itinerary,
+    Tag,
+)
+
+# --- Column lists shared by the card/list templates ---
+
+DESTINATION_CARD_FIELDS = (
+    "id",
+    "name",
+    "slug",
+    "country",
+    "image",
+    "hotel_count",
+    "min_price",
+    "avg_rating",
+)
+
+HOTEL_CARD_FIELDS = (
+    "id",
+    "name",
+    "slug",
+    "image",
+    "rating",
+    "price_per_night",
+    "destination__id",
+    "destination__name",
+)
+
+BLOG_CARD_FIELDS = (
+    "id",
+    "title",
+    "slug",
+    "excerpt",
+    "featured_image",
+    "published_at",
+    "category__id",
+    "category__name",
+)
+
+
+# --- home ---
+
+
+def featured_destinations():
+    """Destinations shown on the homepage, in the 'Featured' grid and trip planner."""
+    return Destination.objects.filter(is_featured=True).only(*DESTINATION_CARD_FIELDS)
+
+
+def featured_hotels():
+    """Top rated featured hotels for the homepage, with their destination joined in."""
+    return (
+        Hotel.objects.filter(is_featured=True)
+        .select_related("destination")
+        .only(*HOTEL_CARD_FIELDS)
+        .order_by("-rating")
+    )
+
+
+def faqs():
+    """All FAQs for the homepage accordion."""
+    return FAQ.objects.all()
+
+
+# --- destinations ---
+
+
+def destination_list():
+    """Destinations for the listing page."""
+    return Destination.objects.only(*DESTINATION_CARD_FIELDS)
+
+
+def destination_last_modified(slug):
+    """When the destination page last changed (its itinerary and gallery touch it)."""
+    return (
+        Destination.objects.filter(slug=slug)
+        .values_list("updated_at", flat=True)
+        .first()
+    )
+
+
+def destination_detail():
+    """A destination with its itinerary fetched in one extra query."""
+    itinerary = Itinerary.objects.only("id", "destination_id", "day", "title", "detail")
+    return Destination.objects.prefetch_related(
+        Prefetch("itinerary", queryset=itinerary)
+    )
+
+
+# --- hotels ---
+
+
+def hotel_list():
+    """Hotels for the listing page, with their destination joined in."""
+    return Hotel.objects.select_related("destination").only(*HOTEL_CARD_FIELDS)
+
+
+def amenities():
+    """Every amenity, for the hotel filters and facet counts."""
+    return Amenity.objects.all()
+
+
+def destination_names():
+    """Destinations for the hotel filter's drop-down."""
+    return Destination.objects.only("id", "name").order_by("name")
+
+
+def hotel_last_modified(slug):
+    """When the hotel page last changed; it also shows its destination."""
+    row = (
+        Hotel.objects.filter(slug=slug)
+        .values_list("updated_at", "destination__updated_at")
+        .first()
+    )
+    return max(row) if row else None
+
+
+def hotel_detail():
+    """A hotel with its destination joined in."""
+    return Hotel.objects.select_related("destination")
+
+
+# --- blog ---
+
+
+def blog_list():
+    """Published posts for the listing page, with their category joined in."""
+    return (
+        BlogPost.objects.filter(status="published")
+        .select_related("category")
+        .only(*BLOG_CARD_FIELDS)
+    )
+
+
+def posts_in_month(year, month):
+    """Published posts of a local calendar month, or ``None`` for an invalid one."""
+    try:
+        start = timezone.make_aware(datetime(year, month, 1))
+        following = (start + timedelta(days=32)).replace(day=1)
+        end = timezone.make_aware(datetime(following.year, following.month, 1))
+    except (ValueError, OverflowError):
+        return None
+    return blog_list().filter(published_at__gte=start, published_at__lt=end)
+
+
+def blog_category():
+    """Categories, to look one up for its listing."""
+    return Category.objects.only("id", "name", "slug")
+
+
+def blog_tag():
+    """Tags, to look one up for its listing."""
+    return Tag.objects.only("id", "name", "slug")
+
+
+def sidebar_categories():
+    """Categories with published posts, and their stored counts."""
+    return Category.objects.filter(post_count__gt=0).only("name", "slug", "post_count")
+
+
+def sidebar_tags():
+    """Tags with published posts, and their stored counts."""
+    return Tag.objects.filter(post_count__gt=0).only("name", "slug", "post_count")
+
+
+def sidebar_months():
+    """Months with published posts, newest first, and their stored counts."""
+    return BlogMonth.objects.filter(post_count__gt=0)
+
+
+def popular_posts():
+    """Most viewed published posts, read in index order (no sort of the table)."""
+    return (
+        BlogPost.objects.filter(status="published")
+        .only("id", "title", "slug", "published_at", "views")
+        .order_by("-views", "id")
+    )
+
+
+def published_on(year, month, day, slug):
+    """
+    A filter for the published post ``slug`` of a local calendar day, or
+    ``None`` if there is no such day. The day becomes a ``published_at``
+    range, so the whole filter is one seek of ``blogpost_lookup_idx``.
+    """
+    try:
+        start = timezone.make_aware(datetime(year, month, day))
+        end = start + timedelta(days=1)
+    except (ValueError, OverflowError):
+        return None
+    return Q(
+        status="published",
+        published_at__gte=start,
+        published_at__lt=end,
+        slug=slug,
+    )
+
+
+def blog_last_modified(year, month, day, slug):
+    """When the blog post page last changed."""
+    lookup = published_on(year, month, day, slug)
+    if lookup is None:
+        return None
+    return BlogPost.objects.filter(lookup).values_list("updated_at", flat=True).first()
+
+
+def blog_detail(year, month, day, slug):
+    """The published post at a date-scoped URL, with its category joined in."""
+    lookup = published_on(year, month, day, slug)
+    if lookup is None:
+        return BlogPost.objects.none()
+    return BlogPost.objects.filter(lookup).select_related("category")
+
+
+def related_candidates(post):
+    """The precomputed related posts of ``post`` that are still published."""
+    return BlogPost.objects.filter(
+        pk__in=post.related_post_ids, status="published"
+    ).only("id", "title", "slug", "published_at", "featured_image")
+
+
+def in_related_order(post, posts):
+    """``posts`` in the stored order of ``post``'s related posts."""
+    by_pk = {related.pk: related for related in posts}
+    return [by_pk[pk] for pk in post.related_post_ids if pk in by_pk]
+
+
+def related_posts(post):
+    """
+    The precomputed related posts of ``post`` that are still published, in
+    their stored order.
+    """
+    if not post.related_post_ids:
+        return []
+    return in_related_order(post, related_candidates(post))
+
+
+def blog_redirect(slug):
+    """Where an old slug-only blog URL now lives, if it points at a published post."""
+    return (
+        BlogRedirect.objects.filter(slug=slug, post__status="published")
+        .select_related("post")
+        .only("post__id", "post__slug", "post__published_at")
+    )
+
+
+# --- feeds ---
+
+
+def feed_posts():
+    """Published posts for the Atom feed, newest first, with their category."""
+    return (
+        BlogPost.objects.filter(status="published")
+        .select_related("category")
+        .only(*BLOG_CARD_FIELDS, "updated_at")
+        .order_by("-published_at", "-pk")
+    )
@@ -0,0 +1,118 @@
+"""
+Resized renditions of uploaded images.
+
+Every image field of the catalogue is served in three widths (small,
+medium, large), each as WebP with a JPEG fallback. Renditions are stored
+next to the uploads under ``MEDIA_ROOT/renditions/<upload path>/`` and
+are built by a background job queued when an image is uploaded (see
+:mod:`my_app.signals`); until it has run, pages show the original.
+Images uploaded before renditions existed are queued with
+``manage.py queue_renditions``.
+
+Templates use the ``{% responsive_image %}`` tag from ``images``, which
+emits a ``<picture>`` element with ``srcset`` lists for both formats.
+"""
+
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+RENDITION_ROOT = "renditions"
+
+# Name -> target width in pixels. Images are never enlarged.
+SIZES = {
+    "small": 320,
+    "medium": 768,
+    "large": 1280,
+}
+
+# Name -> (Pillow format, file extension, save options).
+FORMATS = {
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+def rendition_name(name, size, fmt):
+    """Storage name of the ``size``/``fmt`` rendition of upload ``name``."""
+    stem = os.path.splitext(name)[0]
+    return f"{RENDITION_ROOT}/{stem}/{size}.{FORMATS[fmt][1]}"
+
+
+def _encode(image, fmt):
+    pil_format, _, options = FORMATS[fmt]
+    if pil_format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    elif image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    buffer = BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def build_renditions(name, storage=default_storage):
+    """
+    Build the renditions of upload ``name``, replacing any existing ones.
+
+    The original is decoded once and resized from the largest size down.
+    Returns the storage names written.
+    """
+    with storage.open(name, "rb") as original:
+        image = ImageOps.exif_transpose(Image.open(original))
+        image.load()
+
+    written = []
+    for size, width in sorted(SIZES.items(), key=lambda item: -item[1]):
+        if image.width > width:
+            height = round(image.height * width / image.width)
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        for fmt in FORMATS:
+            target = rendition_name(name, size, fmt)
+            if storage.exists(target):
+                storage.delete(target)
+            written.append(storage.save(target, ContentFile(_encode(image, fmt))))
+    return written
+
+
+def delete_renditions(name, storage=default_storage):
+    """Remove every rendition of upload ``name``."""
+    for size in SIZES:
+        for fmt in FORMATS:
+            target = rendition_name(name, size, fmt)
+            if storage.exists(target):
+                storage.delete(target)
+
+
+def has_renditions(fieldfile):
+    """
+    Return whether every rendition of ``fieldfile`` exists. Pages never
+    build them; they show the original until the background job has run.
+
+    Checked with one ``stat`` per image rather than remembered: another
+    process may delete the renditions, and rendered pages are cached.
+    """
+    # The smallest size in the last format is written last, so its
+    # presence marks a complete build.
+    last = rendition_name(
+        fieldfile.name, min(SIZES, key=SIZES.get), list(FORMATS)[-1]
+    )
+    return fieldfile.storage.exists(last)
+
+
+def rendition_url(fieldfile, size, fmt="jpeg"):
+    """URL of a rendition of ``fieldfile``, or of the original as a fallback."""
+    if not fieldfile:
+        return ""
+    if not has_renditions(fieldfile):
+        return fieldfile.url
+    return fieldfile.storage.url(rendition_name(fieldfile.name, size, fmt))
+
+
+def srcset(fieldfile, fmt):
+    """A ``srcset`` attribute value listing every size of ``fieldfile``."""
+    return ", ".join(
+        f"{rendition_url(fieldfile, size, fmt)} {width}w"
+        for size, width in SIZES.items()
+    )
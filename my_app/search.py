@@ -0,0 +1,234 @@
+"""
+Site search over hotels, destinations and blog posts.
+
+Documents live in the SQLite FTS5 table ``my_app_search`` (created by
+migration ``0005_search_index``), one row per object with its HTML
+stripped::
+
+    title   name / title                          (weighted highest)
+    extra   address and destination / country / excerpt
+    body    description / content
+
+Rows are kept in step by the receivers in :mod:`my_app.signals`;
+``manage.py rebuild_search_index`` rebuilds the whole table. The row id
+encodes the object: ``pk * len(KINDS) + kind``, so an object's row is
+replaced by rowid without scanning the table.
+
+Results are ranked with ``bm25`` and come with a highlighted snippet of
+the best matching column. The admin filters its changelists by the same
+table with :func:`matching` (see ``SearchIndexAdminMixin``), including
+unpublished posts.
+"""
+
+import html
+import re
+from dataclasses import dataclass
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape, strip_tags
+from django.utils.safestring import mark_safe
+
+from . import queries
+
+TABLE = "my_app_search"
+
+# Kind -> code used in the row id. Append only: codes are stored.
+KINDS = ("destination", "hotel", "blogpost")
+
+# bm25 weights of the columns (kind, public, title, extra, body).
+WEIGHTS = (0.0, 0.0, 10.0, 4.0, 1.0)
+
+# Snippet markers; the snippet is escaped before they become <mark> tags.
+MARK_START, MARK_END = "\x02", "\x03"
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def text(value):
+    """Plain text of an HTML field."""
+    return " ".join(html.unescape(strip_tags(value or "")).split())
+
+
+def document(kind, obj):
+    """``(public, title, extra, body)`` of the row indexing ``obj``."""
+    if kind == "destination":
+        return True, obj.name, obj.country, text(obj.description)
+    if kind == "hotel":
+        extra = f"{obj.address} {obj.destination.name}"
+        return True, obj.name, extra, text(obj.description)
+    if kind == "blogpost":
+        extra = text(obj.excerpt)
+        return obj.status == "published", obj.title, extra, text(obj.content)
+    raise ValueError(f"Not a searchable kind: {kind!r}")
+
+
+def kind_of(model):
+    name = model._meta.model_name
+    return name if name in KINDS else None
+
+
+def rowid(kind, pk):
+    return pk * len(KINDS) + KINDS.index(kind)
+
+
+def _write(cursor, kind, objects):
+    rows = []
+    for obj in objects:
+        public, title, extra, body = document(kind, obj)
+        rows.append((rowid(kind, obj.pk), kind, public, title, extra, body))
+    cursor.executemany(
+        f"DELETE FROM {TABLE} WHERE rowid = %s", [row[:1] for row in rows]
+    )
+    cursor.executemany(
+        f"INSERT INTO {TABLE} (rowid, kind, public, title, extra, body) "
+        "VALUES (%s, %s, %s, %s, %s, %s)",
+        rows,
+    )
+
+
+def index(*objects):
+    """Add or replace the rows of ``objects`` (all of one model)."""
+    if not objects:
+        return
+    kind = kind_of(type(objects[0]))
+    with connection.cursor() as cursor:
+        _write(cursor, kind, objects)
+
+
+def remove(obj):
+    """Drop the row of ``obj``."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {TABLE} WHERE rowid = %s",
+            [rowid(kind_of(type(obj)), obj.pk)],
+        )
+
+
+def rebuild(models, batch=500):
+    """Replace the whole index with the rows of ``models`` (kind -> model)."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+        total = 0
+        for kind, model in models.items():
+            objects = model._default_manager.order_by("pk")
+            if kind == "hotel":
+                objects = objects.select_related("destination")
+            chunk = []
+            for obj in objects.iterator(chunk_size=batch):
+                chunk.append(obj)
+                if len(chunk) == batch:
+                    _write(cursor, kind, chunk)
+                    total += len(chunk)
+                    chunk = []
+            _write(cursor, kind, chunk)
+            total += len(chunk)
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return total
+
+
+def match_expression(query):
+    """
+    An FTS5 query matching every word of ``query`` as a prefix, or ``""``.
+
+    User input is never passed to FTS5 as syntax: each word is quoted.
+    """
+    return " ".join(f'"{word}"*' for word in TOKEN.findall(query.lower()))
+
+
+def _search(query, kinds, public_only, limit, with_snippets):
+    expression = match_expression(query)
+    if not expression:
+        return []
+    columns = "rowid"
+    if with_snippets:
+        columns += (
+            f", snippet({TABLE}, -1, '{MARK_START}', '{MARK_END}', '…', 16)"
+        )
+    weights = ", ".join(str(weight) for weight in WEIGHTS)
+    kind_params = ", ".join(["%s"] * len(kinds))
+    sql = (
+        f"SELECT {columns} FROM {TABLE} "
+        f"WHERE {TABLE} MATCH %s AND kind IN ({kind_params}) "
+        + ("AND public = 1 " if public_only else "")
+        + f"ORDER BY bm25({TABLE}, {weights}) LIMIT %s"
+    )
+    with connection.cursor() as cursor:
+        # SQLite reads a negative LIMIT as "no limit".
+        cursor.execute(sql, [expression, *kinds, -1 if limit is None else limit])
+        return cursor.fetchall()
+
+
+def matching_pks(model, query, limit=1000):
+    """
+    Primary keys of the ``model`` rows matching ``query``, best first; all
+    of them if ``limit`` is None.
+    """
+    kind = kind_of(model)
+    rows = _search(query, [kind], public_only=False, limit=limit, with_snippets=False)
+    return [row[0] // len(KINDS) for row in rows]
+
+
+def matching(queryset, query):
+    """
+    ``queryset`` narrowed to the rows matching ``query``, unranked.
+
+    The matching is a subquery on the index, so any number of matches
+    costs one statement and no list of primary keys.
+    """
+    kind = kind_of(queryset.model)
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    rows = RawSQL(
+        f"SELECT rowid / {len(KINDS)} FROM {TABLE} "
+        f"WHERE {TABLE} MATCH %s AND kind = %s",
+        [expression, kind],
+    )
+    return queryset.filter(pk__in=rows)
+
+
+@dataclass
+class SearchResult:
+    kind: str
+    object: object
+    snippet: str
+
+
+# Kind -> queryset the result cards are rendered from.
+RESULT_QUERYSETS = {
+    "destination": queries.destination_list,
+    "hotel": queries.hotel_list,
+    "blogpost": queries.blog_list,
+}
+
+
+def highlight(snippet):
+    """Escape a snippet and turn its markers into ``<mark>`` elements."""
+    escaped = escape(snippet)
+    return mark_safe(
+        escaped.replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+    )
+
+
+def search(query, kinds=KINDS, limit=20):
+    """
+    Published objects matching ``query``, best first, as ``SearchResult``.
+
+    Runs one FTS query plus one query per kind with results.
+    """
+    rows = _search(query, kinds, public_only=True, limit=limit, with_snippets=True)
+    wanted = {}
+    for row_id, _ in rows:
+        kind = KINDS[row_id % len(KINDS)]
+        wanted.setdefault(kind, []).append(row_id // len(KINDS))
+    found = {
+        kind: RESULT_QUERYSETS[kind]().in_bulk(pks) for kind, pks in wanted.items()
+    }
+    results = []
+    for row_id, snippet in rows:
+        kind, pk = KINDS[row_id % len(KINDS)], row_id // len(KINDS)
+        obj = found[kind].get(pk)
+        if obj is not None:
+            results.append(SearchResult(kind, obj, highlight(snippet)))
+    return results
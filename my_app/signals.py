@@ -0,0 +1,473 @@
+"""
+Model signal receivers that keep derived data in step with the catalogue.
+
+Connected from :meth:`my_app.apps.MyAppConfig.ready`.
+"""
+
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    blog_stats,
+    destination_stats,
+    hotel_search,
+    jobs,
+    page_cache,
+    renditions,
+    search,
+)
+from .models import (
+    FAQ,
+    Amenity,
+    BlogPost,
+    Category,
+    Destination,
+    GalleryImage,
+    Hotel,
+    Itinerary,
+    Tag,
+)
+
+# Section tags for pages that list "whatever is featured" rather than
+# specific objects; bumped whenever an object enters, leaves or changes
+# within such a list.
+FEATURED_DESTINATIONS = "destination:featured"
+FEATURED_HOTELS = "hotel:featured"
+ALL_FAQS = "faq:all"
+# Bumped whenever buffered post views are written.
+POPULAR_POSTS = "blogpost:popular"
+# Bumped whenever a category, tag or month post count changes.
+BLOG_ARCHIVE = "blogpost:archive"
+
+# Homepage sections, each cached on its own by ``{% cachedfragment %}``.
+page_cache.register_fragment("trip_planner", FEATURED_DESTINATIONS)
+page_cache.register_fragment("featured_destinations", FEATURED_DESTINATIONS)
+page_cache.register_fragment("featured_hotels", FEATURED_HOTELS)
+page_cache.register_fragment("faqs", ALL_FAQS)
+# Blog sidebar.
+page_cache.register_fragment("popular_posts", POPULAR_POSTS)
+page_cache.register_fragment("blog_archive", BLOG_ARCHIVE)
+
+
+# --- Previous state ---
+
+# Fields whose value before a save decides what must be invalidated.
+TRACKED_FIELDS = {
+    Destination: ("is_featured", "image", "name"),
+    Hotel: (
+        "is_featured",
+        "image",
+        "destination",
+        "is_available",
+        "price_per_night",
+        "rating",
+    ),
+    GalleryImage: ("image",),
+    BlogPost: ("featured_image", "status", "category", "published_at"),
+}
+
+
+@receiver(pre_save)
+def remember_previous_state(sender, instance, **kwargs):
+    """Store the tracked fields of the row being overwritten on the instance."""
+    fields = TRACKED_FIELDS.get(sender)
+    if fields is None:
+        return
+    previous = None
+    if instance.pk is not None:
+        rows = sender._default_manager.filter(pk=instance.pk).values(*fields)
+        previous = rows.first()
+    instance._previous_state = previous or {}
+
+
+def was(instance, field):
+    """The value ``field`` had before the current save (``None`` if new)."""
+    return getattr(instance, "_previous_state", {}).get(field)
+
+
+# --- Page cache invalidation ---
+
+
+def destination_tags(destination):
+    tags = [page_cache.object_tag(destination)]
+    if destination.is_featured or was(destination, "is_featured"):
+        tags.append(FEATURED_DESTINATIONS)
+    # Featured hotel cards show the name of their destination.
+    if Hotel.objects.filter(destination_id=destination.pk, is_featured=True).exists():
+        tags.append(FEATURED_HOTELS)
+    return tags
+
+
+def hotel_tags(hotel):
+    tags = [page_cache.object_tag(hotel)]
+    if hotel.is_featured or was(hotel, "is_featured"):
+        tags.append(FEATURED_HOTELS)
+    return tags
+
+
+def gallery_image_tags(image):
+    tags = []
+    if image.hotel_id:
+        tags.append(f"hotel:{image.hotel_id}")
+    if image.destination_id:
+        tags.append(f"destination:{image.destination_id}")
+    return tags
+
+
+TAGGERS = {
+    Destination: destination_tags,
+    Hotel: hotel_tags,
+    Itinerary: lambda item: [f"destination:{item.destination_id}"],
+    GalleryImage: gallery_image_tags,
+    BlogPost: lambda post: [page_cache.object_tag(post), POPULAR_POSTS],
+    FAQ: lambda faq: [ALL_FAQS],
+}
+
+
+# Seconds to wait before re-rendering an evicted page, so that a burst of
+# edits (an admin save with inlines) is followed by a single render.
+WARM_DELAY = 5
+
+
+def warm_paths(instance, tags):
+    """The pages worth re-rendering in the background after ``instance`` changed."""
+    paths = []
+    # Unpublished posts have no public page to warm.
+    public = getattr(instance, "status", "published") == "published"
+    if public and hasattr(instance, "get_absolute_url"):
+        paths.append(instance.get_absolute_url())
+    if FEATURED_DESTINATIONS in tags or FEATURED_HOTELS in tags:
+        paths.append(reverse("home"))
+    return paths
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_pages(sender, instance, raw=False, **kwargs):
+    """
+    Evict the cached pages that show a saved or deleted object, and queue
+    the saved object's own page and the homepage to be rendered again.
+    """
+    tagger = TAGGERS.get(sender)
+    if tagger is None:
+        return
+    tags = tagger(instance)
+    page_cache.invalidate(*tags)
+    if kwargs["signal"] is not post_save or raw:
+        return
+    for path in warm_paths(instance, tags):
+        jobs.enqueue(
+            "warm_page", {"path": path}, key=f"warm:{path}", delay=WARM_DELAY
+        )
+
+
+# Models listed in full by the JSON API (see my_app.api); any change to one
+# of their rows replaces the token of its collection tag.
+COLLECTION_MODELS = (Destination, Hotel, Amenity, BlogPost, Category, Tag)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_collections(sender, instance, **kwargs):
+    if sender in COLLECTION_MODELS:
+        page_cache.invalidate(page_cache.collection_tag(sender))
+
+
+M2M_FIELDS = {
+    Hotel.amenities.through: "amenities",
+    BlogPost.tags.through: "tags",
+}
+
+
+def m2m_owner_pks(sender, instance, action, reverse, model, pk_set):
+    """
+    The primary keys of the hotels/posts affected by an ``m2m_changed`` call.
+
+    For a reverse ``clear()`` (``amenity.hotels.clear()``) Django sends no
+    ``pk_set``, so the owners are looked up before the rows are removed.
+    """
+    if not reverse:
+        return {instance.pk} if action.startswith("post_") else set()
+    if action == "pre_clear":
+        return set(
+            model.objects.filter(**{M2M_FIELDS[sender]: instance}).values_list(
+                "pk", flat=True
+            )
+        )
+    if action in ("post_add", "post_remove"):
+        return set(pk_set)
+    return set()
+
+
+@receiver(m2m_changed, sender=Hotel.amenities.through)
+@receiver(m2m_changed, sender=BlogPost.tags.through)
+def m2m_owners_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """Evict and touch the hotels or posts whose amenities or tags changed."""
+    owner = model if reverse else type(instance)
+    pks = m2m_owner_pks(sender, instance, action, reverse, model, pk_set)
+    if not pks:
+        return
+    label = owner._meta.model_name
+    page_cache.invalidate(
+        page_cache.collection_tag(owner), *(f"{label}:{pk}" for pk in pks)
+    )
+    owner.objects.filter(pk__in=pks).update(updated_at=timezone.now())
+
+
+# --- Amenity masks ---
+
+
+@receiver(m2m_changed, sender=Hotel.amenities.through)
+def update_amenity_masks(sender, instance, action, reverse, pk_set, **kwargs):
+    """Recompute ``Hotel.amenity_mask`` after a hotel's amenities changed."""
+    if action == "pre_clear" and reverse:
+        # amenity.hotels.clear(): remember the hotels before the rows go.
+        instance._cleared_hotels = list(
+            instance.hotels.values_list("pk", flat=True)
+        )
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        pks = [instance.pk]
+    elif action == "post_clear":
+        pks = instance.__dict__.pop("_cleared_hotels", [])
+    else:
+        pks = pk_set
+    hotel_search.refresh_masks(pks)
+
+
+@receiver(pre_delete, sender=Amenity)
+def remember_amenity_hotels(sender, instance, **kwargs):
+    # Deleting an amenity drops its through rows without m2m_changed.
+    instance._cleared_hotels = list(instance.hotels.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Amenity)
+def clear_deleted_amenity(sender, instance, **kwargs):
+    hotel_search.refresh_masks(instance.__dict__.pop("_cleared_hotels", []))
+
+
+# --- Destination figures ---
+
+
+@receiver(post_save, sender=Hotel)
+@receiver(post_delete, sender=Hotel)
+def update_destination_stats(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Recompute the hotel figures of the destinations a hotel joined or left,
+    or whose figures its price, rating or availability feeds.
+    """
+    if raw:
+        return
+    pks = {instance.destination_id}
+    if kwargs["signal"] is post_save and not created:
+        previous = instance._previous_state
+        pks.add(previous.get("destination", instance.destination_id))
+        unchanged = all(
+            previous.get(field)
+            == sender._meta.get_field(field).to_python(getattr(instance, field))
+            for field in ("is_available", "price_per_night", "rating")
+        )
+        if unchanged and len(pks) == 1:
+            return
+    destination_stats.refresh(pks)
+    page_cache.invalidate(*(f"destination:{pk}" for pk in pks))
+
+
+# --- Blog counts and related posts ---
+
+
+@receiver(pre_delete, sender=BlogPost)
+def remember_post_tags(sender, instance, **kwargs):
+    # Deleting a post drops its through rows without m2m_changed.
+    instance._cleared_tags = list(instance.tags.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def update_blog_stats(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Recompute a saved post's related posts, and the counts of the
+    categories, tags and months a post joined or left.
+    """
+    if raw:
+        return
+    saved = kwargs["signal"] is post_save
+    if saved:
+        instance.related_post_ids = blog_stats.related_ids(instance.pk)
+        sender.objects.filter(pk=instance.pk).update(
+            related_post_ids=instance.related_post_ids
+        )
+    previous = instance._previous_state if saved and not created else {}
+    if "published" not in (instance.status, previous.get("status")):
+        return  # Drafts are not counted.
+    categories = {instance.category_id, previous.get("category", instance.category_id)}
+    months = {blog_stats.month_of(instance.published_at)}
+    if previous.get("published_at"):
+        months.add(blog_stats.month_of(previous["published_at"]))
+    if previous:
+        unchanged = all(
+            previous.get(field)
+            == sender._meta.get_field(field).to_python(getattr(instance, field))
+            for field in ("status", "published_at")
+        )
+        if unchanged and len(categories) == 1:
+            return
+    if saved:
+        tags = instance.tags.values_list("pk", flat=True)
+    else:
+        tags = instance.__dict__.pop("_cleared_tags", [])
+    blog_stats.refresh_categories(categories - {None})
+    blog_stats.refresh_months(months)
+    blog_stats.refresh_tags(tags)
+    page_cache.invalidate(BLOG_ARCHIVE)
+
+
+@receiver(m2m_changed, sender=BlogPost.tags.through)
+def update_tag_stats(sender, instance, action, reverse, pk_set, **kwargs):
+    """Recount the tags, and recompute the related posts, of retagged posts."""
+    if action == "pre_clear":
+        # Remember the other side of the rows before they go.
+        related = instance.posts if reverse else instance.tags
+        instance._cleared_pks = list(related.values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if action == "post_clear":
+        pk_set = instance.__dict__.pop("_cleared_pks", [])
+    posts, tags = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+    blog_stats.refresh_tags(tags)
+    blog_stats.refresh_related(posts)
+    page_cache.invalidate(BLOG_ARCHIVE)
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_tag_posts(sender, instance, **kwargs):
+    instance._cleared_posts = list(instance.posts.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def refresh_untagged_posts(sender, instance, **kwargs):
+    blog_stats.refresh_related(instance.__dict__.pop("_cleared_posts", []))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_blog_archive(sender, instance, **kwargs):
+    """The sidebar lists every category and tag by name."""
+    page_cache.invalidate(BLOG_ARCHIVE)
+
+
+# --- Last-modified markers ---
+
+
+@receiver(post_save, sender=Itinerary)
+@receiver(post_delete, sender=Itinerary)
+@receiver(post_save, sender=GalleryImage)
+@receiver(post_delete, sender=GalleryImage)
+def touch_parents(sender, instance, **kwargs):
+    """
+    Move the ``updated_at`` of a destination/hotel forward when one of its
+    itinerary days or gallery images changes, so that the parent's marker
+    alone decides whether its detail page changed.
+    """
+    now = timezone.now()
+    if instance.destination_id:
+        Destination.objects.filter(pk=instance.destination_id).update(updated_at=now)
+        page_cache.invalidate(page_cache.collection_tag(Destination))
+    if getattr(instance, "hotel_id", None):
+        Hotel.objects.filter(pk=instance.hotel_id).update(updated_at=now)
+        page_cache.invalidate(page_cache.collection_tag(Hotel))
+
+
+# --- Search index ---
+
+
+@receiver(post_save, sender=Destination)
+@receiver(post_save, sender=Hotel)
+@receiver(post_save, sender=BlogPost)
+def index_for_search(sender, instance, **kwargs):
+    """Replace the search index row of a saved destination, hotel or post."""
+    search.index(instance)
+    # Hotel rows include the name of their destination.
+    if sender is Destination and was(instance, "name") not in (None, instance.name):
+        hotels = Hotel.objects.filter(destination=instance).select_related(
+            "destination"
+        )
+        search.index(*hotels)
+
+
+@receiver(post_delete, sender=Destination)
+@receiver(post_delete, sender=Hotel)
+@receiver(post_delete, sender=BlogPost)
+def remove_from_search(sender, instance, **kwargs):
+    search.remove(instance)
+
+
+# --- Image renditions ---
+
+IMAGE_FIELDS = {
+    Destination: "image",
+    Hotel: "image",
+    GalleryImage: "image",
+    BlogPost: "featured_image",
+}
+
+
+def renditions_job(instance):
+    """``(payload, key)`` of the job building the renditions of ``instance``'s image."""
+    name = getattr(instance, IMAGE_FIELDS[type(instance)]).name
+    payload = {"name": name, "model": instance._meta.label_lower, "pk": instance.pk}
+    return payload, f"renditions:{name}"
+
+
+def queue_renditions(instance):
+    """Queue a background job building the renditions of ``instance``'s image."""
+    payload, key = renditions_job(instance)
+    return jobs.enqueue("build_renditions", payload, key=key)
+
+
+def release_renditions(fieldfile, name):
+    """
+    Delete the renditions of upload ``name`` unless another row still
+    shows it, e.g. a copy made in the admin or by a catalogue import.
+    """
+    for model, field in IMAGE_FIELDS.items():
+        if model._default_manager.filter(**{field: name}).exists():
+            return
+    renditions.delete_renditions(name, storage=fieldfile.storage)
+
+
+@receiver(post_save)
+def refresh_renditions(sender, instance, raw=False, **kwargs):
+    """Queue the renditions of a newly uploaded image and drop the old ones."""
+    field = IMAGE_FIELDS.get(sender)
+    if field is None or raw:
+        return
+    fieldfile = getattr(instance, field)
+    previous = was(instance, field)
+    if previous == fieldfile.name:
+        return
+    if previous:
+        release_renditions(fieldfile, previous)
+    if fieldfile:
+        queue_renditions(instance)
+
+
+@receiver(post_delete)
+def remove_renditions(sender, instance, **kwargs):
+    field = IMAGE_FIELDS.get(sender)
+    if field is not None and getattr(instance, field):
+        fieldfile = getattr(instance, field)
+        release_renditions(fieldfile, fieldfile.name)
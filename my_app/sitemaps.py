@@ -0,0 +1,96 @@
+"""
+XML sitemaps of the destination, hotel and blog post pages.
+
+``/sitemap.xml`` is an index pointing at one sitemap per section
+(``/sitemap-hotels.xml`` …, split into pages of ``Sitemap.limit`` URLs).
+Every URL carries a ``lastmod`` taken from the ``updated_at`` markers the
+model signals keep current, so crawlers only fetch pages that changed.
+
+The sitemaps are served through :func:`my_app.page_cache.versioned`:
+each is generated once and kept in the cache until a row of a model it
+lists is saved or deleted (the ``"<model>:all"`` collection tags), and a
+crawler revalidating with ``If-None-Match`` gets a ``304``.
+"""
+
+from django.contrib.sitemaps import Sitemap
+from django.contrib.sitemaps import views as sitemap_views
+from django.db.models import F, Max
+from django.db.models.functions import Greatest
+
+from . import page_cache
+from .models import BlogPost, Destination, Hotel
+
+
+class ModelSitemap(Sitemap):
+    """
+    Lists the rows of ``model`` matching ``filters``, reading only the
+    columns their URL and ``lastmod`` need.
+    """
+
+    model = None
+    filters = {}
+    url_fields = ("slug",)
+    # When a page last changed; hotel pages also show their destination.
+    last_modified = F("updated_at")
+    depends_on = ()
+
+    def items(self):
+        return (
+            self.model._default_manager.filter(**self.filters)
+            .only("id", *self.url_fields)
+            .annotate(last_modified=self.last_modified)
+            .order_by("pk")
+        )
+
+    def lastmod(self, obj):
+        return obj.last_modified
+
+    def get_latest_lastmod(self):
+        # The default loads every item to take the max in Python.
+        return self.items().aggregate(latest=Max("last_modified"))["latest"]
+
+    def tags(self):
+        models = (self.model, *self.depends_on)
+        return [page_cache.collection_tag(model) for model in models]
+
+
+class DestinationSitemap(ModelSitemap):
+    model = Destination
+
+
+class HotelSitemap(ModelSitemap):
+    model = Hotel
+    last_modified = Greatest("updated_at", "destination__updated_at")
+    depends_on = (Destination,)
+
+
+class BlogPostSitemap(ModelSitemap):
+    model = BlogPost
+    filters = {"status": "published"}
+    url_fields = ("slug", "published_at")
+
+
+SITEMAPS = {
+    "destinations": DestinationSitemap(),
+    "hotels": HotelSitemap(),
+    "blog": BlogPostSitemap(),
+}
+
+
+def index_tags():
+    tags = [tag for sitemap in SITEMAPS.values() for tag in sitemap.tags()]
+    return list(dict.fromkeys(tags))
+
+
+def section_tags(section):
+    return SITEMAPS[section].tags() if section in SITEMAPS else []
+
+
+@page_cache.versioned(index_tags)
+def sitemap_index(request):
+    return sitemap_views.index(request, SITEMAPS, sitemap_url_name="sitemap_section")
+
+
+@page_cache.versioned(section_tags)
+def sitemap_section(request, section):
+    return sitemap_views.sitemap(request, SITEMAPS, section=section)
@@ -0,0 +1,141 @@
+"""
+Unique slugs for every slugged model.
+
+``slugify(name)`` collides as soon as two objects share a name. The
+allocator appends the lowest free ``-N`` suffix instead, and finds the
+slugs already taken with an indexed range query per base slug::
+
+    slug >= 'grand-hotel' AND slug < 'grand-hotel.'
+
+which covers ``grand-hotel`` and every ``grand-hotel-…`` ("." sorts right
+after "-"), so there are no retries after an ``IntegrityError``. The
+ranges of a whole batch of names are read in one query.
+
+Models opt in with :class:`UniqueSlugMixin` (single saves) and a manager
+from :class:`SlugQuerySet` (``bulk_create``). A slug declared
+``unique_for_date`` (``BlogPost``) only has to be unique among the rows
+of the same date, so it is allocated within that date.
+"""
+
+import datetime
+from functools import reduce
+from operator import or_
+
+from django.db import models, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+# Room left at the end of a truncated slug for a "-N" suffix.
+SUFFIX_LENGTH = 6
+
+# Base slugs whose taken slugs are read in one query.
+RANGES_PER_QUERY = 200
+
+
+def base_slug(value, max_length):
+    return slugify(value)[: max_length - SUFFIX_LENGTH].strip("-")
+
+
+def _range(field, base):
+    return Q(**{f"{field}__gte": base, f"{field}__lt": f"{base}."})
+
+
+def taken(queryset, bases, field="slug"):
+    """The values of ``field`` in ``queryset`` equal to or extending ``bases``."""
+    bases = sorted(set(bases))
+    found = set()
+    for start in range(0, len(bases), RANGES_PER_QUERY):
+        chunk = bases[start : start + RANGES_PER_QUERY]
+        ranges = [_range(field, base) for base in chunk]
+        found.update(
+            queryset.filter(reduce(or_, ranges))
+            .order_by()
+            .values_list(field, flat=True)
+        )
+    return found
+
+
+def unique_slugs(model, values, field="slug", queryset=None):
+    """
+    Slugs for ``values`` (names or titles), unique within ``queryset``
+    (default: every ``model`` row) and among themselves.
+    """
+    if queryset is None:
+        queryset = model._default_manager.all()
+    max_length = model._meta.get_field(field).max_length
+    bases = [
+        base_slug(value, max_length) or model._meta.model_name for value in values
+    ]
+    used = taken(queryset, bases, field)
+    slugs = []
+    for base in bases:
+        slug, n = base, 1
+        while slug in used:
+            n += 1
+            slug = f"{base}-{n}"
+        used.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def _day(value):
+    if isinstance(value, datetime.datetime):
+        return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+    return value
+
+
+def assign(model, objs, field="slug"):
+    """
+    Give every object of ``objs`` whose ``field`` is empty a unique slug
+    made from its ``slug_source`` field (default ``name``).
+
+    One range query per batch of names, or per date for slugs that are
+    ``unique_for_date``.
+    """
+    missing = [obj for obj in objs if not getattr(obj, field)]
+    if not missing:
+        return
+    source = getattr(model, "slug_source", "name")
+    unique_for_date = model._meta.get_field(field).unique_for_date
+    groups = {}
+    for obj in missing:
+        day = _day(getattr(obj, unique_for_date)) if unique_for_date else None
+        groups.setdefault(day, []).append(obj)
+    for day, group in groups.items():
+        queryset = model._default_manager.all()
+        if day is not None:
+            queryset = queryset.filter(**{f"{unique_for_date}__date": day})
+        saved = [obj.pk for obj in group if obj.pk is not None]
+        if saved:
+            queryset = queryset.exclude(pk__in=saved)
+        values = [getattr(obj, source) for obj in group]
+        for obj, slug in zip(group, unique_slugs(model, values, field, queryset)):
+            setattr(obj, field, slug)
+
+
+class UniqueSlugMixin:
+    """
+    Fills an empty ``slug`` with a unique one on save.
+
+    The slug is allocated in the saving transaction; with SQLite's
+    ``BEGIN IMMEDIATE`` that holds the write lock, so concurrent saves of
+    the same name cannot pick the same suffix.
+    """
+
+    slug_source = "name"
+
+    def save(self, *args, **kwargs):
+        if self.slug:
+            return super().save(*args, **kwargs)
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            assign(type(self), [self])
+            super().save(*args, **kwargs)
+
+
+class SlugQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        assign(self.model, objs)
+        return super().bulk_create(objs, *args, **kwargs)
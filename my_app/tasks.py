@@ -0,0 +1,86 @@
+"""
+Background tasks run by ``manage.py runjobs`` (see :mod:`my_app.jobs`).
+
+Imported from :meth:`my_app.apps.MyAppConfig.ready`, so that every
+process (web or worker) knows the registered task names.
+"""
+
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.core.mail import mail_managers
+from django.http import Http404, HttpRequest
+from django.urls import resolve
+
+from . import bulk_actions, jobs, page_cache, renditions
+from .models import Enquiry
+from .signals import TAGGERS
+
+logger = logging.getLogger(__name__)
+
+
+@jobs.task("build_renditions")
+def build_renditions(name, model=None, pk=None):
+    """
+    Build the renditions of upload ``name``, then evict the pages of the
+    object it belongs to, which were rendered from the original meanwhile.
+    """
+    try:
+        renditions.build_renditions(name)
+    except FileNotFoundError:
+        logger.info("Upload %s is gone; no renditions built.", name)
+        return
+    if model is None:
+        return
+    model = apps.get_model(model)
+    instance = model._default_manager.filter(pk=pk).first()
+    if instance is not None and model in TAGGERS:
+        page_cache.invalidate(*TAGGERS[model](instance))
+
+
+def _warming_request(path):
+    """A GET request for ``path`` on the site's own host, made by no reader."""
+    hosts = [host.lstrip(".") for host in settings.ALLOWED_HOSTS if host != "*"]
+    request = HttpRequest()
+    request.method = "GET"
+    request.path = request.path_info = path
+    request.META = {
+        "SERVER_NAME": hosts[0] if hosts else "localhost",
+        "SERVER_PORT": "80",
+    }
+    # Keeps the post's view count unchanged (see ``view_counts.counted``).
+    request.warming = True
+    return request
+
+
+@jobs.task("warm_page")
+def warm_page(path):
+    """Render ``path`` once so that its page is back in the page cache."""
+    try:
+        match = resolve(path)
+        request = _warming_request(path)
+        match.func(request, *match.args, **match.kwargs)
+    except Http404:
+        logger.info("%s is not found; no page to warm.", path)
+
+
+@jobs.task("notify_enquiry")
+def notify_enquiry(enquiry_id):
+    """E-mail a new enquiry to ``settings.MANAGERS``."""
+    enquiry = Enquiry.objects.filter(pk=enquiry_id).first()
+    if enquiry is None:
+        return
+    mail_managers(
+        f"New enquiry from {enquiry.name}",
+        f"From: {enquiry.name} <{enquiry.email}>\n"
+        f"Phone: {enquiry.phone_number}\n"
+        f"Subject: {enquiry.subject}\n\n"
+        f"{enquiry.message}",
+    )
+
+
+@jobs.task("bulk_action")
+def bulk_action(action, pks):
+    """Run a bulk admin action too large for a request (see bulk_actions)."""
+    bulk_actions.run(action, pks)
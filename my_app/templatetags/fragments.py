@@ -0,0 +1,49 @@
+from django import template
+
+from my_app import page_cache
+
+register = template.Library()
+
+
+class CachedFragmentNode(template.Node):
+    def __init__(self, nodelist, name):
+        self.nodelist = nodelist
+        self.name = name
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        if name not in page_cache.fragments:
+            raise template.TemplateSyntaxError(
+                f"Fragment {name!r} is not registered with page_cache."
+            )
+        html, outcome, elapsed = page_cache.render_fragment(
+            name, lambda: self.nodelist.render(context)
+        )
+        request = context.get("request")
+        if request is not None:
+            if not hasattr(request, "fragment_timings"):
+                request.fragment_timings = []
+            request.fragment_timings.append((name, outcome, elapsed))
+        return html
+
+
+@register.tag
+def cachedfragment(parser, token):
+    """
+    Cache a template section under the version of its content tags::
+
+        {% load fragments %}
+        {% cachedfragment "featured_hotels" %} ... {% endcachedfragment %}
+
+    The fragment name must be registered with
+    :func:`my_app.page_cache.register_fragment`. Querysets used only inside
+    the block are not evaluated when the fragment is served from the cache.
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(
+            f"{bits[0]!r} tag takes exactly one argument, the fragment name."
+        )
+    nodelist = parser.parse(("endcachedfragment",))
+    parser.delete_first_token()
+    return CachedFragmentNode(nodelist, parser.compile_filter(bits[1]))
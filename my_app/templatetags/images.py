@@ -0,0 +1,45 @@
+from django import template
+from django.utils.html import format_html
+
+from my_app import renditions
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(fieldfile, alt="", css_class="", sizes="100vw", loading="lazy"):
+    """
+    Render an uploaded image as a ``<picture>`` with WebP and JPEG srcsets::
+
+        {% load images %}
+        {% responsive_image hotel.image alt=hotel.name sizes="(min-width: 1024px) 25vw, 100vw" %}
+
+    ``sizes`` tells the browser how wide the image is laid out, so it can
+    pick the smallest rendition that fills it. Images whose renditions
+    are not built yet are rendered from the original upload.
+    """
+    if not fieldfile:
+        return ""
+    if not renditions.has_renditions(fieldfile):
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}"/>',
+            fieldfile.url,
+            alt,
+            css_class,
+            loading,
+        )
+    return format_html(
+        '<picture class="contents">'
+        '<source type="image/webp" srcset="{}" sizes="{}"/>'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" '
+        'loading="{}" decoding="async"/>'
+        "</picture>",
+        renditions.srcset(fieldfile, "webp"),
+        sizes,
+        renditions.rendition_url(fieldfile, "medium"),
+        renditions.srcset(fieldfile, "jpeg"),
+        sizes,
+        alt,
+        css_class,
+        loading,
+    )
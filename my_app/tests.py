@@ -1,3 +1,1916 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import shutil
+import signal
+import sqlite3
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed, ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.template import engines
+from django.template.base import Template
+from django.template.backends.django import DjangoTemplates
+from django.test import (
+    Client,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from PIL import Image
+
+from . import (
+    availability,
+    blog_stats,
+    destination_stats,
+    enquiries,
+    hotel_search,
+    jobs,
+    metrics,
+    page_cache,
+    pricing,
+    queries,
+    renditions,
+    search,
+    view_counts,
+    views,
+)
+from .forms import RateRuleForm
+
+from .models import (
+    FAQ,
+    Amenity,
+    BlogMonth,
+    BlogPost,
+    BlogRedirect,
+    Booking,
+    Category,
+    Destination,
+    Enquiry,
+    GalleryImage,
+    Hotel,
+    Itinerary,
+    Job,
+    RateRule,
+    Tag,
+)
+from .pagination import KeysetPaginator, paginate
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class CatalogueTestCase(TestCase):
+    """
+    Creates catalogue rows with every relation a template touches, and gives
+    each test an empty private cache.
+    """
+
+    counter = 0
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        # Write views and enquiries buffered by this test now, not from a
+        # timer thread later.
+        self.addCleanup(view_counts.flush)
+        self.addCleanup(enquiries.flush)
+
+    @classmethod
+    def next_id(cls):
+        cls.counter += 1
+        return cls.counter
+
+    def make_destination(self, **kwargs):
+        n = self.next_id()
+        fields = {
+            "name": f"Destination {n}",
+            "description": "<p>Sun and sand.</p>",
+            "country": "India",
+            "image": "destination_images/cover.jpg",
+            "best_time_to_visit": "October to March",
+            "is_featured": True,
+        }
+        fields.update(kwargs)
+        destination = Destination.objects.create(**fields)
+        for day in (1, 2):
+            Itinerary.objects.create(
+                destination=destination, day=day, title=f"Day {day}", detail="Explore."
+            )
+        GalleryImage.objects.create(destination=destination, image="gallery/d.jpg")
+        return destination
+
+    def make_hotel(self, destination=None, **kwargs):
+        n = self.next_id()
+        fields = {
+            "name": f"Hotel {n}",
+            "destination": destination or self.make_destination(),
+            "description": "<p>Sea view rooms.</p>",
+            "address": f"{n} Beach Road",
+            "price_per_night": "4500.00",
+            "rating": "4.5",
+            "image": "hotel_images/cover.jpg",
+            "is_featured": True,
+        }
+        fields.update(kwargs)
+        hotel = Hotel.objects.create(**fields)
+        amenity, _ = Amenity.objects.get_or_create(name="Wi-Fi")
+        hotel.amenities.add(amenity)
+        GalleryImage.objects.create(hotel=hotel, image="gallery/h.jpg")
+        return hotel
+
+    def make_post(self, **kwargs):
+        n = self.next_id()
+        author, _ = get_user_model().objects.get_or_create(username="author")
+        category, _ = Category.objects.get_or_create(name="Guides")
+        fields = {
+            "title": f"Post {n}",
+            "author": author,
+            "category": category,
+            "content": "<p>Packing list.</p>",
+            "excerpt": "What to pack.",
+            "featured_image": "blog_images/cover.jpg",
+            "status": "published",
+        }
+        fields.update(kwargs)
+        return BlogPost.objects.create(**fields)
+
+    def make_faq(self):
+        n = self.next_id()
+        return FAQ.objects.create(question=f"Question {n}?", answer="Answer.")
+
+    def run_jobs(self):
+        """Run every due background job, as ``manage.py runjobs --burst`` would."""
+        while jobs.run_next("test"):
+            pass
+
+
+class ViewQueryCountTests(CatalogueTestCase):
+    """
+    Pins the number of queries each public page runs, so that adding rows
+    (or a template touching a new relation) cannot reintroduce an N+1.
+    """
+
+    def assertConstantQueries(self, expected, url_factory, grow):
+        """Render the page, add more rows with ``grow``, and render it again."""
+        for _ in range(2):
+            url = url_factory()
+            cache.clear()
+            with self.assertNumQueries(expected):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            for _ in range(3):
+                grow()
+
+    def test_home(self):
+        def grow():
+            self.make_hotel()
+            self.make_faq()
+
+        grow()
+        self.assertConstantQueries(3, lambda: reverse("home"), grow)
+
+    def test_destinations(self):
+        self.assertConstantQueries(
+            1, lambda: reverse("destinations"), self.make_destination
+        )
+
+    def test_destination_detail(self):
+        destination = self.make_destination()
+
+        def grow():
+            Itinerary.objects.create(
+                destination=destination, day=9, title="Extra", detail="More."
+            )
+
+        # The conditional GET lookup, the destination and its itinerary.
+        self.assertConstantQueries(
+            3, lambda: reverse("destination_detail", args=[destination.slug]), grow
+        )
+
+    def test_hotels(self):
+        # The listing, the amenity and destination filters and the facets.
+        self.assertConstantQueries(4, lambda: reverse("hotels"), self.make_hotel)
+
+    def test_hotel_detail(self):
+        hotel = self.make_hotel()
+        self.assertConstantQueries(
+            2, lambda: reverse("hotel_detail", args=[hotel.slug]), self.make_hotel
+        )
+
+    def test_blog(self):
+        # The listing, and the "most read" and archive sidebar sections
+        # (categories, tags, months) when their fragments are stale.
+        self.assertConstantQueries(5, lambda: reverse("blog"), self.make_post)
+
+    def test_blog_category(self):
+        post = self.make_post()
+        # The category lookup, then the same queries as the blog page.
+        self.assertConstantQueries(6, post.category.get_absolute_url, self.make_post)
+
+    def test_blog_detail(self):
+        post = self.make_post()
+        self.assertConstantQueries(2, post.get_absolute_url, self.make_post)
+
+
+class KeysetPaginationTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        destination = self.make_destination()
+        # Repeated ratings and names exercise every column of the keyset.
+        for i, rating in enumerate(("5.0", "4.5", "4.5", "4.5", "3.0")):
+            for name in ("Alpha", "Beta"):
+                self.make_hotel(
+                    destination=destination,
+                    name=name,
+                    slug=f"{name.lower()}-{i}",
+                    rating=rating,
+                )
+
+    def walk(self, paginator):
+        pages, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            pages.append(page)
+            if not page.has_next:
+                return pages
+            cursor = page.next_cursor
+
+    def test_forward_walk_matches_ordering(self):
+        paginator = KeysetPaginator(Hotel.objects.all(), per_page=3)
+        pages = self.walk(paginator)
+        walked = [hotel.pk for page in pages for hotel in page]
+        expected = list(
+            Hotel.objects.order_by("-rating", "name", "pk").values_list("pk", flat=True)
+        )
+        self.assertEqual(walked, expected)
+        self.assertFalse(pages[0].has_previous)
+        self.assertEqual([len(page) for page in pages], [3, 3, 3, 1])
+
+    def test_previous_cursor_returns_prior_page(self):
+        paginator = KeysetPaginator(Hotel.objects.all(), per_page=3)
+        pages = self.walk(paginator)
+        for earlier, later in zip(pages, pages[1:]):
+            back = paginator.page(later.previous_cursor)
+            self.assertEqual(list(back), list(earlier))
+            self.assertEqual(back.has_previous, earlier.has_previous)
+
+    def test_links_keep_other_parameters(self):
+        request = RequestFactory().get("/hotels/", {"rating": "4"})
+        page = paginate(request, Hotel.objects.all(), per_page=3)
+        self.assertIn("rating=4", page.next_link)
+        self.assertIn(f"cursor={page.next_cursor}", page.next_link)
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(reverse("hotels"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_tampered_cursor_is_not_found(self):
+        self.make_hotel()
+        columns = len(KeysetPaginator(queries.hotel_list(), per_page=3).ordering)
+        for values in (
+            [None] * columns,
+            [5] * columns,
+            ["4.5"] * (columns + 1),
+            {"rating": "4.5"},
+        ):
+            raw = json.dumps(["n", values]).encode()
+            cursor = base64.urlsafe_b64encode(raw).decode().rstrip("=")
+            response = self.client.get(reverse("hotels"), {"cursor": cursor})
+            self.assertEqual(response.status_code, 404, values)
+
+
+class PageCacheTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.hotel = self.make_hotel()
+        self.other = self.make_hotel()
+        self.url = reverse("hotel_detail", args=[self.hotel.slug])
+        page_cache.reset_stats()
+
+    def assertCached(self, url, cached=True):
+        # A cached page still runs the conditional GET lookup.
+        with self.assertNumQueries(1 if cached else 2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_repeat_request_is_served_from_cache(self):
+        first = self.assertCached(self.url, cached=False)
+        second = self.assertCached(self.url)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(
+            page_cache.stats()["hotel_detail"], {"hits": 1, "misses": 1}
+        )
+
+    def test_warmed_page_is_served_from_cache(self):
+        jobs.enqueue("warm_page", {"path": self.url})
+        self.run_jobs()
+        self.assertCached(self.url)
+
+    def test_editing_the_hotel_evicts_its_page(self):
+        self.assertCached(self.url, cached=False)
+        self.hotel.name = "Renamed"
+        self.hotel.save()
+        self.assertContains(self.assertCached(self.url, cached=False), "Renamed")
+
+    def test_editing_another_hotel_keeps_the_page(self):
+        self.assertCached(self.url, cached=False)
+        self.other.name = "Renamed"
+        self.other.save()
+        self.assertCached(self.url)
+
+    def test_destination_and_m2m_changes_evict_the_page(self):
+        self.assertCached(self.url, cached=False)
+        self.hotel.destination.save()
+        self.assertCached(self.url, cached=False)
+        amenity = Amenity.objects.create(name="Pool")
+        amenity.hotels.add(self.hotel)
+        self.assertCached(self.url, cached=False)
+        amenity.hotels.clear()
+        self.assertCached(self.url, cached=False)
+
+    def test_home_sections_are_cached_separately(self):
+        home = reverse("home")
+        with self.assertNumQueries(3):
+            self.client.get(home)
+        # Only the FAQ section is re-rendered after an FAQ edit.
+        self.make_faq()
+        with self.assertNumQueries(1):
+            self.client.get(home)
+        with self.assertNumQueries(0):
+            self.client.get(home)
+        self.make_hotel(destination=self.other.destination, is_featured=False)
+        with self.assertNumQueries(0):
+            self.client.get(home)
+        hotel = self.make_hotel(destination=self.other.destination, rating="5.0")
+        with self.assertNumQueries(1):
+            response = self.client.get(home)
+        self.assertContains(response, hotel.name)
+        # Un-featuring a hotel flips the flag and evicts the hotel section.
+        hotel.is_featured = False
+        hotel.save()
+        with self.assertNumQueries(1):
+            response = self.client.get(home)
+        self.assertNotContains(response, hotel.name)
+        stats = page_cache.fragment_stats()
+        self.assertEqual(stats["featured_hotels"]["misses"], 3)
+        self.assertEqual(stats["faqs"]["hits"], 2)
+
+
+class ConditionalGetTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.hotel = self.make_hotel()
+        self.url = reverse("hotel_detail", args=[self.hotel.slug])
+
+    def revalidate(self, response):
+        return self.client.get(
+            self.url,
+            headers={
+                "If-None-Match": response["ETag"],
+                "If-Modified-Since": response["Last-Modified"],
+            },
+        )
+
+    def test_unchanged_page_is_not_modified_after_one_query(self):
+        response = self.client.get(self.url)
+        self.assertIn("ETag", response)
+        self.assertIn("Last-Modified", response)
+        with self.assertNumQueries(1):
+            revalidated = self.revalidate(response)
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_gallery_and_destination_changes_change_the_etag(self):
+        response = self.client.get(self.url)
+        GalleryImage.objects.create(hotel=self.hotel, image="gallery/new.jpg")
+        changed = self.revalidate(response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], response["ETag"])
+        self.hotel.destination.save()
+        self.assertEqual(self.revalidate(changed).status_code, 200)
+
+    def test_itinerary_change_touches_destination(self):
+        destination = self.hotel.destination
+        before = Destination.objects.get(pk=destination.pk).updated_at
+        destination.itinerary.first().delete()
+        after = Destination.objects.get(pk=destination.pk).updated_at
+        self.assertGreater(after, before)
+
+    def test_missing_object_is_not_found(self):
+        response = self.client.get(reverse("hotel_detail", args=["missing"]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(ROOT_URLCONF="Backend.asgi_urls")
+class AsyncViewTests(CatalogueTestCase):
+    """The async catalogue views serve the same pages as the sync ones."""
+
+    def setUp(self):
+        super().setUp()
+        self.hotel = self.make_hotel()
+        self.post = self.make_post()
+        self.make_faq()
+
+    async def test_pages_match_the_sync_views(self):
+        urls = [
+            reverse("home"),
+            reverse("destination_detail", args=[self.hotel.destination.slug]),
+            reverse("hotel_detail", args=[self.hotel.slug]),
+            self.post.get_absolute_url(),
+        ]
+        for url in urls:
+            match = resolve(url)
+            self.assertTrue(iscoroutinefunction(match.func), url)
+            await cache.aclear()
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            await cache.aclear()
+            request = RequestFactory().get(url)
+            expected = await sync_to_async(getattr(views, match.url_name))(
+                request, *match.args, **match.kwargs
+            )
+            self.assertEqual(response.content, expected.content, url)
+
+    # Queries are captured on the test's thread, so these tests are sync:
+    # the test client runs the async views in an event loop of its own.
+    def test_home_fetches_only_stale_sections(self):
+        self.client.get(reverse("home"))
+        page_cache.invalidate(page_cache.collection_tag(FAQ))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("home"))
+        self.assertContains(response, "Question")
+        [query] = [q["sql"] for q in queries.captured_queries]
+        self.assertIn('FROM "my_app_faq"', query)
+
+    def test_detail_pages_revalidate_and_404(self):
+        url = reverse("hotel_detail", args=[self.hotel.slug])
+        response = self.client.get(url)
+        with self.assertNumQueries(1):
+            revalidated = self.client.get(
+                url, headers={"If-None-Match": response["ETag"]}
+            )
+        self.assertEqual(revalidated.status_code, 304)
+        missing = reverse("hotel_detail", args=["missing"])
+        self.assertEqual(self.client.get(missing).status_code, 404)
+
+    async def test_post_views_are_counted(self):
+        await self.async_client.get(self.post.get_absolute_url())
+        self.assertEqual(sum(view_counts.pending().values()), 1)
+
+
+class RenditionTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = self.settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, name, size=(2000, 1000)):
+        buffer = BytesIO()
+        Image.new("RGB", size, "teal").save(buffer, "JPEG", quality=95)
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+    def test_upload_builds_every_size_and_format(self):
+        hotel = self.make_hotel(image=self.upload("upload.jpg"))
+        self.run_jobs()
+        original = default_storage.size(hotel.image.name)
+        for size, width in renditions.SIZES.items():
+            for fmt in renditions.FORMATS:
+                name = renditions.rendition_name(hotel.image.name, size, fmt)
+                with default_storage.open(name) as f:
+                    self.assertEqual(Image.open(f).width, width)
+                self.assertLess(default_storage.size(name), original)
+
+    def test_replacing_image_drops_old_renditions(self):
+        hotel = self.make_hotel(image=self.upload("old.jpg"))
+        self.run_jobs()
+        old = renditions.rendition_name(hotel.image.name, "small", "webp")
+        self.assertTrue(default_storage.exists(old))
+        hotel.image = self.upload("new.jpg")
+        hotel.save()
+        self.assertFalse(default_storage.exists(old))
+        self.run_jobs()
+        new = renditions.rendition_name(hotel.image.name, "small", "webp")
+        self.assertTrue(default_storage.exists(new))
+
+    def test_shared_uploads_keep_their_renditions(self):
+        hotel = self.make_hotel(image=self.upload("shared.jpg"))
+        self.run_jobs()
+        copy = self.make_hotel(image=hotel.image.name)
+        name = renditions.rendition_name(hotel.image.name, "small", "webp")
+        hotel.image = self.upload("other.jpg")
+        hotel.save()
+        self.assertTrue(default_storage.exists(name))
+        self.assertTrue(renditions.has_renditions(copy.image))
+        copy.delete()
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(renditions.has_renditions(copy.image))
+
+    def test_small_images_are_not_enlarged(self):
+        hotel = self.make_hotel(image=self.upload("tiny.jpg", size=(200, 100)))
+        self.run_jobs()
+        name = renditions.rendition_name(hotel.image.name, "large", "jpeg")
+        with default_storage.open(name) as f:
+            self.assertEqual(Image.open(f).size, (200, 100))
+
+    def test_pages_render_srcset_and_fall_back_to_original(self):
+        hotel = self.make_hotel(image=self.upload("upload.jpg"))
+        url = reverse("hotel_detail", args=[hotel.slug])
+        # Until the job has run the page shows the original ...
+        response = self.client.get(url)
+        self.assertContains(response, 'src="/media/hotel_images/upload.jpg"')
+        # ... and the job evicts that page once the renditions exist.
+        self.run_jobs()
+        response = self.client.get(url)
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, "medium.webp 768w")
+        # Fixture hotels point at a file that does not exist.
+        self.make_hotel()
+        response = self.client.get(reverse("hotels"))
+        self.assertContains(response, 'src="/media/hotel_images/cover.jpg"')
+
+
+class SearchTests(CatalogueTestCase):
+    def test_index_follows_saves_and_deletes(self):
+        hotel = self.make_hotel(description="<p>An infinity <b>pool</b> &amp; spa.</p>")
+        [result] = search.search("pool")
+        self.assertEqual((result.kind, result.object), ("hotel", hotel))
+        self.assertIn("<mark>pool</mark> &amp; spa", result.snippet)
+        hotel.description = "<p>Garden rooms.</p>"
+        hotel.save()
+        self.assertEqual(search.search("pool"), [])
+        self.assertEqual(len(search.search("garden")), 1)
+        hotel.delete()
+        self.assertEqual(search.search("garden"), [])
+
+    def test_title_matches_rank_first(self):
+        in_body = self.make_post(content="<p>Packing for Ladakh in winter.</p>")
+        in_title = self.make_post(title="Ladakh road trip")
+        ranked = [result.object for result in search.search("ladakh")]
+        self.assertEqual(ranked, [in_title, in_body])
+
+    def test_words_match_as_prefixes_and_syntax_is_ignored(self):
+        hotel = self.make_hotel(name="Seashell Residency")
+        self.assertEqual(search.search("seash resid")[0].object, hotel)
+        for query in ('"', "AND (", "NEAR(", "*", "title:x"):
+            search.search(query)
+
+    def test_hotels_are_found_by_destination_name(self):
+        destination = self.make_destination(name="Munnar")
+        hotel = self.make_hotel(destination=destination)
+        self.assertEqual(search.search("munnar", ["hotel"])[0].object, hotel)
+        destination.name = "Kovalam"
+        destination.save()
+        self.assertEqual(search.search("munnar", ["hotel"]), [])
+        self.assertEqual(search.search("kovalam", ["hotel"])[0].object, hotel)
+
+    def test_admin_matches_are_filtered_in_sql(self):
+        posts = [self.make_post(title=f"Monsoon diary {n}") for n in range(3)]
+        self.make_post(title="Winter diary")
+        self.assertEqual(len(search.matching_pks(BlogPost, "monsoon", limit=2)), 2)
+        matching = search.matching(BlogPost.objects.all(), "monsoon")
+        self.assertIn(f"{search.TABLE} MATCH", str(matching.query))
+        self.assertCountEqual(matching, posts)
+        self.assertCountEqual(search.matching(BlogPost.objects.all(), "*"), [])
+
+    def test_drafts_are_only_found_in_the_admin(self):
+        draft = self.make_post(title="Secret itinerary", status="draft")
+        self.assertEqual(search.search("secret"), [])
+        self.assertEqual(search.matching_pks(BlogPost, "secret"), [draft.pk])
+        admin = get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "pw"
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse("admin:my_app_blogpost_changelist"), {"q": "secret"}
+        )
+        self.assertContains(response, "Secret itinerary")
+
+    def test_search_page(self):
+        self.make_hotel(name="Coral Bay Resort")
+        self.make_post(title="Coral reefs of the Andamans")
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("search"), {"q": "coral"})
+        self.assertContains(response, "<mark>Coral</mark>", count=2)
+        response = self.client.get(reverse("search"), {"q": "coral", "type": "hotel"})
+        self.assertContains(response, "Coral Bay Resort")
+        self.assertNotContains(response, "Andamans")
+
+
+class ViewCountTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        view_counts.flush()
+        self.post = self.make_post()
+        self.url = self.post.get_absolute_url()
+
+    def key(self, post):
+        day = timezone.localdate(post.published_at)
+        return (day.year, day.month, day.day, post.slug)
+
+    def test_views_are_buffered_and_written_in_one_update(self):
+        other = self.make_post()
+        for url in (self.url, self.url, other.get_absolute_url()):
+            self.client.get(url)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 0)
+        self.assertEqual(
+            view_counts.pending(), {self.key(self.post): 2, self.key(other): 1}
+        )
+        with self.assertNumQueries(2):
+            self.assertEqual(view_counts.flush(), 3)
+        self.post.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.post.views, other.views), (2, 1))
+        self.assertEqual(view_counts.pending(), {})
+
+    def test_increments_add_up_across_processes(self):
+        self.client.get(self.url)
+        # Another worker process flushed its own buffer meanwhile.
+        BlogPost.objects.filter(pk=self.post.pk).update(views=F("views") + 5)
+        view_counts.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 6)
+
+    def test_cached_and_not_modified_responses_count_but_404s_do_not(self):
+        first = self.client.get(self.url)
+        self.client.get(self.url)
+        self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.client.get(self.url.replace(self.post.slug, "missing"))
+        self.assertEqual(view_counts.pending(), {self.key(self.post): 3})
+
+    @override_settings(VIEW_COUNT_FLUSH_SIZE=2)
+    def test_full_buffer_is_flushed(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.assertEqual(view_counts.pending(), {})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 2)
+
+    def test_most_read_list_follows_flushes(self):
+        popular = self.make_post(title="Monsoon in Goa")
+        self.client.get(reverse("blog"))
+        self.client.get(popular.get_absolute_url())
+        view_counts.flush()
+        response = self.client.get(reverse("blog"))
+        most_read = response.content.decode().split("Most read")[1]
+        self.assertLess(
+            most_read.index("Monsoon in Goa"), most_read.index(self.post.title)
+        )
+
+
+class BlogUrlTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.first = self.make_post(
+            slug="packing-list", published_at=timezone.now() - timedelta(days=3)
+        )
+        self.second = self.make_post(slug="packing-list")
+
+    def test_same_slug_on_different_days(self):
+        self.assertNotEqual(
+            self.first.get_absolute_url(), self.second.get_absolute_url()
+        )
+        for post in (self.first, self.second):
+            response = self.client.get(post.get_absolute_url())
+            self.assertEqual(response.context["post"], post)
+
+    def test_drafts_other_days_and_impossible_dates_are_404(self):
+        draft = self.make_post(status="draft")
+        before = timezone.localdate(self.first.published_at) - timedelta(days=1)
+        urls = [
+            draft.get_absolute_url(),
+            f"/blog/{before.year}/{before.month}/{before.day}/packing-list/",
+            "/blog/2026/13/1/packing-list/",
+            "/blog/9999/12/31/packing-list/",
+        ]
+        for url in urls:
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    def test_lookup_is_one_index_seek(self):
+        day = timezone.localdate(self.second.published_at)
+        queryset = queries.blog_detail(day.year, day.month, day.day, "packing-list")
+        plan = queryset.explain()
+        self.assertIn("blogpost_lookup_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_old_slug_urls_redirect_permanently(self):
+        BlogRedirect.objects.create(slug="old-packing-list", post=self.first)
+        response = self.client.get("/blog/old-packing-list/")
+        self.assertRedirects(response, self.first.get_absolute_url(), status_code=301)
+        self.assertEqual(self.client.get("/blog/never-existed/").status_code, 404)
+        BlogPost.objects.filter(pk=self.first.pk).update(status="draft")
+        self.assertEqual(self.client.get("/blog/old-packing-list/").status_code, 404)
+
+    def test_migration_points_shared_slugs_at_latest_published_post(self):
+        self.make_post(slug="packing-list", status="draft")
+        migration = import_module("my_app.migrations.0011_blog_date_urls")
+        migration.fill_redirects(django_apps, None)
+        redirects = dict(BlogRedirect.objects.values_list("slug", "post_id"))
+        self.assertEqual(redirects["packing-list"], self.second.pk)
+
+
+class BlogArchiveTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.guides = Category.objects.create(name="Guides")
+        self.food = Category.objects.create(name="Food")
+        self.beach, self.hills = Tag.objects.bulk_create(
+            [Tag(name="Beach"), Tag(name="Hills")]
+        )
+        self.july = timezone.make_aware(datetime(2026, 7, 15, 12))
+        self.august = timezone.make_aware(datetime(2026, 8, 2, 12))
+
+    def counts(self):
+        return (
+            dict(Category.objects.values_list("name", "post_count")),
+            dict(Tag.objects.values_list("name", "post_count")),
+            {
+                month.strftime("%Y-%m"): n
+                for month, n in BlogMonth.objects.values_list("month", "post_count")
+            },
+        )
+
+    def test_counts_follow_post_changes(self):
+        post = self.make_post(category=self.guides, published_at=self.july)
+        post.tags.add(self.beach, self.hills)
+        draft = self.make_post(category=self.food, status="draft")
+        draft.tags.add(self.beach)
+        self.assertEqual(
+            self.counts(),
+            ({"Guides": 1, "Food": 0}, {"Beach": 1, "Hills": 1}, {"2026-07": 1}),
+        )
+
+        post.category = self.food
+        post.published_at = self.august
+        post.save()
+        post.tags.remove(self.hills)
+        self.assertEqual(
+            self.counts(),
+            (
+                {"Guides": 0, "Food": 1},
+                {"Beach": 1, "Hills": 0},
+                {"2026-07": 0, "2026-08": 1},
+            ),
+        )
+
+        post.delete()
+        self.assertEqual(
+            self.counts()[:2], ({"Guides": 0, "Food": 0}, {"Beach": 0, "Hills": 0})
+        )
+        self.assertEqual(self.counts()[2], {"2026-07": 0, "2026-08": 0})
+
+        # The admin's "publish" action updates without signals.
+        self.hills.posts.add(draft)
+        BlogPost.objects.filter(pk=draft.pk).update(status="published")
+        blog_stats.refresh_posts([draft.pk])
+        self.assertEqual(
+            self.counts()[:2], ({"Guides": 0, "Food": 1}, {"Beach": 1, "Hills": 1})
+        )
+
+    def test_rebuild_matches_incremental_counts(self):
+        for day in (self.july, self.july, self.august):
+            post = self.make_post(category=self.guides, published_at=day)
+            post.tags.add(self.beach)
+        expected = self.counts()
+        Category.objects.update(post_count=0)
+        BlogMonth.objects.all().delete()
+        call_command("rebuild_blog_stats", stdout=StringIO())
+        self.assertEqual(self.counts(), expected)
+
+    def test_listings(self):
+        kept = self.make_post(
+            title="Goa beaches", category=self.guides, published_at=self.july
+        )
+        kept.tags.add(self.beach)
+        self.make_post(
+            title="Hill stations", category=self.food, published_at=self.august
+        )
+        self.make_post(title="Unfinished", category=self.guides, status="draft")
+        for url in (
+            self.guides.get_absolute_url(),
+            self.beach.get_absolute_url(),
+            reverse("blog_archive", args=[2026, 7]),
+        ):
+            posts = self.client.get(url).context["posts"]
+            self.assertEqual([post.title for post in posts], ["Goa beaches"], url)
+        response = self.client.get(reverse("blog"))
+        self.assertContains(response, 'Guides</a> <span class="text-gray-400">(1)')
+        self.assertContains(response, "July 2026")
+        for url in ("/blog/category/missing/", "/blog/2026/13/"):
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_sidebar_reads_stored_counts(self):
+        self.make_post(category=self.guides)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("blog"))
+        self.assertFalse(
+            [q["sql"] for q in queries.captured_queries if "GROUP BY" in q["sql"]]
+        )
+
+    def test_related_posts_share_the_most_tags(self):
+        post = self.make_post()
+        post.tags.add(self.beach, self.hills)
+        both = self.make_post(title="Both tags")
+        both.tags.add(self.beach, self.hills)
+        one = self.make_post(title="One tag")
+        one.tags.add(self.beach)
+        self.make_post(title="No tags")
+        self.make_post(title="Draft", status="draft").tags.add(self.beach)
+        post.save()
+        self.assertEqual(post.related_post_ids, [both.pk, one.pk])
+        post.refresh_from_db()
+        self.assertEqual(post.related_post_ids, [both.pk, one.pk])
+        one.status = "draft"
+        one.save()
+        response = self.client.get(post.get_absolute_url())
+        self.assertEqual(response.context["related_posts"], [both])
+        self.assertContains(response, "Both tags")
+
+
+class SyndicationTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.hotel = self.make_hotel()
+        self.post = self.make_post(title="Monsoon in Goa")
+        self.draft = self.make_post(title="Unfinished draft", status="draft")
+
+    def test_sitemaps_list_public_pages_with_lastmod(self):
+        response = self.client.get(reverse("sitemap"))
+        for section in ("destinations", "hotels", "blog"):
+            self.assertContains(response, f"/sitemap-{section}.xml</loc>")
+        self.assertContains(response, "<lastmod>", count=3)
+
+        response = self.client.get(reverse("sitemap_section", args=["blog"]))
+        self.assertContains(response, self.post.get_absolute_url())
+        self.assertNotContains(response, self.draft.get_absolute_url())
+        response = self.client.get(reverse("sitemap_section", args=["hotels"]))
+        self.assertContains(response, self.hotel.get_absolute_url())
+        self.assertContains(response, "<lastmod>")
+        response = self.client.get(reverse("sitemap_section", args=["missing"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_feed_lists_published_posts(self):
+        response = self.client.get(reverse("blog_feed"))
+        self.assertEqual(
+            response["Content-Type"], "application/atom+xml; charset=utf-8"
+        )
+        self.assertContains(response, "Monsoon in Goa")
+        self.assertNotContains(response, "Unfinished draft")
+
+    def test_generated_once_and_revalidated_without_queries(self):
+        urls = [
+            reverse("sitemap"),
+            reverse("sitemap_section", args=["hotels"]),
+            reverse("sitemap_section", args=["blog"]),
+            reverse("blog_feed"),
+        ]
+        etags = {url: self.client.get(url)["ETag"] for url in urls}
+        for url, etag in etags.items():
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url)["ETag"], etag)
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+        self.hotel.name = "Renamed"
+        self.hotel.save()
+        changed = {url for url in urls if self.client.get(url)["ETag"] != etags[url]}
+        self.assertEqual(changed, {reverse("sitemap"), urls[1]})
+
+
+class AdminChangelistTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "pw"
+        )
+        self.client.force_login(self.admin)
+        self.guest = get_user_model().objects.create_user("guest")
+        self.grow()
+
+    def grow(self):
+        hotel = self.make_hotel()
+        n = self.next_id()
+        availability.create_booking(
+            self.guest, hotel, date(2027, 1, 1), date(2027, 1, 5), total_price=0
+        )
+        Enquiry.objects.create(name=f"Guest {n}", email="g@ex.com", message="Hi")
+        self.make_post(author=self.guest)
+        jobs.enqueue("warm_page", {"path": "/"}, key=f"warm:{n}")
+        return hotel
+
+    def test_queries_do_not_grow_with_rows(self):
+        for model in ("booking", "galleryimage", "hotel", "blogpost", "enquiry", "job"):
+            url = reverse(f"admin:my_app_{model}_changelist")
+            with CaptureQueriesContext(connection) as before:
+                self.client.get(url)
+            # Read now: the next request clears the log the capture slices.
+            expected = len(before)
+            for _ in range(3):
+                self.grow()
+            cache.clear()
+            with CaptureQueriesContext(connection) as after:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(len(after), expected, model)
+
+    def test_related_filters_do_not_list_every_row(self):
+        hotel = self.grow()
+        url = reverse("admin:my_app_booking_changelist")
+        response = self.client.get(url)
+        self.assertContains(response, 'class="admin-autocomplete')
+        self.assertContains(response, "admin/js/autocomplete.js")
+        self.assertNotContains(response, f"?hotel__id__exact={hotel.pk}")
+        response = self.client.get(url, {"hotel__id__exact": hotel.pk})
+        self.assertEqual(response.context["cl"].result_count, 1)
+        self.assertContains(response, f'<option value="{hotel.pk}" selected>')
+
+        response = self.client.get(
+            reverse("admin:autocomplete"),
+            {
+                "app_label": "my_app",
+                "model_name": "booking",
+                "field_name": "hotel",
+                "term": hotel.name,
+            },
+        )
+        self.assertEqual(response.json()["results"][0]["id"], str(hotel.pk))
+
+    def test_large_tables_reuse_their_count(self):
+        url = reverse("admin:my_app_booking_changelist")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.context["cl"].result_count, 1)
+        counts = [q["sql"] for q in queries.captured_queries if "COUNT(" in q["sql"]]
+        self.assertEqual(counts, [])
+
+
+@override_settings(BULK_ACTION_CHUNK_SIZE=2, BULK_ACTION_BACKGROUND_THRESHOLD=4)
+class BulkActionTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "pw"
+        )
+        self.client.force_login(self.admin)
+
+    def act(self, model, action, objects):
+        return self.client.post(
+            reverse(f"admin:my_app_{model}_changelist"),
+            {"action": action, "_selected_action": [obj.pk for obj in objects]},
+        )
+
+    def test_publishing_refreshes_counts_search_and_cached_pages(self):
+        drafts = [
+            self.make_post(status="draft", title=f"Monsoon {i}") for i in range(3)
+        ]
+        guides = Category.objects.get(name="Guides")
+        self.assertNotContains(self.client.get(reverse("blog")), "Monsoon")
+        self.assertEqual(search.search("monsoon"), [])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.act("blogpost", "publish_posts", drafts)
+        # Two chunks, each in its own transaction.
+        sql = [q["sql"] for q in queries.captured_queries]
+        self.assertEqual(len([q for q in sql if q.startswith("SAVEPOINT")]), 2)
+        self.assertRedirects(response, reverse("admin:my_app_blogpost_changelist"))
+        self.assertEqual(BlogPost.objects.filter(status="published").count(), 3)
+
+        guides.refresh_from_db()
+        self.assertEqual(guides.post_count, 3)
+        self.assertEqual(len(search.search("monsoon")), 3)
+        self.assertContains(self.client.get(reverse("blog")), "Monsoon 2")
+
+    def test_publishing_adds_posts_to_related_lists(self):
+        beach = Tag.objects.create(name="Beach")
+        post = self.make_post(title="Goa in winter")
+        post.tags.add(beach)
+        draft = self.make_post(title="Monsoon beaches", status="draft")
+        draft.tags.add(beach)
+        post.refresh_from_db()
+        self.assertEqual(post.related_post_ids, [])
+        url = post.get_absolute_url()
+        self.assertNotContains(self.client.get(url), "Monsoon beaches")
+
+        self.act("blogpost", "publish_posts", [draft])
+        post.refresh_from_db()
+        draft.refresh_from_db()
+        self.assertEqual(post.related_post_ids, [draft.pk])
+        self.assertEqual(draft.related_post_ids, [post.pk])
+        self.assertContains(self.client.get(url), "Monsoon beaches")
+
+    def test_hotel_availability_refreshes_destination_figures(self):
+        destination = self.make_destination()
+        hotels = [self.make_hotel(destination) for _ in range(3)]
+        self.act("hotel", "mark_hotels_unavailable", hotels[:2])
+        destination.refresh_from_db()
+        self.assertEqual(destination.hotel_count, 1)
+        self.act("hotel", "mark_hotels_available", hotels)
+        destination.refresh_from_db()
+        self.assertEqual(destination.hotel_count, 3)
+
+    def test_only_matching_rows_change(self):
+        guest = get_user_model().objects.create_user("guest")
+        hotel = self.make_hotel()
+        pending, cancelled = (
+            availability.create_booking(
+                guest, hotel, date(2027, 1, day), date(2027, 1, day + 2), total_price=0
+            )
+            for day in (1, 10)
+        )
+        Booking.objects.filter(pk=cancelled.pk).update(status="cancelled")
+        self.act("booking", "confirm_bookings", [pending, cancelled])
+        statuses = dict(Booking.objects.values_list("pk", "status"))
+        self.assertEqual(statuses, {pending.pk: "confirmed", cancelled.pk: "cancelled"})
+
+        enquiry = Enquiry.objects.create(name="Guest", email="g@ex.com", message="Hi")
+        response = self.act("enquiry", "resolve_enquiries", [enquiry])
+        self.assertContains(self.client.get(response.url), "1 enquiries changed")
+        enquiry.refresh_from_db()
+        self.assertTrue(enquiry.is_resolved)
+
+    def test_large_selections_run_in_the_background(self):
+        drafts = [self.make_post(status="draft") for _ in range(5)]
+        response = self.act("blogpost", "publish_posts", drafts)
+        job = Job.objects.get(task="bulk_action")
+        progress_url = reverse("admin:my_app_job_progress", args=[job.pk])
+        self.assertRedirects(response, progress_url)
+        self.assertEqual(BlogPost.objects.filter(status="published").count(), 0)
+        page = self.client.get(response.url)
+        self.assertContains(page, "Waiting for a worker")
+        self.assertContains(page, 'http-equiv="refresh"')
+
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress, job.total), (Job.DONE, 5, 5))
+        self.assertEqual(BlogPost.objects.filter(status="published").count(), 5)
+        page = self.client.get(response.url)
+        self.assertContains(page, "5 of 5 (100%)")
+        self.assertNotContains(page, 'http-equiv="refresh"')
+
+    def test_progress_page_needs_staff(self):
+        job = jobs.enqueue("warm_page", {"path": "/"})
+        url = reverse("admin:my_app_job_progress", args=[job.pk])
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+
+class AvailabilityTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user("guest")
+        self.hotel = self.make_hotel()
+        self.other = self.make_hotel(destination=self.hotel.destination)
+        self.book(self.hotel, 10, 14)
+
+    def book(self, hotel, first, last, **fields):
+        fields.setdefault("total_price", 0)
+        return availability.create_booking(
+            self.user, hotel, date(2026, 11, first), date(2026, 11, last), **fields
+        )
+
+    def free(self, first, last):
+        hotels = Hotel.objects.filter(destination=self.hotel.destination)
+        stay = date(2026, 11, first), date(2026, 11, last)
+        return set(availability.available_hotels(*stay, hotels))
+
+    def test_only_shared_nights_conflict(self):
+        self.assertEqual(self.free(14, 16), {self.hotel, self.other})
+        self.assertEqual(self.free(8, 10), {self.hotel, self.other})
+        self.assertEqual(self.free(13, 15), {self.other})
+        self.assertEqual(self.free(5, 20), {self.other})
+        self.assertEqual(self.free(11, 12), {self.other})
+
+    def test_cancelled_bookings_free_their_nights(self):
+        Booking.objects.update(status="cancelled")
+        self.assertEqual(self.free(10, 14), {self.hotel, self.other})
+
+    def test_destination_lookup_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.free(12, 13)
+
+    def test_conflicting_booking_is_refused(self):
+        with self.assertRaises(availability.BookingConflict):
+            self.book(self.hotel, 13, 16)
+        self.book(self.hotel, 14, 16)
+        self.book(self.other, 13, 16)
+        self.assertEqual(Booking.objects.count(), 3)
+
+    def test_stay_must_be_ordered_and_bounded(self):
+        for first, last in ((14, 14), (15, 12)):
+            with self.assertRaises(ValidationError):
+                self.free(first, last)
+        with self.assertRaises(ValidationError):
+            availability.is_available(
+                self.other, date(2026, 1, 1), date(2026, 3, 1)
+            )
+        for check_in, check_out in (
+            (date(2026, 11, 3), date(2026, 11, 1)),
+            (date(2026, 11, 1), date(2026, 12, 2)),
+        ):
+            booking = Booking(
+                user=self.user,
+                hotel=self.other,
+                check_in_date=check_in,
+                check_out_date=check_out,
+                total_price=0,
+            )
+            with self.assertRaises(ValidationError):
+                booking.full_clean()
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                booking.save()
+
+
+class PricingTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.hotel = self.make_hotel(price_per_night="5000.00")
+        # November 2026: the 6th is a Friday, the 9th a Monday.
+        RateRule.objects.create(
+            hotel=self.hotel,
+            name="Peak season",
+            start_date=date(2026, 11, 1),
+            end_date=date(2026, 11, 7),
+            percent=30,
+        )
+        RateRule.objects.create(
+            hotel=self.hotel,
+            name="Weekend",
+            weekdays=RateRule.WEEKEND_NIGHTS,
+            percent=10,
+        )
+        RateRule.objects.create(
+            hotel=self.hotel, name="Family room", min_guests=3, percent="12.50"
+        )
+
+    def prices(self, quote):
+        return [str(price) for _, price in quote.nights]
+
+    def test_adjustments_of_matching_rules_add_up(self):
+        quote = pricing.quote(self.hotel, date(2026, 11, 5), date(2026, 11, 10))
+        self.assertEqual(
+            self.prices(quote), ["6500.00", "7000.00", "7000.00", "5000.00", "5000.00"]
+        )
+        self.assertEqual(quote.total, Decimal("30500.00"))
+        family = pricing.quote(self.hotel, date(2026, 11, 9), date(2026, 11, 10), 4)
+        self.assertEqual(self.prices(family), ["5625.00"])
+
+    def test_quote_many_is_two_queries_for_any_number_of_hotels(self):
+        for _ in range(5):
+            self.make_hotel(destination=self.hotel.destination)
+        hotels = Hotel.objects.filter(destination=self.hotel.destination)
+        with self.assertNumQueries(2):
+            quotes = pricing.quote_many(hotels, date(2026, 11, 5), date(2026, 11, 8))
+        self.assertEqual(len(quotes), 6)
+        self.assertEqual(quotes[self.hotel.pk].total, Decimal("20500.00"))
+        plain = next(quote for pk, quote in quotes.items() if pk != self.hotel.pk)
+        self.assertEqual(plain.total, Decimal("13500.00"))
+
+    def test_booking_total_defaults_to_the_quote(self):
+        user = get_user_model().objects.create_user("guest")
+        booking = availability.create_booking(
+            user, self.hotel, date(2026, 11, 6), date(2026, 11, 8), num_guests=3
+        )
+        self.assertEqual(booking.total_price, Decimal("15250.00"))
+
+    def test_listing_shows_stay_totals(self):
+        params = {"check_in": "2026-11-05", "check_out": "2026-11-08"}
+        # The listing and its filters and facets, plus the rate rules.
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("hotels"), params)
+        self.assertContains(response, "₹20500.00 for 3 nights")
+        params["check_out"] = "2026-11-01"
+        response = self.client.get(reverse("hotels"), params)
+        self.assertContains(response, "Check-out must be after check-in.")
+        self.assertContains(response, "₹5000.00 / night")
+
+    def test_weekdays_are_edited_as_checkboxes(self):
+        rule = RateRule.objects.get(name="Weekend")
+        form = RateRuleForm(instance=rule)
+        self.assertEqual(form.initial["weekdays"], [4, 5])
+        data = {"name": "Sundays", "weekdays": ["6"], "min_guests": 1, "percent": 5}
+        form = RateRuleForm(data, instance=RateRule(hotel=self.hotel))
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().weekdays, 1 << 6)
+
+
+class FacetedSearchTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pool, self.wifi, self.gym = (
+            Amenity.objects.get_or_create(name=name)[0]
+            for name in ("Pool", "Wi-Fi", "Gym")
+        )
+        destination = self.make_destination()
+        self.resort = self.make_hotel(destination, price_per_night=4500, rating="4.6")
+        self.resort.amenities.add(self.pool, self.gym)
+        self.lodge = self.make_hotel(destination, price_per_night=1800, rating="3.5")
+        self.palace = self.make_hotel(price_per_night=12000, rating="4.8")
+        self.palace.amenities.set([self.pool, self.wifi, self.gym])
+
+    def masks(self):
+        return dict(Hotel.objects.values_list("pk", "amenity_mask"))
+
+    def find(self, **filters):
+        return set(hotel_search.filter_hotels(Hotel.objects.all(), **filters))
+
+    def test_masks_follow_amenity_changes(self):
+        masks = self.masks()
+        self.assertEqual(masks[self.lodge.pk], self.wifi.flag)  # from the fixture
+        self.assertEqual(
+            masks[self.palace.pk], self.pool.flag | self.wifi.flag | self.gym.flag
+        )
+        self.gym.hotels.remove(self.palace)
+        self.pool.hotels.clear()
+        self.assertEqual(self.masks()[self.palace.pk], self.wifi.flag)
+        self.assertEqual(self.masks()[self.resort.pk], self.wifi.flag | self.gym.flag)
+        self.wifi.delete()
+        self.assertEqual(self.masks()[self.resort.pk], self.gym.flag)
+        # Saving a hotel loaded earlier keeps the current mask.
+        self.resort.name = "Renamed"
+        self.resort.save()
+        self.assertEqual(self.masks()[self.resort.pk], self.gym.flag)
+
+    def test_filters_combine(self):
+        self.assertEqual(
+            self.find(amenities=[self.pool, self.gym]), {self.resort, self.palace}
+        )
+        self.assertEqual(
+            self.find(amenities=[self.pool, self.wifi, self.gym], price="10000-"),
+            {self.palace},
+        )
+        self.assertEqual(self.find(rating="4.5", price="2000-5000"), {self.resort})
+        self.assertEqual(
+            self.find(destination=self.resort.destination_id, rating="3"), {self.lodge}
+        )
+        Hotel.objects.filter(pk=self.resort.pk).update(is_available=False)
+        self.assertEqual(
+            self.find(amenities=[self.gym], available_only=True), {self.palace}
+        )
+
+    def test_facets_are_counted_in_one_query(self):
+        amenities = list(Amenity.objects.all())
+        hotels = Hotel.objects.filter(rating__gte=4)
+        with self.assertNumQueries(1):
+            facets = hotel_search.facet_counts(hotels, amenities)
+        self.assertEqual(facets["total"], 2)
+        counts = {amenity.name: n for amenity, n in facets["amenities"]}
+        self.assertEqual(counts, {"Gym": 2, "Pool": 2, "Wi-Fi": 2})
+        self.assertEqual(facets["ratings"][0], ("4.5", "4.5 and up", 2))
+        prices = {key: n for key, _, n in facets["prices"]}
+        self.assertEqual(
+            prices, {"0-2000": 0, "2000-5000": 1, "5000-10000": 0, "10000-": 1}
+        )
+
+    def test_listing_filters_and_counts(self):
+        params = {"amenities": [self.pool.pk, self.gym.pk], "price": "2000-5000"}
+        response = self.client.get(reverse("hotels"), params)
+        self.assertEqual(list(response.context["hotels"]), [self.resort])
+        self.assertEqual(response.context["facets"]["total"], 1)
+        self.assertContains(response, f'value="{self.pool.pk}" form="hotelSearch"')
+        response = self.client.get(reverse("hotels"), {"rating": "bogus"})
+        self.assertEqual(len(response.context["hotels"]), 3)
+
+
+class DestinationStatsTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.goa = self.make_destination()
+        self.kerala = self.make_destination()
+        self.resort = self.make_hotel(self.goa, price_per_night=4500, rating="4.6")
+        self.lodge = self.make_hotel(self.goa, price_per_night=1800, rating="3.5")
+
+    def stats(self, destination):
+        destination.refresh_from_db()
+        return destination.hotel_count, destination.min_price, destination.avg_rating
+
+    def test_figures_follow_hotel_changes(self):
+        self.assertEqual(self.stats(self.goa), (2, Decimal(1800), Decimal("4.05")))
+        self.assertEqual(self.stats(self.kerala), (0, None, None))
+
+        self.lodge.is_available = False
+        self.lodge.save()
+        self.assertEqual(self.stats(self.goa), (1, Decimal(4500), Decimal("4.6")))
+
+        self.resort.destination = self.kerala
+        self.resort.save()
+        self.assertEqual(self.stats(self.goa), (0, None, None))
+        self.assertEqual(self.stats(self.kerala), (1, Decimal(4500), Decimal("4.6")))
+
+        self.resort.delete()
+        self.assertEqual(self.stats(self.kerala), (0, None, None))
+
+    def test_unrelated_edits_leave_the_destination_alone(self):
+        self.goa.refresh_from_db()
+        marker = self.goa.updated_at
+        self.resort.description = "<p>New rooms.</p>"
+        self.resort.save()
+        self.goa.refresh_from_db()
+        self.assertEqual(self.goa.updated_at, marker)
+
+    def test_pages_show_the_figures(self):
+        expected = "2 hotels from ₹1800, avg ★4.1"
+        self.assertContains(self.client.get(reverse("destinations")), expected)
+        self.assertContains(self.client.get(self.goa.get_absolute_url()), expected)
+        self.lodge.delete()
+        response = self.client.get(self.goa.get_absolute_url())
+        self.assertContains(response, "1 hotel from ₹4500, avg ★4.6")
+
+    def test_rebuild_repairs_drift(self):
+        Hotel.objects.filter(pk=self.lodge.pk).update(price_per_night=900)
+        drifted = destination_stats.drift()
+        self.assertEqual(drifted, [(self.goa, "min_price", Decimal(1800), 900)])
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command("rebuild_destination_stats", check=True, stdout=out)
+        self.assertIn("min_price is 1800.00, should be 900", out.getvalue())
+
+        call_command("rebuild_destination_stats", stdout=out)
+        self.assertEqual(destination_stats.drift(), [])
+        self.assertEqual(self.stats(self.goa)[1], Decimal(900))
+
+
+class ApiTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.goa = self.make_destination(name="Goa")
+        self.hotels = [
+            self.make_hotel(self.goa, rating=rating) for rating in ("4.8", "4.2", "3.9")
+        ]
+
+    def json(self, response):
+        if response.streaming:
+            return json.loads(b"".join(response.streaming_content))
+        return json.loads(response.content)
+
+    def test_list_streams_pages_with_cursors(self):
+        url = reverse("api_list", args=["hotels"])
+        response = self.client.get(url, {"limit": 2, "fields": "name,rating"})
+        self.assertTrue(response.streaming)
+        data = self.json(response)
+        self.assertEqual(
+            data["results"],
+            [
+                {"name": self.hotels[0].name, "rating": "4.8"},
+                {"name": self.hotels[1].name, "rating": "4.2"},
+            ],
+        )
+        data = self.json(self.client.get(data["next"]))
+        self.assertEqual(
+            data["results"], [{"name": self.hotels[2].name, "rating": "3.9"}]
+        )
+        self.assertIsNone(data["next"])
+
+    def test_sparse_fields_skip_unused_columns(self):
+        url = reverse("api_list", args=["hotels"])
+        with CaptureQueriesContext(connection) as queries:
+            data = self.json(self.client.get(url, {"fields": "name,amenities"}))
+        self.assertEqual(len(queries), 2)  # The hotels, and their amenities.
+        self.assertNotIn("description", queries[0]["sql"])
+        self.assertEqual(data["results"][0]["amenities"], ["Wi-Fi"])
+        response = self.client.get(url, {"fields": "name,secret"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_detail(self):
+        url = reverse("api_detail", args=["destinations", "goa"])
+        data = self.json(self.client.get(url, {"fields": "name,hotel_count"}))
+        self.assertEqual(data, {"name": "Goa", "hotel_count": 3})
+        missing = self.client.get(reverse("api_detail", args=["hotels", "nowhere"]))
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(self.client.get("/api/users/").status_code, 404)
+
+    def test_etag_changes_with_the_collection(self):
+        url = reverse("api_list", args=["destinations"])
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Destinations show hotel figures, so a hotel change is a change.
+        self.hotels[0].is_available = False
+        self.hotels[0].save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class CatalogueImportTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.goa = self.make_destination(name="Goa")
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def write(self, name, content):
+        path = f"{self.tmp}/{name}"
+        with open(path, "w", encoding="utf-8") as stream:
+            stream.write(content)
+        return path
+
+    def test_csv_import_creates_hotels_with_relations(self):
+        path = self.write(
+            "hotels.csv",
+            "name,destination,description,address,price_per_night,rating,image,"
+            "amenities,gallery\n"
+            "Sea Breeze,goa,<p>Rooms.</p>,1 Beach Road,3000,4.2,hotel_images/a.jpg,"
+            "Pool|Wi-Fi,gallery/a1.jpg|gallery/a2.jpg\n"
+            "Sea Breeze,goa,<p>Rooms.</p>,2 Beach Road,2500,3.8,hotel_images/b.jpg,"
+            ",\n",
+        )
+        call_command("import_catalogue", "hotels", path, stdout=StringIO())
+        first, second = Hotel.objects.filter(name="Sea Breeze").order_by("pk")
+        self.assertEqual((first.slug, second.slug), ("sea-breeze", "sea-breeze-2"))
+        self.assertEqual(
+            sorted(first.amenities.values_list("name", flat=True)), ["Pool", "Wi-Fi"]
+        )
+        pool = Amenity.objects.get(name="Pool")
+        self.assertEqual(first.amenity_mask & pool.flag, pool.flag)
+        self.assertEqual(first.gallery_images.count(), 2)
+        self.goa.refresh_from_db()
+        self.assertEqual(self.goa.hotel_count, 2)
+        self.assertEqual(len(search.search("breeze")), 2)
+
+    def test_jsonl_round_trip_updates_in_place(self):
+        hotel = self.make_hotel(self.goa, name="Palms")
+        out = StringIO()
+        call_command("export_catalogue", "hotels", format="jsonl", stdout=out)
+        row = json.loads(out.getvalue())
+        self.assertEqual(row["destination"], "goa")
+        self.assertEqual(row["amenities"], ["Wi-Fi"])
+        row.update(price_per_night="999.00", amenities=[])
+        path = self.write("hotels.jsonl", json.dumps(row) + "\n")
+        # One batch: a fixed number of statements, however many rows.
+        with self.assertNumQueries(12):
+            call_command("import_catalogue", "hotels", path, stdout=StringIO())
+        hotel.refresh_from_db()
+        self.assertEqual(hotel.price_per_night, Decimal("999.00"))
+        self.assertEqual((hotel.amenities.count(), hotel.amenity_mask), (0, 0))
+        self.assertEqual(Hotel.objects.count(), 1)
+
+    def test_import_from_stdin_leaves_it_open(self):
+        row = {"destination": "goa", "day": 1, "title": "Arrive", "detail": "Hi"}
+        stdin = StringIO(json.dumps(row) + "\n")
+        with mock.patch("sys.stdin", stdin):
+            call_command("import_catalogue", "itineraries", "-", stdout=StringIO())
+        self.assertFalse(stdin.closed)
+        self.assertTrue(self.goa.itinerary.filter(title="Arrive").exists())
+
+    def test_bad_row_is_reported(self):
+        path = self.write(
+            "itineraries.csv", "destination,day,title,detail\nnowhere,1,Arrive,Hi\n"
+        )
+        with self.assertRaisesMessage(CommandError, "Row 1: Unknown destination"):
+            call_command("import_catalogue", "itineraries", path, stdout=StringIO())
+
+
+class SlugTests(CatalogueTestCase):
+    def test_saves_take_the_next_free_suffix(self):
+        goa = self.make_destination(name="Goa")
+        names = [self.make_hotel(goa, name="Grand Hotel").slug for _ in range(3)]
+        self.assertEqual(names, ["grand-hotel", "grand-hotel-2", "grand-hotel-3"])
+        # "grand-hotel-view" shares the prefix but is another base slug.
+        view = self.make_hotel(goa, name="Grand Hotel View")
+        self.assertEqual(view.slug, "grand-hotel-view")
+        Hotel.objects.filter(slug="grand-hotel-2").delete()
+        self.assertEqual(self.make_hotel(goa, name="Grand Hotel").slug, "grand-hotel-2")
+
+    def test_bulk_create_allocates_with_one_query(self):
+        goa = self.make_destination(name="Goa")
+        self.make_hotel(goa, name="Beach House")
+        fields = {
+            "destination": goa,
+            "description": "",
+            "address": "",
+            "price_per_night": 2000,
+            "rating": 4,
+            "image": "hotel_images/cover.jpg",
+        }
+        hotels = [
+            Hotel(name=name, **fields)
+            for name in ("Beach House", "Beach House", "Hill Lodge")
+        ]
+        with self.assertNumQueries(2):  # The taken slugs, then the insert.
+            Hotel.objects.bulk_create(hotels)
+        self.assertEqual(
+            [hotel.slug for hotel in hotels],
+            ["beach-house-2", "beach-house-3", "hill-lodge"],
+        )
+
+    def test_post_slugs_are_unique_per_date(self):
+        day = timezone.now()
+        first = self.make_post(title="Monsoon Guide", published_at=day)
+        same_day = self.make_post(title="Monsoon Guide", published_at=day)
+        next_year = self.make_post(
+            title="Monsoon Guide", published_at=day + timedelta(days=365)
+        )
+        self.assertEqual(first.slug, "monsoon-guide")
+        self.assertEqual(same_day.slug, "monsoon-guide-2")
+        self.assertEqual(next_year.slug, "monsoon-guide")
+
+
+calls = []
+
+
+@jobs.task("test_flaky")
+def flaky(fail_times):
+    calls.append(fail_times)
+    if len(calls) <= fail_times:
+        raise RuntimeError("try again")
+
+
+@jobs.task("test_interrupt")
+def interrupt():
+    os.kill(os.getpid(), signal.SIGINT)
+
+
+@override_settings(JOBS_MAX_ATTEMPTS=3, JOBS_RETRY_DELAY=10)
+class JobQueueTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        calls.clear()
+
+    def make_due(self):
+        Job.objects.filter(status=Job.QUEUED).update(run_at=timezone.now())
+
+    def test_keyed_enqueue_is_idempotent_while_queued(self):
+        first = jobs.enqueue("test_flaky", {"fail_times": 0}, key="k")
+        self.assertEqual(jobs.enqueue("test_flaky", {"fail_times": 0}, key="k"), first)
+        self.run_jobs()
+        again = jobs.enqueue("test_flaky", {"fail_times": 0}, key="k")
+        self.assertNotEqual(again, first)
+
+    def test_keyed_enqueue_survives_a_claim_racing_the_insert(self):
+        first = jobs.enqueue("test_flaky", {"fail_times": 0}, key="k")
+        save = Job.save
+        conflicts = [IntegrityError("UNIQUE constraint failed: my_app_job.key")]
+
+        def racing_save(job, *args, **kwargs):
+            # The first insert conflicted with ``first``, which a worker
+            # claimed before the queued job was looked up.
+            if conflicts:
+                raise conflicts.pop()
+            return save(job, *args, **kwargs)
+
+        self.assertEqual(jobs.claim("other"), first)
+        with mock.patch.object(Job, "save", autospec=True, side_effect=racing_save):
+            again = jobs.enqueue("test_flaky", {"fail_times": 0}, key="k")
+        self.assertNotEqual(again, first)
+        self.assertEqual(again.status, Job.QUEUED)
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job = jobs.enqueue("test_flaky", {"fail_times": 1})
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn("try again", job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=5))
+        self.make_due()
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 2))
+        self.assertEqual(jobs.retry_delay(3), 40)
+
+    def test_job_fails_after_max_attempts(self):
+        job = jobs.enqueue("test_flaky", {"fail_times": 10})
+        for _ in range(5):
+            self.make_due()
+            self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 3))
+
+    def test_draft_posts_are_not_warmed(self):
+        post = self.make_post(status="draft")
+        post.title = "Still a draft"
+        post.save()
+        self.assertFalse(Job.objects.filter(task="warm_page").exists())
+        job = jobs.enqueue("warm_page", {"path": post.get_absolute_url()})
+        self.make_due()
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 1))
+
+    def test_warming_a_post_does_not_count_a_view(self):
+        view_counts.flush()
+        post = self.make_post()
+        post.title = "Edited"
+        post.save()
+        self.make_due()
+        self.run_jobs()
+        self.assertTrue(
+            Job.objects.filter(task="warm_page", status=Job.DONE).exists()
+        )
+        self.assertEqual(view_counts.pending(), {})
+
+    def test_stale_running_jobs_are_requeued(self):
+        job = jobs.enqueue("test_flaky", {"fail_times": 0})
+        self.assertEqual(jobs.claim("crashed"), job)
+        Job.objects.filter(pk=job.pk).update(
+            started_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+
+    def test_single_process_worker_stops_on_sigint(self):
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self.addCleanup(signal.signal, signum, signal.getsignal(signum))
+        job = jobs.enqueue("test_interrupt")
+        out = StringIO()
+        # Without --burst the worker only returns once it is told to stop.
+        call_command("runjobs", processes=1, poll_interval=0.01, stdout=out)
+        self.assertIn("Stopping after the running jobs", out.getvalue())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+
+    def test_stale_jobs_out_of_attempts_fail(self):
+        job = jobs.enqueue("test_flaky", {"fail_times": 0})
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING,
+            attempts=3,
+            started_at=timezone.now() - timedelta(hours=1),
+        )
+        self.assertEqual(jobs.requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    def test_report(self):
+        Job.objects.all().delete()
+        jobs.enqueue("test_flaky", {"fail_times": 0})
+        jobs.enqueue("test_flaky", {"fail_times": 0}, delay=60)
+        report = jobs.report()
+        self.assertEqual(report["depth"][Job.QUEUED], 2)
+        self.assertEqual(report["queued_by_task"], {"test_flaky": 2})
+        self.run_jobs()
+        report = jobs.report()
+        self.assertEqual(report["depth"][Job.DONE], 1)
+        self.assertEqual(report["finished_in_window"], 1)
+        self.assertIsNotNone(report["latency"])
+
+    def test_contact_enquiry_is_mailed_in_the_background(self):
+        self.client.post(
+            reverse("contact"),
+            {
+                "name": "Asha",
+                "email": "asha@example.com",
+                "phone_number": "98300 12345",
+                "subject": "Goa",
+                "message": "Hi",
+            },
+        )
+        enquiries.flush()
+        self.assertEqual(len(mail.outbox), 0)
+        with self.settings(MANAGERS=[("Desk", "desk@example.com")]):
+            self.run_jobs()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("Asha", mail.outbox[0].subject)
+
+
+@override_settings(ENQUIRY_RATE_BURST=2, ENQUIRY_FLUSH_SIZE=3)
+class EnquiryIntakeTests(CatalogueTestCase):
+    def send(self, address="203.0.113.1", **fields):
+        n = self.next_id()
+        data = {
+            "name": "Asha",
+            "email": f"asha{n}@example.com",
+            "phone_number": "+91 98300 12345",
+            "subject": "Goa in December",
+            "message": f"Enquiry {n}",
+        }
+        data.update(fields)
+        return self.client.post(reverse("contact"), data, REMOTE_ADDR=address)
+
+    def test_valid_enquiries_are_buffered_and_written_together(self):
+        response = self.send(phone_number="98300 12345")
+        self.assertRedirects(
+            response, reverse("contact"), fetch_redirect_response=False
+        )
+        self.assertContains(self.client.get(response.url), "Thank you!")
+        self.assertEqual(Enquiry.objects.count(), 0)
+        [enquiry] = enquiries.pending()
+        self.assertEqual(str(enquiry.phone_number), "+919830012345")
+
+        self.send(address="203.0.113.2")
+        with self.assertNumQueries(4):  # savepoint, two inserts, release
+            self.assertEqual(enquiries.flush(), 2)
+        self.assertEqual(Enquiry.objects.count(), 2)
+        self.assertEqual(Job.objects.filter(task="notify_enquiry").count(), 2)
+        self.assertEqual(enquiries.pending(), [])
+
+    def test_full_buffer_is_written_at_once(self):
+        for address in ("203.0.113.1", "203.0.113.2", "203.0.113.3"):
+            self.send(address=address)
+        self.assertEqual(Enquiry.objects.count(), 3)
+        self.assertEqual(enquiries.pending(), [])
+
+    def test_invalid_enquiries_are_shown_again(self):
+        response = self.send(phone_number="not a phone", subject="")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "This field is required.")
+        self.assertContains(response, 'value="not a phone"')
+        self.assertEqual(enquiries.pending(), [])
+
+    def test_senders_are_rate_limited_by_address_and_email(self):
+        self.send()
+        self.send()
+        response = self.send()
+        self.assertEqual(response.status_code, 429)
+        self.assertContains(response, "try again later", status_code=429)
+        self.assertEqual(self.send(address="203.0.113.9").status_code, 302)
+
+        self.send(address="198.51.100.1", email="spam@example.com")
+        self.send(address="198.51.100.2", email="spam@example.com")
+        response = self.send(address="198.51.100.3", email="spam@example.com")
+        self.assertEqual(response.status_code, 429)
+        enquiries.flush()
+        self.assertEqual(Enquiry.objects.count(), 5)
+
+    def test_tokens_are_earned_back(self):
+        with self.settings(ENQUIRY_RATE_INTERVAL=0.001):
+            for _ in range(4):
+                self.assertEqual(self.send().status_code, 302)
+
+    def test_repeated_enquiries_are_dropped(self):
+        fields = {"email": "asha@example.com", "message": "Rooms for  two?"}
+        self.send(**fields)
+        response = self.send(**{**fields, "message": "rooms for two? "})
+        self.assertRedirects(response, reverse("contact"))
+        self.assertEqual(len(enquiries.pending()), 1)
+        # Duplicates take no token.
+        self.assertEqual(self.send(email="asha@example.com").status_code, 302)
+        self.assertEqual(len(enquiries.pending()), 2)
+
+
+@override_settings(REQUEST_METRICS=True, REQUEST_METRICS_SAMPLES=5)
+class RequestMetricsTests(CatalogueTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.hotel = self.make_hotel()
+
+    def timings(self, response):
+        entries = {}
+        for entry in response["Server-Timing"].split(", "):
+            name, *params = entry.split(";")
+            entries[name] = dict(param.split("=", 1) for param in params)
+        return entries
+
+    def test_server_timing_header(self):
+        url = reverse("hotel_detail", args=[self.hotel.slug])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        timings = self.timings(response)
+        self.assertEqual(timings["db"]["desc"], f'"{len(queries)} queries"')
+        self.assertGreater(float(timings["tpl"]["dur"]), 0)
+        self.assertEqual(timings["cache"]["desc"], '"0 hits / 1 misses"')
+        self.assertNotIn("nplus1", timings)
+
+        timings = self.timings(self.client.get(url))
+        self.assertEqual(timings["cache"]["desc"], '"1 hits / 0 misses"')
+        self.assertEqual(float(timings["tpl"]["dur"]), 0)
+
+    def test_repeated_queries_are_flagged(self):
+        hotels = [self.make_hotel() for _ in range(3)]
+
+        def n_plus_one(request):
+            for hotel in hotels:
+                Hotel.objects.get(pk=hotel.pk)
+            for _ in range(3):
+                list(FAQ.objects.all())
+            return HttpResponse()
+
+        middleware = metrics.RequestMetricsMiddleware(n_plus_one)
+        with self.assertLogs("my_app.metrics", "WARNING") as logs:
+            response = middleware(RequestFactory().get("/"))
+        timings = self.timings(response)
+        self.assertEqual(timings["dup"]["desc"], '"1 duplicated queries"')
+        self.assertEqual(timings["nplus1"]["desc"], '"1 repeated queries"')
+        self.assertEqual(len(logs.records), 2)
+
+    async def test_async_requests_are_measured(self):
+        async def view(request):
+            return HttpResponse()
+
+        middleware = metrics.RequestMetricsMiddleware(view)
+        response = await middleware(RequestFactory().get("/"))
+        self.assertIn("app;dur=", response["Server-Timing"])
+
+    def test_percentiles_are_reported_to_staff(self):
+        url = reverse("hotel_detail", args=[self.hotel.slug])
+        for _ in range(7):
+            self.client.get(url)
+        self.client.get("/no-such-page/")
+        self.assertEqual(self.client.get(reverse("request_metrics")).status_code, 302)
+
+        staff = get_user_model().objects.create_user("staff", is_staff=True)
+        self.client.force_login(staff)
+        report = self.client.get(reverse("request_metrics")).json()
+        self.assertTrue(report["enabled"])
+        hotel = report["urls"]["hotel_detail"]
+        self.assertEqual(hotel["requests"], 5)
+        self.assertEqual(set(hotel["queries"]), {"p50", "p95", "p99"})
+        self.assertEqual(report["urls"]["<unresolved>"]["requests"], 1)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(
+            [metrics.percentile(values, p) for p in (50, 95, 99)], [50, 95, 99]
+        )
+        self.assertEqual(metrics.percentile([7], 99), 7)
+
+    def test_nested_template_renders_are_timed_once(self):
+        engine = engines["django"]
+        self.assertIsInstance(engine, DjangoTemplates)
+        page = engine.from_string(
+            "{% for item in items %}{% include item %}{% endfor %}"
+        )
+        item = engine.from_string("{{ hotel.name }}").template
+
+        def view(request):
+            context = {"items": [item] * 50, "hotel": self.hotel}
+            return HttpResponse(page.render(context))
+
+        middleware = metrics.RequestMetricsMiddleware(view)
+        timings = self.timings(middleware(RequestFactory().get("/")))
+        self.assertGreater(float(timings["tpl"]["dur"]), 0)
+        self.assertLessEqual(
+            float(timings["tpl"]["dur"]), float(timings["app"]["dur"])
+        )
+
+    def test_disabled_middleware_is_not_used(self):
+        # An enabled instance, as earlier tests created, patches Django ...
+        metrics.RequestMetricsMiddleware(lambda request: HttpResponse())
+        stock_render = metrics._stock_render
+        self.assertIsNot(Template.render, stock_render)
+        self.assertIn(metrics._record_query, connection.execute_wrappers)
+        # ... and a disabled one restores it.
+        with self.settings(REQUEST_METRICS=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                metrics.RequestMetricsMiddleware(lambda request: HttpResponse())
+            self.assertIs(Template.render, stock_render)
+            self.assertNotIn(metrics._record_query, connection.execute_wrappers)
+            url = reverse("hotel_detail", args=[self.hotel.slug])
+            self.assertNotIn("Server-Timing", Client().get(url))
+
+
+class SqliteSettingsTests(SimpleTestCase):
+    """
+    The test database lives in memory, where WAL does not apply, so these
+    open a file database with the production connection settings.
+    """
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        self.path = f"{tmp}/db.sqlite3"
+        params = {**connections["default"].settings_dict, "NAME": self.path}
+        self.db = connections["default"].__class__(params, alias="sqlite_settings")
+        connections[self.db.alias] = self.db
+        self.addCleanup(connections.__delitem__, self.db.alias)
+        self.addCleanup(self.db.close)
+
+    def pragma(self, name):
+        with self.db.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_connections_run_the_pragmas(self):
+        self.assertEqual(self.pragma("journal_mode"), "wal")
+        # 1 is NORMAL.
+        self.assertEqual(self.pragma("synchronous"), 1)
+        self.assertEqual(self.pragma("cache_size"), -20000)
+        self.assertEqual(self.pragma("busy_timeout"), 20000)
+
+    def test_transactions_take_the_write_lock_up_front(self):
+        other = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+        with CaptureQueriesContext(self.db) as queries:
+            with transaction.atomic(using=self.db.alias):
+                # Held before the transaction has written anything.
+                with self.assertRaisesMessage(sqlite3.OperationalError, "locked"):
+                    other.execute("BEGIN IMMEDIATE")
+        self.assertEqual(queries[0]["sql"], "BEGIN IMMEDIATE")
 
-# Create your tests here.
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, feeds, metrics, sitemaps, views
 
 urlpatterns = [
     path('', views.home, name='home'),
@@ -8,6 +8,17 @@ urlpatterns = [
     path('hotels/', views.hotels, name='hotels'),
     path('hotels/<slug:slug>/', views.hotel_detail, name='hotel_detail'),
     path('blog/', views.blog, name='blog'),
-    path('blog/<slug:slug>/', views.blog_detail, name='blog_detail'),
+    path('blog/feed/', feeds.blog_feed, name='blog_feed'),
+    path('blog/category/<slug:slug>/', views.blog_category, name='blog_category'),
+    path('blog/tag/<slug:slug>/', views.blog_tag, name='blog_tag'),
+    path('blog/<int:year>/<int:month>/', views.blog_archive, name='blog_archive'),
+    path('blog/<int:year>/<int:month>/<int:day>/<slug:slug>/', views.blog_detail, name='blog_detail'),
+    path('blog/<slug:slug>/', views.blog_redirect, name='blog_redirect'),
+    path('search/', views.site_search, name='search'),
     path('contact/', views.contact, name='contact'),
+    path('sitemap.xml', sitemaps.sitemap_index, name='sitemap'),
+    path('sitemap-<slug:section>.xml', sitemaps.sitemap_section, name='sitemap_section'),
+    path('metrics/', metrics.request_metrics, name='request_metrics'),
+    path('api/<slug:resource>/', api.object_list, name='api_list'),
+    path('api/<slug:resource>/<str:key>/', api.object_detail, name='api_detail'),
 ]
\ No newline at end of file
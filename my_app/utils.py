@@ -0,0 +1,10 @@
+"""Small helpers shared by modules that have nothing else in common."""
+
+from itertools import islice
+
+
+def batches(iterable, size):
+    """Consecutive lists of up to ``size`` items of ``iterable``."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
@@ -0,0 +1,173 @@
+"""
+Page view counts of blog posts, without a write per page view.
+
+``record()`` only increments a counter in process memory. The counts are
+written by ``flush()`` in a single ``UPDATE ... SET views = views + CASE
+...`` per batch of posts, which runs
+
+* once ``VIEW_COUNT_FLUSH_SIZE`` views are buffered,
+* ``VIEW_COUNT_FLUSH_INTERVAL`` seconds after the first buffered view,
+  from a background timer, and
+* when the process exits (``atexit``), so a graceful restart loses nothing.
+
+Every process keeps its own buffer. The increments are applied with
+``F("views") + n``, so flushes from several workers add up instead of
+overwriting each other. If a flush fails, its counts go back into the
+buffer for the next one.
+
+Views are buffered by the post's URL arguments, ``(year, month, day,
+slug)``, the only thing the page knows without a query; they are
+resolved to posts once per flushed batch.
+"""
+
+import atexit
+import logging
+import threading
+from collections import Counter
+from functools import reduce, wraps
+from operator import or_
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.utils import timezone
+
+from . import page_cache
+from .queries import published_on
+from .models import BlogPost
+from .signals import POPULAR_POSTS
+
+logger = logging.getLogger(__name__)
+
+# Posts updated per UPDATE statement.
+BATCH_SIZE = 200
+
+_pending = Counter()
+_lock = threading.Lock()
+_timer = None
+
+
+def record(key):
+    """Count one view of the post at ``(year, month, day, slug)``."""
+    global _timer
+    with _lock:
+        _pending[key] += 1
+        buffered = _pending.total()
+        if _timer is None:
+            _timer = threading.Timer(settings.VIEW_COUNT_FLUSH_INTERVAL, _flush_later)
+            _timer.daemon = True
+            _timer.start()
+    if buffered >= settings.VIEW_COUNT_FLUSH_SIZE:
+        flush()
+
+
+def counted(view):
+    """
+    Record a view of the post ``view`` shows whenever it answers 200 or 304.
+
+    Internal renders (the ``warm_page`` task) set ``request.warming`` and
+    are not counted.
+    """
+
+    def counts(request, response):
+        if getattr(request, "warming", False):
+            return False
+        return request.method == "GET" and response.status_code in (200, 304)
+
+    def key(kwargs):
+        return tuple(kwargs[name] for name in ("year", "month", "day", "slug"))
+
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            response = await view(request, *args, **kwargs)
+            if counts(request, response):
+                # A full buffer is flushed to the database right away.
+                await sync_to_async(record)(key(kwargs))
+            return response
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if counts(request, response):
+            record(key(kwargs))
+        return response
+
+    return wrapper
+
+
+def pending():
+    """The buffered, not yet written, views by ``(year, month, day, slug)``."""
+    with _lock:
+        return dict(_pending)
+
+
+def flush():
+    """Write the buffered views to the database. Returns the views written."""
+    global _timer
+    with _lock:
+        counts = dict(_pending)
+        _pending.clear()
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+    if not counts:
+        return 0
+    try:
+        written = _write(counts)
+    except DatabaseError:
+        logger.warning("Could not write %d post views; retrying later.", len(counts))
+        with _lock:
+            _pending.update(counts)
+        return 0
+    page_cache.invalidate(POPULAR_POSTS)
+    return written
+
+
+def _resolve(keys):
+    """The pks of the published posts at ``keys``, as ``{key: pk}``."""
+    lookups = [published_on(*key) for key in keys]
+    lookups = [lookup for lookup in lookups if lookup is not None]
+    if not lookups:
+        return {}
+    rows = BlogPost.objects.filter(reduce(or_, lookups)).values_list(
+        "pk", "published_at", "slug"
+    )
+    posts = {}
+    for pk, published_at, slug in rows:
+        day = timezone.localdate(published_at)
+        posts[(day.year, day.month, day.day, slug)] = pk
+    return posts
+
+
+def _write(counts):
+    keys = list(counts)
+    written = 0
+    for start in range(0, len(keys), BATCH_SIZE):
+        posts = _resolve(keys[start : start + BATCH_SIZE])
+        if not posts:
+            continue
+        increment = Case(
+            *(When(pk=pk, then=Value(counts[key])) for key, pk in posts.items()),
+            output_field=PositiveIntegerField(),
+        )
+        BlogPost.objects.filter(pk__in=posts.values()).update(
+            views=F("views") + increment
+        )
+        written += sum(counts[key] for key in posts)
+    return written
+
+
+def _flush_later():
+    try:
+        flush()
+    finally:
+        # The timer thread has its own database connection.
+        connection.close()
+
+
+atexit.register(flush)
@@ -1,54 +1,173 @@
-from django.shortcuts import render, get_object_or_404
-from .models import Destination, Hotel, BlogPost, FAQ, Enquiry
+from datetime import date
 
+from django.contrib import messages
+from django.http import Http404
+from django.shortcuts import redirect, render, get_object_or_404
+from . import enquiries, hotel_search, page_cache, pricing, queries, search, view_counts
+from .conditional import last_modified_condition
+from .forms import EnquiryForm, HotelFilterForm, StayForm
+from .pagination import paginate
+from .signals import ALL_FAQS, FEATURED_DESTINATIONS, FEATURED_HOTELS
 
+DESTINATIONS_PER_PAGE = 24
+HOTELS_PER_PAGE = 24
+POSTS_PER_PAGE = 12
+MOST_READ_POSTS = 5
+SEARCH_RESULTS = 30
+
+
+@page_cache.cached_page
 def home(request):
-    featured_destinations = Destination.objects.filter(is_featured=True)[:4]
-    featured_hotels = Hotel.objects.filter(is_featured=True).order_by('-rating')[:4]
-    faqs = FAQ.objects.all()
+    # The querysets stay lazy: each section is rendered inside a cached
+    # template fragment and only queried when that fragment is stale.
     context = {
-        'featured_destinations': featured_destinations,
-        'featured_hotels': featured_hotels,
-        'faqs': faqs,
+        'featured_destinations': queries.featured_destinations()[:4],
+        'featured_hotels': queries.featured_hotels()[:4],
+        'faqs': queries.faqs(),
     }
-    return render(request, 'index.html', context)
+    response = render(request, 'index.html', context)
+    return page_cache.tag(response, FEATURED_DESTINATIONS, FEATURED_HOTELS, ALL_FAQS)
 
 
 def destinations(request):
-    my_destinations = Destination.objects.all()
-    return render(request, 'destinations.html', {'destinations': my_destinations})
+    page = paginate(request, queries.destination_list(), DESTINATIONS_PER_PAGE)
+    return render(request, 'destinations.html', {'destinations': page, 'page': page})
 
 
+@last_modified_condition(queries.destination_last_modified)
+@page_cache.cached_page
 def destination_detail(request, slug):
-    destination = get_object_or_404(Destination, slug=slug)
-    return render(request, 'destination_details.html', {'destination': destination})
+    destination = get_object_or_404(queries.destination_detail(), slug=slug)
+    response = render(request, 'destination_details.html', {'destination': destination})
+    return page_cache.tag(response, page_cache.object_tag(destination))
 
 
 def hotels(request):
-    my_hotels = Hotel.objects.all()
-    return render(request, 'hotels.html', {'hotels': my_hotels})
+    amenities = list(queries.amenities())
+    filters = HotelFilterForm(
+        request.GET, destinations=queries.destination_names(), amenities=amenities
+    )
+    hotels = queries.hotel_list()
+    if filters.is_valid():
+        chosen = set(filters.cleaned_data['amenities'])
+        hotels = hotel_search.filter_hotels(
+            hotels,
+            destination=filters.cleaned_data['destination'],
+            amenities=[amenity for amenity in amenities if amenity.pk in chosen],
+            rating=filters.cleaned_data['rating'],
+            price=filters.cleaned_data['price'],
+            available_only=filters.cleaned_data['available'],
+        )
+    facets = hotel_search.facet_counts(hotels, amenities)
+    page = paginate(request, hotels, HOTELS_PER_PAGE)
+    stay = StayForm(request.GET) if 'check_in' in request.GET else StayForm()
+    if stay.is_bound and stay.is_valid():
+        # One query prices the stay at every hotel on the page.
+        quotes = pricing.quote_many(
+            page.object_list,
+            stay.cleaned_data['check_in'],
+            stay.cleaned_data['check_out'],
+            stay.cleaned_data['guests'],
+        )
+        for hotel in page:
+            hotel.quote = quotes[hotel.pk]
+    context = {
+        'hotels': page,
+        'page': page,
+        'stay': stay,
+        'filters': filters,
+        'facets': facets,
+    }
+    return render(request, 'hotels.html', context)
 
 
+@last_modified_condition(queries.hotel_last_modified)
+@page_cache.cached_page
 def hotel_detail(request, slug):
-    hotel = get_object_or_404(Hotel, slug=slug)
-    return render(request, 'hotel_details.html', {'hotel': hotel})
+    hotel = get_object_or_404(queries.hotel_detail(), slug=slug)
+    response = render(request, 'hotel_details.html', {'hotel': hotel})
+    return page_cache.tag(
+        response, page_cache.object_tag(hotel), page_cache.object_tag(hotel.destination)
+    )
+
+
+def _blog_listing(request, posts, heading=None):
+    page = paginate(request, posts, POSTS_PER_PAGE)
+    # The sidebar querysets stay lazy, like the homepage sections.
+    context = {
+        'posts': page,
+        'page': page,
+        'heading': heading,
+        'popular_posts': queries.popular_posts()[:MOST_READ_POSTS],
+        'categories': queries.sidebar_categories(),
+        'tags': queries.sidebar_tags(),
+        'months': queries.sidebar_months(),
+    }
+    return render(request, 'blog.html', context)
 
 
 def blog(request):
-    posts = BlogPost.objects.order_by('-published_at')
-    return render(request, 'blog.html', {'posts': posts})
+    return _blog_listing(request, queries.blog_list())
+
+
+def blog_category(request, slug):
+    category = get_object_or_404(queries.blog_category(), slug=slug)
+    posts = queries.blog_list().filter(category=category)
+    return _blog_listing(request, posts, category.name)
+
+
+def blog_tag(request, slug):
+    tag = get_object_or_404(queries.blog_tag(), slug=slug)
+    posts = queries.blog_list().filter(tags=tag)
+    return _blog_listing(request, posts, f'#{tag.name}')
+
+
+def blog_archive(request, year, month):
+    posts = queries.posts_in_month(year, month)
+    if posts is None:
+        raise Http404('No such month.')
+    return _blog_listing(request, posts, date(year, month, 1).strftime('%B %Y'))
+
+
+# Views are counted outside the caches, so cached and 304 responses count too.
+@view_counts.counted
+@last_modified_condition(queries.blog_last_modified)
+@page_cache.cached_page
+def blog_detail(request, year, month, day, slug):
+    post = get_object_or_404(queries.blog_detail(year, month, day, slug))
+    related = queries.related_posts(post)
+    context = {'post': post, 'related_posts': related}
+    response = render(request, 'blog_details.html', context)
+    return page_cache.tag(
+        response, page_cache.object_tag(post), *map(page_cache.object_tag, related)
+    )
+
+
+def blog_redirect(request, slug):
+    # Old slug-only URLs, kept working through the BlogRedirect table.
+    entry = get_object_or_404(queries.blog_redirect(slug))
+    return redirect(entry.post, permanent=True)
 
 
-def blog_detail(request, slug):
-    post = get_object_or_404(BlogPost, slug=slug)
-    return render(request, 'blog_details.html', {'post': post})
+def site_search(request):
+    query = request.GET.get('q', '').strip()
+    kind = request.GET.get('type')
+    kinds = [kind] if kind in search.KINDS else search.KINDS
+    results = search.search(query, kinds, limit=SEARCH_RESULTS) if query else []
+    return render(request, 'search.html', {'query': query, 'kind': kind, 'results': results})
 
 
 def contact(request):
-    if request.method == 'POST':
-        name = request.POST.get('name')
-        email = request.POST.get('email')
-        message = request.POST.get('message')
-        Enquiry.objects.create(name=name, email=email, message=message)
-        # You can add a success message here
-    return render(request, 'contact.html')
+    form = EnquiryForm(request.POST or None)
+    status = 200
+    if form.is_valid():
+        address = enquiries.client_address(request)
+        result = enquiries.submit(form.save(commit=False), address)
+        if result != enquiries.LIMITED:
+            messages.success(request, 'Thank you! We will get back to you shortly.')
+            return redirect('contact')
+        form.add_error(
+            None, 'You have sent several messages already. Please try again later.'
+        )
+        status = 429
+    return render(request, 'contact.html', {'form': form}, status=status)